@@ -8,20 +8,29 @@ __copyright__ = __author__
 __license__ = "MIT"
 
 __app_secret_env__ = 'OMT_APP_SECRET'
+__api_token_env__ = 'OMT_API_TOKEN'
 
 __app_id__ = 'jxihm8y9aqx3k4gj5j08l1msd71d3v'
 __app_secret__ = os.getenv(__app_secret_env__)
 __app_host__ = 'localhost'
 __app_port__ = 7064
+__app_threads__ = 8
+
+
+def get_app_secret() -> str:
+    # Checked when the Twitch client is built rather than on import, so the
+    # CLI can print --help or --version without it
+    secret = os.getenv(__app_secret_env__)
+    if secret is None:
+        raise RuntimeError(f'Environment variable {__app_secret_env__} must be defined before launching the app. Find app secret at -> https://dev.twitch.tv/console/')
+    return secret
+
 
 if sys.version_info[:2] >= (3, 8):
     from importlib.metadata import PackageNotFoundError, version
 else:
     from importlib_metadata import PackageNotFoundError, version
 
-if(__app_secret__ is None):
-    raise RuntimeError(f'Environment variable {__app_secret_env__} must be defined before launching the app. Find app secret at -> https://dev.twitch.tv/console/')
-
 try:
     __version__ = version(__dist_name__)
 except PackageNotFoundError:
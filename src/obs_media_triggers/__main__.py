@@ -1,11 +1,88 @@
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from . import __dist_name__, __description__, __version__, __app_host__, __app_port__
-from .dashboard import Dashboard
+from . import __app_threads__, __api_token_env__
+from .controllers import GiftAggregator, OverflowPolicy, ThrottleConfig
+from .controllers import TraceBuffer, TriggerExecutor, TriggerQueue
 from logging import getLogger, basicConfig, ERROR, INFO, NOTSET
-from os import getcwd
+from importlib import import_module
+from time import perf_counter
+from os import getcwd, getenv
+import json, sys
 
 LOG = getLogger(__name__)
 
+# The heavy dependencies, in the order the dashboard pulls them in. Each is
+# only imported once the dashboard is actually going to be served.
+STARTUP_IMPORTS = (
+    ("flask, sqlalchemy", ".models"),
+    ("twitchAPI, aiohttp", ".controllers.twitch"),
+    ("obsws-python", ".controllers.obs"),
+    ("views", ".views"),
+    ("dashboard", ".dashboard"),
+)
+
+
+def import_dashboard(report: list) -> type:
+    """Import the dashboard one dependency at a time, timing each step."""
+    for label, name in STARTUP_IMPORTS:
+        began = perf_counter()
+        module = import_module(name, __package__)
+        report.append((f"import {label}", perf_counter() - began))
+    return module.Dashboard
+
+
+def print_startup_report(report: list) -> None:
+    width = max(len(step) for step, _ in report)
+    for step, seconds in report:
+        print(f"{step:<{width}} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    total = sum(seconds for _, seconds in report)
+    print(f"{'total':<{width}} {total * 1000:8.1f} ms", file=sys.stderr)
+
+
+def transfer_config(args: Namespace) -> None:
+    """Export or import the saved OBS clients without serving the dashboard."""
+    from flask import Flask
+    from .models import DB, DEFAULT_DB_NAME, configure_sqlite
+    from .controllers.bulk import ConfigTransfer
+
+    app = Flask(__dist_name__)
+    database = f"sqlite:///{args.data_dir}/{DEFAULT_DB_NAME}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = database
+    DB.init_app(app)
+    with app.app_context():
+        configure_sqlite(DB.engine)
+        DB.create_all()
+        transfer = ConfigTransfer(DB)
+        if args.command == "export":
+            data = json.dumps(transfer.export(args.include_secrets), indent=2)
+            if args.file is None:
+                print(data)
+            else:
+                with open(args.file, "w") as f:
+                    f.write(data + "\n")
+            return
+        try:
+            with open(args.file) as f:
+                result = transfer.load(json.load(f), replace=args.replace)
+        except (OSError, ValueError, RuntimeError) as e:
+            sys.exit(f"Import of {args.file} failed: {e}")
+        result.pop("obs_ids")
+        print(", ".join(f"{k.replace('_', ' ')}: {v}" for k, v in result.items()))
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise ArgumentTypeError(f"must be over 0, got: {value}")
+    return number
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if not number > 0:
+        raise ArgumentTypeError(f"must be over 0, got: {value}")
+    return number
+
 
 def parse_args() -> Namespace:
     """Parse command line parameters
@@ -64,6 +141,161 @@ def parse_args() -> Namespace:
         default=getcwd(),
         help="Directory to store persistent app data in. (Default: $PWD)",
     )
+    parser.add_argument(
+        "--rate-limit",
+        dest="rate_limit",
+        metavar="Triggers/sec",
+        type=positive_float,
+        default=ThrottleConfig.rate,
+        help=f"Sustained triggers/sec allowed per OBS client. (Default: {ThrottleConfig.rate})",
+    )
+    parser.add_argument(
+        "--rate-burst",
+        dest="rate_burst",
+        metavar="Triggers",
+        type=positive_int,
+        default=ThrottleConfig.burst,
+        help=f"Triggers allowed at once before rate limiting. (Default: {ThrottleConfig.burst})",
+    )
+    parser.add_argument(
+        "--trigger-cooldown",
+        dest="trigger_cooldown",
+        metavar="Seconds",
+        type=float,
+        default=ThrottleConfig.trigger_cooldown,
+        help="Minimum seconds between two firings of the same trigger. (Default: 0)",
+    )
+    parser.add_argument(
+        "--user-cooldown",
+        dest="user_cooldown",
+        metavar="Seconds",
+        type=float,
+        default=ThrottleConfig.user_cooldown,
+        help="Minimum seconds between triggers from the same chatter. (Default: 0)",
+    )
+    parser.add_argument(
+        "--overflow",
+        dest="overflow",
+        metavar="Policy",
+        choices=[p.value for p in OverflowPolicy],
+        default=ThrottleConfig.policy.value,
+        help="What to do with throttled triggers: drop, queue or coalesce. (Default: drop)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        dest="queue_size",
+        metavar="Triggers",
+        type=int,
+        default=ThrottleConfig.queue_size,
+        help=f"Throttled triggers held per OBS client when queueing. (Default: {ThrottleConfig.queue_size})",
+    )
+    parser.add_argument(
+        "--pending-limit",
+        dest="pending_limit",
+        metavar="Triggers",
+        type=int,
+        default=TriggerQueue.DEFAULT_SIZE,
+        help=f"Distinct triggers waiting on one OBS client before new ones are dropped. (Default: {TriggerQueue.DEFAULT_SIZE})",
+    )
+    parser.add_argument(
+        "--coalesce-window",
+        dest="coalesce_window",
+        metavar="Seconds",
+        type=float,
+        default=TriggerQueue.DEFAULT_WINDOW,
+        help="How long a trigger waits for identical ones to merge into it. (Default: 0)",
+    )
+    parser.add_argument(
+        "--gift-window",
+        dest="gift_window",
+        metavar="Seconds",
+        type=positive_float,
+        default=GiftAggregator.DEFAULT_WINDOW,
+        help=f"How far back gifted subs count towards a gift trigger's quantity. (Default: {GiftAggregator.DEFAULT_WINDOW})",
+    )
+    parser.add_argument(
+        "--trace-buffer",
+        dest="trace_size",
+        metavar="Events",
+        type=int,
+        default=TraceBuffer.DEFAULT_SIZE,
+        help=f"Recent events kept with their pipeline traces at /traces. (Default: {TraceBuffer.DEFAULT_SIZE})",
+    )
+    parser.add_argument(
+        "--server",
+        dest="server",
+        action="store_true",
+        help="Serve the dashboard with a production WSGI server (needs the 'server' extra).",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        metavar="Count",
+        type=int,
+        default=__app_threads__,
+        help=f"Request handler threads in --server mode, and database connections to match. Each open live dashboard view holds one; at most half are given to them. (Default: {__app_threads__})",
+    )
+    parser.add_argument(
+        "--replay-age",
+        dest="replay_age",
+        metavar="Seconds",
+        type=float,
+        default=None,
+        help="Replay triggers left queued by a crash or restart up to this old; 0 to never replay. (Default: 300)",
+    )
+    parser.add_argument(
+        "--media-playback",
+        dest="media_playback",
+        action="store_true",
+        help="Restart media sources on trigger and hide them when the clip ends, instead of after a fixed time.",
+    )
+    parser.add_argument(
+        "--autoconnect",
+        dest="autoconnect",
+        action="store_true",
+        help="Connect every saved OBS client in the background on startup.",
+    )
+    parser.add_argument(
+        "--startup-report",
+        dest="startup_report",
+        action="store_true",
+        help="Print how long each import and startup step took before serving.",
+    )
+    parser.add_argument(
+        "--benchmark-triggers",
+        dest="benchmark_triggers",
+        metavar="Trigger Count",
+        type=positive_int,
+        default=None,
+        help="Measure how many triggers/sec the trigger executor sustains, then exit.",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="Command")
+    export = commands.add_parser(
+        "export", help="Write every OBS client with its triggers as JSON, then exit."
+    )
+    export.add_argument(
+        "file",
+        metavar="File",
+        nargs="?",
+        default=None,
+        help="File to write the JSON to. (Default: stdout)",
+    )
+    export.add_argument(
+        "--include-secrets",
+        dest="include_secrets",
+        action="store_true",
+        help="Include the OBS websocket passwords, in plain text.",
+    )
+    load = commands.add_parser(
+        "import", help="Add OBS clients and triggers from an exported JSON file."
+    )
+    load.add_argument("file", metavar="File", help="JSON file to import.")
+    load.add_argument(
+        "--replace",
+        dest="replace",
+        action="store_true",
+        help="Drop the existing triggers and channels of clients in the file first.",
+    )
     return parser.parse_args()
 
 
@@ -72,14 +304,60 @@ def main():
     args = parse_args()
 
     # Configure App
-    Dashboard.DATA_DIR = args.data_dir
     log_level = ERROR if (args.log_level is None) else args.log_level
     debug = log_level == NOTSET
     basicConfig(level=log_level)
 
+    if args.command is not None:
+        transfer_config(args)
+        return
+
+    if args.benchmark_triggers is not None:
+        executor = TriggerExecutor()
+        rate = executor.measure_throughput(args.benchmark_triggers)
+        executor.shutdown()
+        print(f"{rate:.0f} triggers/sec over {args.benchmark_triggers} triggers")
+        return
+
+    throttle = ThrottleConfig(
+        rate=args.rate_limit,
+        burst=args.rate_burst,
+        trigger_cooldown=args.trigger_cooldown,
+        user_cooldown=args.user_cooldown,
+        policy=OverflowPolicy(args.overflow),
+        queue_size=args.queue_size,
+    )
+
+    executor = TriggerExecutor(
+        pending_limit=args.pending_limit, coalesce_window=args.coalesce_window
+    )
+
     # Create and run the dashboard
-    app = Dashboard(args.dashboard_host, args.dashboard_port, debug=debug)
-    app.run()
+    report = []
+    Dashboard = import_dashboard(report)
+    Dashboard.DATA_DIR = args.data_dir
+    began = perf_counter()
+    app = Dashboard(
+        args.dashboard_host,
+        args.dashboard_port,
+        debug=debug,
+        throttle=throttle,
+        executor=executor,
+        gift_window=args.gift_window,
+        trace_size=args.trace_size,
+        autoconnect=args.autoconnect,
+        media_playback=args.media_playback,
+        replay_age=args.replay_age,
+        api_token=getenv(__api_token_env__),
+        threads=args.threads,
+    )
+    report.append(("build dashboard", perf_counter() - began))
+    if args.startup_report:
+        print_startup_report(report)
+    if args.server:
+        app.serve()
+    else:
+        app.run()
 
 
 if __name__ == "__main__":
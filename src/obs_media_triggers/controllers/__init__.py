@@ -1,10 +1,64 @@
-from .events import EventSubsManager
-from .obs import OBSClientsManager, OBSActiveClient
-from .twitch import TwitchClient
+from typing import TYPE_CHECKING
+from importlib import import_module
+
+if TYPE_CHECKING:
+    from .events import EventSubsManager
+    from .dispatch import CommandDispatcher
+    from .obs import OBSClientsManager, OBSActiveClient
+    from .twitch import TwitchClient
+    from .fanout import EventFanOut
+    from .triggers import TriggerExecutor
+    from .queue import TriggerQueue
+    from .gifts import GiftAggregator
+    from .tracing import TraceBuffer
+    from .live import LiveFeed
+    from .shards import EventSubPool
+    from .bulk import ConfigTransfer
+    from .throttle import OverflowPolicy, ThrottleConfig
+
+# Controllers are imported on first use, so reading a default off TraceBuffer
+# does not drag in Flask, twitchAPI and obsws with it
+LAZY_IMPORTS = {
+    "EventSubsManager": ".events",
+    "CommandDispatcher": ".dispatch",
+    "OBSClientsManager": ".obs",
+    "OBSActiveClient": ".obs",
+    "TwitchClient": ".twitch",
+    "EventFanOut": ".fanout",
+    "TriggerExecutor": ".triggers",
+    "TriggerQueue": ".queue",
+    "GiftAggregator": ".gifts",
+    "TraceBuffer": ".tracing",
+    "LiveFeed": ".live",
+    "EventSubPool": ".shards",
+    "ConfigTransfer": ".bulk",
+    "OverflowPolicy": ".throttle",
+    "ThrottleConfig": ".throttle",
+}
 
 __all__ = [
     "EventSubsManager",
+    "CommandDispatcher",
     "OBSClientsManager",
     "OBSActiveClient",
     "TwitchClient",
+    "EventFanOut",
+    "TriggerExecutor",
+    "TriggerQueue",
+    "GiftAggregator",
+    "TraceBuffer",
+    "LiveFeed",
+    "EventSubPool",
+    "ConfigTransfer",
+    "OverflowPolicy",
+    "ThrottleConfig",
 ]
+
+
+def __getattr__(name: str) -> object:
+    module = LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
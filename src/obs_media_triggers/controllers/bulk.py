@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+from logging import getLogger
+from collections import defaultdict
+from .dispatch import TriggerAction
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Dict, List, Tuple
+from ..models import (
+    MAX_VARCHAR_LEN,
+    ChannelRouteModel,
+    EventSubModel,
+    EventTypes,
+    OBSWSClientModel,
+)
+
+LOG = getLogger(__name__)
+
+
+class ConfigTransfer:
+    """Every OBS client with its triggers and channels, as one JSON document.
+
+    Imports match clients to saved ones by host and port, and skip triggers a
+    client already has, so running the same import twice changes nothing. The
+    whole document is checked before anything is written, then written with a
+    few bulk statements in a single transaction: it lands completely or not
+    at all.
+
+    OBS websocket passwords are only exported when asked for. A client
+    imported without one keeps the password it was saved with.
+
+        {"version": 1, "obs_clients": [{
+            "host": "localhost", "port": 4455, "password": "",
+            "channels": ["1234"],
+            "events": [{"type": "CHANNEL_CHAT_MESSAGE", "src_template": "Clip",
+                        "quantity": null, "allow_anon": false}]}]}
+    """
+
+    VERSION = 1
+    EVENT_KEY = ("obs_id", "type", "src_template", "quantity", "allow_anon")
+
+    db: SQLAlchemy
+
+    def __init__(self: ConfigTransfer, db: SQLAlchemy):
+        self.db = db
+
+    def export(self: ConfigTransfer, include_secrets: bool = False) -> dict:
+        session = self.db.session
+        events = defaultdict(list)
+        rows = session.execute(select(EventSubModel).order_by(EventSubModel.id))
+        for e in rows.scalars():
+            events[e.obs_id].append(
+                {
+                    "type": e.type.name,
+                    "src_template": e.src_template,
+                    "quantity": e.quantity,
+                    "allow_anon": bool(e.allow_anon),
+                }
+            )
+        channels = defaultdict(list)
+        for route in session.execute(select(ChannelRouteModel)).scalars():
+            channels[route.obs_id].append(route.broadcaster_id)
+        clients = session.execute(
+            select(OBSWSClientModel).order_by(OBSWSClientModel.id)
+        ).scalars()
+        exported = []
+        for c in clients:
+            client = {"id": c.id, "host": c.host, "port": c.port}
+            if include_secrets:
+                client["password"] = c.password
+            client["channels"] = sorted(channels[c.id])
+            client["events"] = events[c.id]
+            exported.append(client)
+        return {"version": ConfigTransfer.VERSION, "obs_clients": exported}
+
+    def validate(self: ConfigTransfer, data: object) -> List[dict]:
+        """The clients in `data`, normalized; every problem is raised at once."""
+        errors = []
+        if not isinstance(data, dict):
+            raise RuntimeError("Expected a JSON object with an obs_clients list!")
+        version = data.get("version", ConfigTransfer.VERSION)
+        if version != ConfigTransfer.VERSION:
+            errors.append(f"version: {version} is not supported")
+        clients = data.get("obs_clients")
+        if not isinstance(clients, list):
+            raise RuntimeError("obs_clients: expected a list of OBS clients!")
+
+        normalized = []
+        seen = set()
+        for i, client in enumerate(clients):
+            at = f"obs_clients[{i}]"
+            if not isinstance(client, dict):
+                errors.append(f"{at}: expected an object")
+                continue
+            host = client.get("host")
+            port = client.get("port")
+            password = client.get("password")
+            if not isinstance(host, str) or not 0 < len(host) <= MAX_VARCHAR_LEN:
+                errors.append(f"{at}.host: expected a host name")
+            if isinstance(port, str) and port.isdigit():
+                port = int(port)
+            if (
+                isinstance(port, bool)
+                or not isinstance(port, int)
+                or not 0 < port < 65536
+            ):
+                errors.append(f"{at}.port: expected a port number")
+            if password is not None and (
+                not isinstance(password, str) or len(password) > MAX_VARCHAR_LEN
+            ):
+                errors.append(f"{at}.password: expected a string")
+            if (host, port) in seen:
+                errors.append(f"{at}: ws://{host}:{port} is listed twice")
+            seen.add((host, port))
+
+            channels = client.get("channels") or []
+            if not isinstance(channels, list) or not all(
+                isinstance(c, str) and 0 < len(c) <= MAX_VARCHAR_LEN for c in channels
+            ):
+                errors.append(f"{at}.channels: expected a list of Twitch user ids")
+                channels = []
+
+            events = client.get("events") or []
+            if not isinstance(events, list):
+                errors.append(f"{at}.events: expected a list")
+                events = []
+            normalized.append(
+                {
+                    "host": host,
+                    "port": port,
+                    "password": password,
+                    "channels": sorted(set(channels)),
+                    "events": [
+                        self.__validate_event(e, f"{at}.events[{j}]", errors)
+                        for j, e in enumerate(events)
+                    ],
+                }
+            )
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return normalized
+
+    @staticmethod
+    def __validate_event(event: object, at: str, errors: List[str]) -> dict:
+        if not isinstance(event, dict):
+            errors.append(f"{at}: expected an object")
+            return {}
+        type = event.get("type")
+        try:
+            type = EventTypes[str(type).strip().upper().replace(" ", "_")]
+        except KeyError:
+            errors.append(f"{at}.type: unknown event type {type}")
+        src_template = event.get("src_template")
+        if (
+            not isinstance(src_template, str)
+            or len(src_template) > MAX_VARCHAR_LEN
+            or not TriggerAction.parse_steps(src_template)
+        ):
+            errors.append(f"{at}.src_template: expected at least one OBS source")
+        quantity = event.get("quantity")
+        # bool is an int too, so true would pass as a quantity of 1
+        if quantity is not None and (
+            isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1
+        ):
+            errors.append(f"{at}.quantity: expected a positive number")
+        allow_anon = event.get("allow_anon", False)
+        if not isinstance(allow_anon, bool):
+            errors.append(f"{at}.allow_anon: expected true or false")
+        return {
+            "type": type,
+            "src_template": src_template,
+            "quantity": quantity,
+            "allow_anon": allow_anon,
+        }
+
+    def load(self: ConfigTransfer, data: object, replace: bool = False) -> dict:
+        """Import `data`; with `replace`, matched clients lose their old triggers.
+
+        Returns what was written, with the ids of every client it touched.
+        """
+        clients = self.validate(data)
+        session = self.db.session
+        try:
+            ids = self.__upsert_clients(clients)
+            matched = [ids[(c["host"], c["port"])] for c in clients if not c["new"]]
+            removed = 0
+            if replace and matched:
+                removed = session.execute(
+                    delete(EventSubModel).where(EventSubModel.obs_id.in_(matched))
+                ).rowcount
+                session.execute(
+                    delete(ChannelRouteModel).where(
+                        ChannelRouteModel.obs_id.in_(matched)
+                    )
+                )
+            events = self.__new_events(clients, ids)
+            if events:
+                session.execute(insert(EventSubModel), events)
+            routes = self.__new_routes(clients, ids)
+            if routes:
+                session.execute(insert(ChannelRouteModel), routes)
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise RuntimeError(f"Import failed, nothing was saved: {e}")
+
+        result = {
+            "clients_created": sum(c["new"] for c in clients),
+            "clients_updated": len(matched),
+            "events_created": len(events),
+            "events_removed": removed,
+            "channels_created": len(routes),
+            "obs_ids": sorted(set(ids.values())),
+        }
+        LOG.info(f"Imported configuration: {result}")
+        return result
+
+    def __upsert_clients(
+        self: ConfigTransfer, clients: List[dict]
+    ) -> Dict[Tuple[str, int], int]:
+        session = self.db.session
+        rows = session.execute(
+            select(OBSWSClientModel.id, OBSWSClientModel.host, OBSWSClientModel.port)
+        ).all()
+        ids = {(host, int(port)): id for id, host, port in rows}
+        for c in clients:
+            c["new"] = (c["host"], c["port"]) not in ids
+
+        # A client exported without its password keeps the saved one
+        updates = [
+            {"id": ids[(c["host"], c["port"])], "password": c["password"]}
+            for c in clients
+            if not c["new"] and c["password"] is not None
+        ]
+        if updates:
+            session.execute(update(OBSWSClientModel), updates)
+        created = [
+            {"host": c["host"], "port": c["port"], "password": c["password"] or ""}
+            for c in clients
+            if c["new"]
+        ]
+        if created:
+            new_ids = session.execute(
+                insert(OBSWSClientModel).returning(
+                    OBSWSClientModel.id, sort_by_parameter_order=True
+                ),
+                created,
+            ).scalars()
+            for row, id in zip(created, new_ids):
+                ids[(row["host"], row["port"])] = id
+        return {(c["host"], c["port"]): ids[(c["host"], c["port"])] for c in clients}
+
+    def __new_events(
+        self: ConfigTransfer, clients: List[dict], ids: Dict[Tuple[str, int], int]
+    ) -> List[dict]:
+        # Triggers a client already has, exactly as imported, are not doubled
+        obs_ids = {ids[(c["host"], c["port"])] for c in clients if not c["new"]}
+        rows = self.db.session.execute(
+            select(
+                EventSubModel.obs_id,
+                EventSubModel.type,
+                EventSubModel.src_template,
+                EventSubModel.quantity,
+                EventSubModel.allow_anon,
+            ).where(EventSubModel.obs_id.in_(obs_ids))
+        )
+        existing = {(*row[:4], bool(row[4])) for row in rows}
+        events = []
+        for c in clients:
+            for event in c["events"]:
+                row = {**event, "obs_id": ids[(c["host"], c["port"])]}
+                key = tuple(row[k] for k in ConfigTransfer.EVENT_KEY)
+                if key not in existing:
+                    existing.add(key)
+                    events.append(row)
+        return events
+
+    def __new_routes(
+        self: ConfigTransfer, clients: List[dict], ids: Dict[Tuple[str, int], int]
+    ) -> List[dict]:
+        wanted = {
+            (ids[(c["host"], c["port"])], channel)
+            for c in clients
+            for channel in c["channels"]
+        }
+        if not wanted:
+            return []
+        rows = self.db.session.execute(
+            select(ChannelRouteModel.obs_id, ChannelRouteModel.broadcaster_id).where(
+                ChannelRouteModel.obs_id.in_({obs_id for obs_id, _ in wanted})
+            )
+        )
+        existing = {tuple(row) for row in rows}
+        return [
+            {"obs_id": obs_id, "broadcaster_id": channel}
+            for obs_id, channel in sorted(wanted - existing)
+        ]
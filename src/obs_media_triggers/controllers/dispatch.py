@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from logging import getLogger
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..models import EventSubModel
+
+LOG = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TriggerStep:
+    source_name: str
+    enabled: bool = True
+
+
+@dataclass(frozen=True)
+class TriggerAction:
+    """A saved trigger and the scene item changes it makes while it plays.
+
+    A template may list several sources joined by " + ". Each one is shown
+    while the trigger plays, or hidden if its name is prefixed with "-", and is
+    put back when the trigger ends. The first source names the chat command.
+    """
+
+    STEP_SEPARATOR = " + "
+    HIDE_PREFIX = "-"
+
+    event_id: int
+    src_template: str
+    steps: Tuple[TriggerStep, ...] = ()
+
+    @staticmethod
+    def parse_steps(src_template: str) -> Tuple[TriggerStep, ...]:
+        steps = []
+        for part in src_template.split(TriggerAction.STEP_SEPARATOR):
+            part = part.strip()
+            enabled = not part.startswith(TriggerAction.HIDE_PREFIX)
+            if not enabled:
+                part = part[len(TriggerAction.HIDE_PREFIX):].strip()
+            if part:
+                steps.append(TriggerStep(part, enabled))
+        return tuple(steps)
+
+    @staticmethod
+    def format_steps(steps: Iterable[TriggerStep]) -> str:
+        return TriggerAction.STEP_SEPARATOR.join(
+            ("" if step.enabled else TriggerAction.HIDE_PREFIX) + step.source_name
+            for step in steps
+        )
+
+    @staticmethod
+    def from_row(row: EventSubModel) -> TriggerAction:
+        return TriggerAction(
+            row.id, row.src_template, TriggerAction.parse_steps(row.src_template)
+        )
+
+
+class CommandDispatcher:
+    """Maps chat commands to the triggers saved for them.
+
+    Every trigger is compiled into a handful of normalized keys (the source
+    name, the name without spaces, each optionally behind a command prefix) so
+    a message is matched with at most two dictionary lookups. Messages that do
+    not start with the first character of any key are rejected before any
+    normalization happens.
+
+    A whole message matches a trigger with or without the prefix. Only a
+    prefixed command may be followed by more words, so ordinary chat that
+    happens to start with a source name never fires it.
+    """
+
+    PREFIXES = "!"
+
+    commands: Dict[str, Tuple[TriggerAction, ...]]
+    heads: frozenset[str]
+    max_len: int
+
+    def __init__(self: CommandDispatcher, rows: Iterable[EventSubModel] = ()):
+        self.compile(rows)
+
+    def __len__(self: CommandDispatcher) -> int:
+        return len(self.commands)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return text.strip().lstrip(CommandDispatcher.PREFIXES).casefold()
+
+    @staticmethod
+    def aliases(src_template: str) -> set[str]:
+        name = CommandDispatcher.normalize(src_template)
+        return {name, "".join(name.split())} - {""}
+
+    def compile(self: CommandDispatcher, rows: Iterable[EventSubModel]) -> None:
+        commands: Dict[str, Tuple[TriggerAction, ...]] = {}
+        for row in rows:
+            if not row.src_template:
+                continue
+            action = TriggerAction.from_row(row)
+            if not action.steps:
+                continue
+            for alias in CommandDispatcher.aliases(action.steps[0].source_name):
+                commands[alias] = commands.get(alias, ()) + (action,)
+
+        heads = {k[0] for k in commands}
+        heads |= {k[0].upper() for k in commands}
+        heads |= set(CommandDispatcher.PREFIXES) if commands else set()
+
+        # Swap in one assignment per attribute so readers on other threads
+        # never observe a half-built table.
+        self.max_len = max(map(len, commands), default=0)
+        self.heads = frozenset(heads)
+        self.commands = commands
+        LOG.debug(f"Compiled {len(commands)} chat commands")
+
+    def match(
+        self: CommandDispatcher, text: str
+    ) -> Union[Tuple[TriggerAction, ...] | None]:
+        text = text.strip()
+        if not text or text[0] not in self.heads:
+            return None
+
+        commands = self.commands
+        if len(text) <= self.max_len + len(CommandDispatcher.PREFIXES):
+            actions = commands.get(CommandDispatcher.normalize(text))
+            if actions is not None:
+                return actions
+
+        if text[0] not in CommandDispatcher.PREFIXES:
+            return None
+        token = text.split(None, 1)[0]
+        return commands.get(CommandDispatcher.normalize(token))
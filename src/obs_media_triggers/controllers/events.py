@@ -1,37 +1,166 @@
 from __future__ import annotations
 
-from asyncio import run
-from typing import Awaitable, List
+from threading import Lock
 from logging import getLogger
+from dataclasses import dataclass
+from typing import Dict, List, Union
 from .twitch import TwitchClient
 from flask_sqlalchemy import SQLAlchemy
+from .dispatch import CommandDispatcher
+from .gifts import GiftAggregator, GiftRule
 from ..models import EventTypes, EventSubModel
 
 LOG = getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class EventSub:
+    """A detached copy of an `EventSubModel` row, safe to share across threads."""
+
+    id: int
+    obs_id: int
+    type: EventTypes
+    src_template: str
+    quantity: Union[int | None] = None
+    allow_anon: bool = False
+
+    @staticmethod
+    def from_row(row: EventSubModel) -> EventSub:
+        return EventSub(
+            row.id,
+            row.obs_id,
+            row.type,
+            row.src_template,
+            row.quantity,
+            bool(row.allow_anon),
+        )
+
+
 class EventSubsManager:
+    """The triggers saved for one OBS client, kept in memory.
+
+    Rows are loaded once and every change made through the manager is written
+    to the DB and then to memory, so handling an event never queries SQLite.
+    Call `invalidate` after editing the table behind the manager's back.
+    """
+
     db: SQLAlchemy
     twitch: TwitchClient
+    obs_id: int
+    dispatcher: CommandDispatcher
+    gifts: GiftAggregator
+    subs: Dict[int, EventSub]
 
     def __init__(
         self: EventSubsManager,
         db: SQLAlchemy,
         twitch: TwitchClient,
+        obs_id: int = None,
+        gift_window: float = GiftAggregator.DEFAULT_WINDOW,
     ) -> None:
         self.db = db
         self.twitch = twitch
+        self.obs_id = obs_id
+        self.dispatcher = CommandDispatcher()
+        self.gifts = GiftAggregator(gift_window)
+        self.subs = {}
+        self.__lock = Lock()
+        if obs_id is not None:
+            self.load()
 
     def get_all_event_sub_types(self: EventSubsManager) -> List[str]:
         return [e.name.replace("_", " ").title() for e in EventTypes]
 
-    def get_all_event_subs(
-        self: EventSubsManager, id: int = None
-    ) -> List[EventSubModel]:
-        if id is None:
-            return EventSubModel.query.all()
-        else:
-            return EventSubModel.query.filter_by(id=id).all()
+    def parse_event_sub_type(self: EventSubsManager, name: str) -> EventTypes:
+        try:
+            return EventTypes[name.strip().upper().replace(" ", "_")]
+        except (AttributeError, KeyError):
+            raise RuntimeError(f"Unknown event type: {name}")
+
+    def get_all_event_subs(self: EventSubsManager, id: int = None) -> List[EventSub]:
+        if id is not None and id == self.obs_id:
+            return list(self.subs.values())
+        query = EventSubModel.query
+        if id is not None:
+            query = query.filter_by(obs_id=id)
+        return [EventSub.from_row(r) for r in query.all()]
+
+    def get_event_sub(self: EventSubsManager, id: int) -> Union[EventSub | None]:
+        return self.subs.get(id)
+
+    def load(self: EventSubsManager) -> None:
+        rows = EventSubModel.query.filter_by(obs_id=self.obs_id).all()
+        with self.__lock:
+            self.subs = {r.id: EventSub.from_row(r) for r in rows}
+            self.compile()
+        LOG.debug(f"Loaded {len(rows)} event subs for OBS Client #{self.obs_id}")
+
+    def invalidate(self: EventSubsManager) -> None:
+        """Reload from the DB, for when the table was edited out of band."""
+        self.load()
+
+    def compile(self: EventSubsManager) -> None:
+        subs = list(self.subs.values())
+        self.dispatcher.compile(
+            s for s in subs if s.type == EventTypes.CHANNEL_CHAT_MESSAGE
+        )
+        self.gifts.rules = tuple(
+            GiftRule.from_row(s)
+            for s in subs
+            if s.type == EventTypes.CHANNEL_SUBSCRIPTION_GIFT and s.src_template
+        )
+
+    def __store(self: EventSubsManager, id: int, sub: Union[EventSub | None]) -> None:
+        # Swap in a new dict so readers never see one being changed
+        with self.__lock:
+            subs = dict(self.subs)
+            if sub is None:
+                subs.pop(id, None)
+            else:
+                subs[id] = sub
+            self.subs = subs
+            self.compile()
+
+    def create_event_sub(
+        self: EventSubsManager,
+        type: EventTypes,
+        src_template: str,
+        quantity: int = None,
+        allow_anon: bool = False,
+    ) -> EventSub:
+        if not src_template:
+            raise RuntimeError("An event needs an OBS source template!")
+        event_sub = EventSubModel(
+            obs_id=self.obs_id,
+            type=type,
+            src_template=src_template,
+            quantity=quantity,
+            allow_anon=allow_anon,
+        )
+        self.db.session.add(event_sub)
+        self.db.session.commit()
+        sub = EventSub.from_row(event_sub)
+        self.__store(sub.id, sub)
+        return sub
+
+    def update_event_sub(self: EventSubsManager, id: int, values: dict) -> EventSub:
+        row = EventSubModel.query.filter_by(id=id, obs_id=self.obs_id).one_or_none()
+        if row is None:
+            raise RuntimeError(f"Event #{id} was not found!")
+        for key, value in values.items():
+            setattr(row, key, value)
+        if not row.src_template:
+            self.db.session.rollback()
+            raise RuntimeError("An event needs an OBS source template!")
+        self.db.session.commit()
+        sub = EventSub.from_row(row)
+        self.__store(id, sub)
+        return sub
 
-    def add_event_sub(self: EventSubsManager, callback: Awaitable) -> None:
-        run(self.twitch.subscribe_to_chat_message_event(callback))
+    def delete_event_sub(self: EventSubsManager, id: int) -> None:
+        row = EventSubModel.query.filter_by(id=id, obs_id=self.obs_id).one_or_none()
+        if row is None:
+            raise RuntimeError(f"Event #{id} was not found!")
+        self.db.session.delete(row)
+        self.db.session.commit()
+        self.__store(id, None)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from threading import Lock
+from time import perf_counter
+from logging import getLogger
+from .twitch import TwitchClient
+from ..models import EventTypes
+from concurrent.futures import Future
+from .metrics import EVENTS_RECEIVED, TRIGGER_LATENCY
+from .tracing import Trace, TraceBuffer
+from .journal import EventJournal
+from typing import Callable, Dict, FrozenSet, Iterable, Union
+
+LOG = getLogger(__name__)
+
+Handler = Callable[[object, Trace], Iterable[Future]]
+
+
+class LatencyStats:
+    """Running latency figures for one fan-out target, in seconds."""
+
+    count: int
+    errors: int
+    last: float
+    max: float
+    total: float
+
+    def __init__(self: LatencyStats):
+        self.count = 0
+        self.errors = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+
+    @property
+    def mean(self: LatencyStats) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self: LatencyStats, seconds: float) -> None:
+        self.count += 1
+        self.last = seconds
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self: LatencyStats) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "last": self.last,
+            "mean": self.mean,
+            "max": self.max,
+        }
+
+
+class EventFanOut:
+    """Sends each incoming Twitch event to every OBS client subscribed to it.
+
+    The fan-out owns the Twitch subscription per event type and channel, and
+    routes each event to the clients set to trigger on its channel. Targets
+    hand their OBS work to the trigger executor on their own lane and return
+    its futures, so every target starts at the same time and the latency from
+    receipt to OBS acknowledging the request is recorded per target. Every
+    event also starts a trace that the targets add their spans to.
+    """
+
+    twitch: TwitchClient
+    targets: Dict[EventTypes, Dict[int, Handler]]
+    channels: Dict[int, FrozenSet[str]]
+    latency: Dict[int, LatencyStats]
+    traces: TraceBuffer
+    journal: Union[EventJournal | None]
+
+    def __init__(
+        self: EventFanOut,
+        twitch: TwitchClient,
+        trace_size: int = TraceBuffer.DEFAULT_SIZE,
+        journal: EventJournal = None,
+    ):
+        self.twitch = twitch
+        self.journal = journal
+        self.targets = {t: {} for t in EventTypes}
+        self.channels = {}
+        self.latency = {}
+        self.traces = TraceBuffer(trace_size)
+        self.__lock = Lock()
+        self.__callbacks = {
+            EventTypes.CHANNEL_CHAT_MESSAGE: self.dispatch_chat_message,
+            EventTypes.CHANNEL_SUBSCRIPTION_GIFT: self.dispatch_subscription_gift,
+        }
+
+    def add_target(
+        self: EventFanOut, type: EventTypes, id: int, handler: Handler
+    ) -> None:
+        with self.__lock:
+            targets = dict(self.targets[type])
+            targets[id] = handler
+            self.targets[type] = targets
+            self.latency.setdefault(id, LatencyStats())
+
+    def remove_target(self: EventFanOut, id: int) -> None:
+        with self.__lock:
+            for type, targets in self.targets.items():
+                if id in targets:
+                    targets = dict(targets)
+                    del targets[id]
+                    self.targets[type] = targets
+            self.latency.pop(id, None)
+            self.channels = {k: v for k, v in self.channels.items() if k != id}
+
+    def set_channels(self: EventFanOut, id: int, channels: Iterable[str]) -> None:
+        """Route only events from `channels` to target `id`; none means all."""
+        with self.__lock:
+            self.channels = {**self.channels, id: frozenset(channels)}
+
+    def subscribe(self: EventFanOut, type: EventTypes, user_id: str) -> None:
+        callback = self.__callbacks.get(type)
+        if callback is None:
+            LOG.warning(f"Subscribing to {type.name} is not supported yet!")
+            return
+        self.twitch.eventsub.subscribe(type, user_id, callback)
+
+    async def dispatch_chat_message(self: EventFanOut, event: object) -> None:
+        self.dispatch(
+            EventTypes.CHANNEL_CHAT_MESSAGE, event, event.event.message.text[:100]
+        )
+
+    async def dispatch_subscription_gift(self: EventFanOut, event: object) -> None:
+        data = event.event
+        gifter = "anonymous" if data.is_anonymous else data.user_login
+        self.dispatch(
+            EventTypes.CHANNEL_SUBSCRIPTION_GIFT, event, f"{data.total} from {gifter}"
+        )
+
+    def dispatch(
+        self: EventFanOut, type: EventTypes, event: object, summary: str = ""
+    ) -> None:
+        received = perf_counter()
+        trace = self.start_trace(type.name, summary)
+        channel = event.event.broadcaster_user_id
+        channels = self.channels
+        for id, handler in self.targets[type].items():
+            routed = channels.get(id)
+            if routed and channel not in routed:
+                continue
+            stats = self.latency.get(id)
+            try:
+                futures = handler(event, trace)
+            except Exception as e:
+                LOG.error(f"OBS Client #{id} failed to handle {type.name}: {e}")
+                trace.mark("failed", id, str(e))
+                if stats is not None:
+                    stats.errors += 1
+                continue
+            for future in futures:
+                future.add_done_callback(
+                    lambda f, id=id, stats=stats: self.__on_acked(
+                        f, id, stats, received
+                    )
+                )
+
+    def start_trace(self: EventFanOut, type: str, summary: str = "") -> Trace:
+        """Count, trace and journal an event arriving from Twitch or the API."""
+        trace = self.traces.start(type, summary)
+        EVENTS_RECEIVED.labels(type).inc()
+        if self.journal is not None:
+            trace.journal_id = self.journal.record_event(type, summary)
+        return trace
+
+    def __on_acked(
+        self: EventFanOut,
+        future: Future,
+        id: int,
+        stats: LatencyStats,
+        received: float,
+    ) -> None:
+        if stats is None:
+            return
+        if future.cancelled() or future.exception() is not None:
+            stats.errors += 1
+        else:
+            elapsed = perf_counter() - received
+            stats.record(elapsed)
+            TRIGGER_LATENCY.labels(id).observe(elapsed)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from threading import Lock
+from time import monotonic
+from logging import getLogger
+from dataclasses import dataclass
+from .dispatch import TriggerAction
+from typing import Dict, Iterable, List, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..models import EventSubModel
+
+LOG = getLogger(__name__)
+
+
+class SlidingWindow:
+    """Sum of the amounts added over the last `window` seconds.
+
+    The window is split into a fixed ring of buckets, so adding to it or
+    reading it costs at most one pass over the ring however many gifts it
+    holds. Amounts expire a bucket at a time.
+    """
+
+    BUCKETS = 12
+
+    __slots__ = ("span", "counts", "head", "total")
+
+    def __init__(self: SlidingWindow, window: float, now: float):
+        self.span = window / SlidingWindow.BUCKETS
+        self.counts = [0] * SlidingWindow.BUCKETS
+        self.head = int(now // self.span)
+        self.total = 0
+
+    def advance(self: SlidingWindow, now: float) -> int:
+        index = int(now // self.span)
+        expired = min(index - self.head, SlidingWindow.BUCKETS)
+        for step in range(1, expired + 1):
+            slot = (self.head + step) % SlidingWindow.BUCKETS
+            self.total -= self.counts[slot]
+            self.counts[slot] = 0
+        if index > self.head:
+            self.head = index
+        return self.total
+
+    def add(self: SlidingWindow, amount: int, now: float) -> int:
+        self.advance(now)
+        self.counts[self.head % SlidingWindow.BUCKETS] += amount
+        self.total += amount
+        return self.total
+
+
+@dataclass(frozen=True)
+class GiftRule:
+    quantity: int
+    allow_anon: bool
+    action: TriggerAction
+
+    @staticmethod
+    def from_row(row: EventSubModel) -> GiftRule:
+        return GiftRule(
+            max(row.quantity or 1, 1), bool(row.allow_anon), TriggerAction.from_row(row)
+        )
+
+
+class ChannelGifts:
+    """The gift windows of one broadcaster's channel."""
+
+    __slots__ = ("everyone", "named", "gifters")
+
+    everyone: SlidingWindow
+    named: SlidingWindow
+    gifters: Dict[Union[str | None], SlidingWindow]
+
+    def __init__(self: ChannelGifts, window: float, now: float):
+        self.everyone = SlidingWindow(window, now)
+        # The channel's total without anonymous gifts
+        self.named = SlidingWindow(window, now)
+        self.gifters = {}
+
+
+class GiftAggregator:
+    """Windowed gift-sub totals per channel, and per gifter in each channel.
+
+    A rule fires, at most once per gift event, whenever either the gifter's
+    total or the channel's total over the window crosses a multiple of its
+    quantity. Channels never add up, since one OBS client may route several.
+    Anonymous gifts share one gifter slot and only count, for the gifter and
+    the channel alike, towards rules that allow them.
+    """
+
+    DEFAULT_WINDOW = 60.0
+    MAX_GIFTERS = 4096
+    ANONYMOUS = None
+
+    window: float
+    channels: Dict[str, ChannelGifts]
+    rules: Tuple[GiftRule, ...]
+
+    def __init__(
+        self: GiftAggregator,
+        window: float = DEFAULT_WINDOW,
+        rules: Iterable[GiftRule] = (),
+    ):
+        if not window > 0:
+            raise RuntimeError(f"The gift window must be over 0 seconds, got: {window}")
+        self.window = window
+        self.channels = {}
+        self.rules = tuple(rules)
+        self.__lock = Lock()
+
+    @property
+    def channel_total(self: GiftAggregator) -> int:
+        """Gifts in the window, across every channel."""
+        now = monotonic()
+        with self.__lock:
+            return sum(c.everyone.advance(now) for c in self.channels.values())
+
+    def record(
+        self: GiftAggregator,
+        broadcaster_id: str,
+        gifter: Union[str | None],
+        amount: int,
+    ) -> List[TriggerAction]:
+        """Count `amount` gifts from `gifter` on a channel; return what fired."""
+        now = monotonic()
+        anonymous = gifter is GiftAggregator.ANONYMOUS
+        with self.__lock:
+            channel = self.channels.get(broadcaster_id)
+            if channel is None:
+                channel = self.channels[broadcaster_id] = ChannelGifts(self.window, now)
+            everyone = GiftAggregator.__count(channel.everyone, amount, now)
+            named = everyone
+            if not anonymous:
+                named = GiftAggregator.__count(channel.named, amount, now)
+            counter = channel.gifters.pop(gifter, None)
+            if counter is None:
+                self.__make_room(channel.gifters, now)
+                counter = SlidingWindow(self.window, now)
+            channel.gifters[gifter] = counter
+            own = GiftAggregator.__count(counter, amount, now)
+
+        fired = []
+        for rule in self.rules:
+            if anonymous and not rule.allow_anon:
+                continue
+            total = everyone if rule.allow_anon else named
+            if any(
+                after // rule.quantity > before // rule.quantity
+                for before, after in (own, total)
+            ):
+                fired.append(rule.action)
+        return fired
+
+    @staticmethod
+    def __count(counter: SlidingWindow, amount: int, now: float) -> Tuple[int, int]:
+        before = counter.advance(now)
+        return before, counter.add(amount, now)
+
+    @staticmethod
+    def __make_room(
+        gifters: Dict[Union[str | None], SlidingWindow], now: float
+    ) -> None:
+        if len(gifters) < GiftAggregator.MAX_GIFTERS:
+            return
+        for gifter in [g for g, c in gifters.items() if c.advance(now) == 0]:
+            del gifters[gifter]
+        # Least recently seen gifters come first
+        while len(gifters) >= GiftAggregator.MAX_GIFTERS:
+            del gifters[next(iter(gifters))]
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from time import time
+from logging import getLogger
+from threading import Event, Lock, Thread
+from typing import Dict, List, Union
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from ..models import JournalEntryModel
+
+LOG = getLogger(__name__)
+
+JOURNAL = JournalEntryModel.__table__
+COLUMNS = tuple(c.name for c in JOURNAL.columns)
+UPDATE_STATUS = (
+    JOURNAL.update()
+    .where(JOURNAL.c.id == bindparam("_id"))
+    .values(status=bindparam("status"), detail=bindparam("detail"))
+)
+
+
+class EventJournal:
+    """Append-only record of received events and the triggers they fired.
+
+    Entries are buffered in memory and written by a background thread, one
+    transaction per batch, so the event path never waits on SQLite. A status
+    change to an entry that is still buffered is made in the buffer, so most
+    triggers are written once, already acknowledged. Whatever is buffered when
+    the process dies, at most a flush interval's worth, is lost.
+
+    A batch the database could not take, because it was locked or unreachable,
+    is kept and written with the next one. Past `MAX_BUFFERED` entries the
+    oldest are dropped and counted in `lost`.
+
+    Triggers still queued when the app stopped are fired again once their OBS
+    client reconnects, unless they are older than `replay_age` seconds.
+    """
+
+    FLUSH_INTERVAL = 0.25
+    BATCH_SIZE = 512
+    MAX_BUFFERED = BATCH_SIZE * 16
+    DEFAULT_REPLAY_AGE = 300.0
+    PAGE_SIZE = 50
+
+    EVENT = "event"
+    TRIGGER = "trigger"
+
+    RECEIVED = "received"
+    QUEUED = "queued"
+    ACKED = "acked"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    REPLAYED = "replayed"
+    EXPIRED = "expired"
+
+    engine: Union[Engine | None]
+    replay_age: float
+    started_at: float
+    written: int
+    lost: int
+    failures: int
+
+    def __init__(self: EventJournal, replay_age: float = DEFAULT_REPLAY_AGE):
+        self.engine = None
+        self.replay_age = replay_age
+        self.started_at = time()
+        self.written = 0
+        self.lost = 0
+        self.failures = 0
+        self.__next_id = 0
+        self.__inserts: Dict[int, dict] = {}
+        self.__updates: Dict[int, dict] = {}
+        self.__lock = Lock()
+        self.__wake = Event()
+        self.__stop = Event()
+        self.__thread = None
+
+    def start(self: EventJournal, engine: Engine) -> None:
+        # Ids are handed out before rows are written, so status changes can
+        # refer to an entry that is still in the buffer
+        with engine.connect() as conn:
+            last = conn.execute(select(func.max(JOURNAL.c.id))).scalar()
+        self.__next_id = (last or 0) + 1
+        self.engine = engine
+        self.__thread = Thread(
+            target=self.__run, args=(engine,), name="omt-journal", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self: EventJournal) -> None:
+        """Write what is buffered and stop recording.
+
+        Called before OBS clients are torn down, so triggers cancelled by the
+        shutdown are left queued and replayed on the next start.
+        """
+        engine, self.engine = self.engine, None
+        if engine is None:
+            return
+        self.__stop.set()
+        self.__wake.set()
+        self.__thread.join()
+        self.__flush(engine)
+        with self.__lock:
+            left, self.__inserts, self.__updates = len(self.__inserts), {}, {}
+        if left:
+            self.lost += left
+            LOG.error(f"Stopped with {left} journal entries still unwritten")
+
+    def record_event(
+        self: EventJournal, type: str, summary: str = ""
+    ) -> Union[int | None]:
+        return self.__append(
+            kind=EventJournal.EVENT,
+            status=EventJournal.RECEIVED,
+            type=type,
+            summary=summary[:255],
+        )
+
+    def record_trigger(
+        self: EventJournal,
+        event_id: Union[int | None],
+        obs_id: int,
+        scene_name: str,
+        steps: str,
+        status: str = QUEUED,
+    ) -> Union[int | None]:
+        return self.__append(
+            kind=EventJournal.TRIGGER,
+            status=status,
+            event_id=event_id,
+            obs_id=obs_id,
+            scene_name=scene_name,
+            steps=steps[:255],
+        )
+
+    def set_status(
+        self: EventJournal,
+        id: Union[int | None],
+        status: str,
+        detail: Union[str | None] = None,
+    ) -> None:
+        if id is None or self.engine is None:
+            return
+        detail = None if detail is None else detail[:255]
+        with self.__lock:
+            row = self.__inserts.get(id)
+            if row is None:
+                self.__updates[id] = {"_id": id, "status": status, "detail": detail}
+            else:
+                row["status"] = status
+                row["detail"] = detail
+
+    def __append(self: EventJournal, **values) -> Union[int | None]:
+        if self.engine is None:
+            return None
+        row = dict.fromkeys(COLUMNS)
+        row.update(values, at=time())
+        with self.__lock:
+            id = row["id"] = self.__next_id
+            self.__next_id += 1
+            self.__inserts[id] = row
+            if len(self.__inserts) >= EventJournal.BATCH_SIZE:
+                self.__wake.set()
+        return id
+
+    def __flush(self: EventJournal, engine: Engine) -> None:
+        with self.__lock:
+            inserts, self.__inserts = list(self.__inserts.values()), {}
+            updates, self.__updates = list(self.__updates.values()), {}
+        if not inserts and not updates:
+            return
+        try:
+            with engine.begin() as conn:
+                if inserts:
+                    conn.execute(JOURNAL.insert(), inserts)
+                if updates:
+                    conn.execute(UPDATE_STATUS, updates)
+            self.written += len(inserts)
+        except OperationalError as e:
+            self.failures += 1
+            LOG.error(f"Failed to write {len(inserts)} journal entries, retrying: {e}")
+            self.__requeue(inserts, updates)
+        except SQLAlchemyError as e:
+            self.failures += 1
+            self.lost += len(inserts)
+            LOG.error(f"Failed to write {len(inserts)} journal entries: {e}")
+
+    def __requeue(
+        self: EventJournal, inserts: List[dict], updates: List[dict]
+    ) -> None:
+        with self.__lock:
+            # Changes buffered since the failed flush are newer, so they win
+            self.__updates = {row["_id"]: row for row in updates} | self.__updates
+            for row in inserts:
+                update = self.__updates.pop(row["id"], None)
+                if update is not None:
+                    row.update(status=update["status"], detail=update["detail"])
+            self.__inserts = {row["id"]: row for row in inserts} | self.__inserts
+            excess = len(self.__inserts) - EventJournal.MAX_BUFFERED
+            for id in list(self.__inserts)[: max(excess, 0)]:
+                del self.__inserts[id]
+            for id in list(self.__updates)[: -EventJournal.MAX_BUFFERED]:
+                del self.__updates[id]
+        if excess > 0:
+            self.lost += excess
+            LOG.error(f"Dropped {excess} journal entries the database never took")
+
+    def __run(self: EventJournal, engine: Engine) -> None:
+        while not self.__stop.is_set():
+            self.__wake.wait(EventJournal.FLUSH_INTERVAL)
+            self.__wake.clear()
+            self.__flush(engine)
+
+    def get_replayable(self: EventJournal, obs_id: int) -> List[Row]:
+        """Triggers for `obs_id` left queued by an earlier run of the app."""
+        if self.engine is None:
+            return []
+        cutoff = self.started_at - self.replay_age
+        queued = (JOURNAL.c.status == EventJournal.QUEUED) & (
+            JOURNAL.c.obs_id == obs_id
+        )
+        with self.engine.begin() as conn:
+            conn.execute(
+                JOURNAL.update()
+                .where(queued & (JOURNAL.c.at < cutoff))
+                .values(status=EventJournal.EXPIRED)
+            )
+            return conn.execute(
+                select(JOURNAL)
+                .where(queued & (JOURNAL.c.at < self.started_at))
+                .order_by(JOURNAL.c.id)
+            ).all()
+
+    def get_page(
+        self: EventJournal,
+        obs_id: int = None,
+        before: int = None,
+        size: int = PAGE_SIZE,
+    ) -> List[Row]:
+        """Newest entries first, starting below id `before`."""
+        if self.engine is None:
+            return []
+        query = select(JOURNAL).order_by(JOURNAL.c.id.desc()).limit(size)
+        if obs_id is not None:
+            query = query.where(JOURNAL.c.obs_id == obs_id)
+        if before is not None:
+            query = query.where(JOURNAL.c.id < before)
+        with self.engine.connect() as conn:
+            return conn.execute(query).all()
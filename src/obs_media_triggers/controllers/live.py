@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from time import time
+from threading import Lock
+from logging import getLogger
+from dataclasses import dataclass, field
+from queue import Empty, Full, Queue
+from typing import Iterable, List, Union
+
+LOG = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LiveUpdate:
+    obs_id: int
+    kind: str
+    data: dict
+    at: float = field(default_factory=time)
+
+    def to_dict(self: LiveUpdate) -> dict:
+        return {"obs_id": self.obs_id, "kind": self.kind, "at": self.at, **self.data}
+
+
+class LiveSubscription:
+    """The updates one browser tab is waiting on, for one OBS client or all."""
+
+    obs_id: Union[int | None]
+    kinds: Union[frozenset | None]
+    updates: Queue
+
+    def __init__(
+        self: LiveSubscription,
+        obs_id: Union[int | None],
+        size: int,
+        kinds: Union[Iterable[str] | None] = None,
+    ):
+        self.obs_id = obs_id
+        self.kinds = None if kinds is None else frozenset(kinds)
+        self.updates = Queue(size)
+        self.__closed = False
+
+    @property
+    def closed(self: LiveSubscription) -> bool:
+        return self.__closed
+
+    def close(self: LiveSubscription) -> None:
+        self.__closed = True
+        # Wake up the stream waiting on this subscription so it can end
+        try:
+            self.updates.put_nowait(None)
+        except Full:
+            pass
+
+    def wants(self: LiveSubscription, update: LiveUpdate) -> bool:
+        return (self.obs_id is None or self.obs_id == update.obs_id) and (
+            self.kinds is None or update.kind in self.kinds
+        )
+
+    def get(self: LiveSubscription, timeout: float) -> Union[LiveUpdate | None]:
+        """The next update, or None if there was none for `timeout` seconds."""
+        if self.__closed:
+            return None
+        try:
+            return self.updates.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class LiveFeed:
+    """Fans out connection, scene and trigger updates to dashboard pages.
+
+    Publishing never blocks the thread it is called from: an update is
+    dropped for any subscriber whose queue is full, since a tab that far
+    behind is better off reloading than catching up.
+
+    Every open stream holds a request thread, so at most `max_subscriptions`
+    may be open at once, leaving the other threads to everything else.
+    """
+
+    QUEUE_SIZE = 256
+
+    subscriptions: List[LiveSubscription]
+    max_subscriptions: Union[int | None]
+
+    def __init__(
+        self: LiveFeed, size: int = QUEUE_SIZE, max_subscriptions: int = None
+    ):
+        self.size = size
+        self.max_subscriptions = max_subscriptions
+        self.subscriptions = []
+        self.dropped = 0
+        self.__lock = Lock()
+
+    def subscribe(
+        self: LiveFeed, obs_id: int = None, kinds: Iterable[str] = None
+    ) -> LiveSubscription:
+        subscription = LiveSubscription(obs_id, self.size, kinds)
+        with self.__lock:
+            limit = self.max_subscriptions
+            if limit is not None and len(self.subscriptions) >= limit:
+                raise RuntimeError(f"All {limit} live update streams are in use!")
+            self.subscriptions = [*self.subscriptions, subscription]
+        return subscription
+
+    def unsubscribe(self: LiveFeed, subscription: LiveSubscription) -> None:
+        with self.__lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def close(self: LiveFeed) -> None:
+        """End every open stream, so shutting down does not wait on them."""
+        with self.__lock:
+            subscriptions, self.subscriptions = self.subscriptions, []
+        for subscription in subscriptions:
+            subscription.close()
+
+    def publish(self: LiveFeed, obs_id: int, kind: str, **data) -> None:
+        update = LiveUpdate(obs_id, kind, data)
+        for subscription in self.subscriptions:
+            if subscription.wants(update):
+                try:
+                    subscription.updates.put_nowait(update)
+                except Full:
+                    self.dropped += 1
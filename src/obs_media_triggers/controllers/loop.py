@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from logging import getLogger
+from threading import Thread, get_ident
+from concurrent.futures import Future
+from typing import Any, Coroutine, Union
+from asyncio import AbstractEventLoop, new_event_loop, run_coroutine_threadsafe
+
+LOG = getLogger(__name__)
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever on its own daemon thread.
+
+    Coroutines can be handed to it from any thread with `submit`, or awaited
+    synchronously with `run`, so sessions and sockets created on the loop stay
+    bound to a loop that outlives the call that created them.
+    """
+
+    name: str
+    loop: AbstractEventLoop
+    thread: Thread
+
+    def __init__(self: BackgroundLoop, name: str):
+        self.name = name
+        self.loop = new_event_loop()
+        self.thread = Thread(target=self.__run, name=name, daemon=True)
+        self.thread.start()
+
+    def __run(self: BackgroundLoop) -> None:
+        LOG.debug(f"Starting background loop: {self.name}")
+        self.loop.run_forever()
+        LOG.debug(f"Stopped background loop: {self.name}")
+
+    @property
+    def in_loop_thread(self: BackgroundLoop) -> bool:
+        return self.thread.ident == get_ident()
+
+    def submit(self: BackgroundLoop, coro: Coroutine) -> Future:
+        return run_coroutine_threadsafe(coro, self.loop)
+
+    def run(
+        self: BackgroundLoop, coro: Coroutine, timeout: Union[float | None] = None
+    ) -> Any:
+        if self.in_loop_thread:
+            coro.close()
+            raise RuntimeError(f"Cannot block on {self.name} from its own thread!")
+        return self.submit(coro).result(timeout)
+
+    def call_later(self: BackgroundLoop, delay: float, callback, *args) -> None:
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, callback, *args)
+
+    def stop(self: BackgroundLoop) -> None:
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if not self.in_loop_thread:
+            self.thread.join()
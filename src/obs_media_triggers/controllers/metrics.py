@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from threading import Lock
+from bisect import bisect_left
+from logging import getLogger
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LOG = getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+# Seconds, from sub-millisecond local OBS round trips up to a stalled socket
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+def format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric(ABC):
+    """A named metric, rendered from the samples it has at scrape time."""
+
+    TYPE = "untyped"
+
+    name: str
+    help: str
+    label_names: Labels
+
+    def __init__(self: Metric, name: str, help: str, label_names: Labels = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+
+    @abstractmethod
+    def samples(self: Metric) -> Iterable[str]:
+        pass
+
+    def render(self: Metric) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class SeriesMetric(Metric):
+    """A family of series recorded as they happen, told apart by label values."""
+
+    series: Dict[Labels, object]
+
+    def __init__(self: SeriesMetric, name: str, help: str, label_names: Labels = ()):
+        super().__init__(name, help, label_names)
+        self.series = {}
+        self.lock = Lock()
+
+    def labels(self: SeriesMetric, *values: object) -> object:
+        key = tuple(map(str, values))
+        series = self.series.get(key)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(key, self.new_series())
+        return series
+
+    def remove(self: SeriesMetric, *values: object) -> None:
+        with self.lock:
+            self.series.pop(tuple(map(str, values)), None)
+
+    @abstractmethod
+    def new_series(self: SeriesMetric) -> object:
+        pass
+
+
+class CounterSeries:
+    __slots__ = ("value", "lock")
+
+    def __init__(self: CounterSeries):
+        self.value = 0.0
+        self.lock = Lock()
+
+    def inc(self: CounterSeries, amount: float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class Counter(SeriesMetric):
+    TYPE = "counter"
+
+    def new_series(self: Counter) -> CounterSeries:
+        return CounterSeries()
+
+    def inc(self: Counter, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self: Counter) -> Iterable[str]:
+        for values, series in list(self.series.items()):
+            yield f"{self.name}{format_labels(self.label_names, values)} {series.value}"
+
+
+class HistogramSeries:
+    """Per-bucket counts; cumulated only when rendered."""
+
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self: HistogramSeries, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = Lock()
+
+    def observe(self: HistogramSeries, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(SeriesMetric):
+    TYPE = "histogram"
+
+    def __init__(
+        self: Histogram,
+        name: str,
+        help: str,
+        label_names: Labels = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_series(self: Histogram) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def observe(self: Histogram, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self: Histogram) -> Iterable[str]:
+        for values, series in list(self.series.items()):
+            with series.lock:
+                counts, total = list(series.counts), series.sum
+            running = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                running += count
+                labels = format_labels(self.label_names, values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {running}"
+            labels = format_labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {running}"
+
+
+class Gauge(Metric):
+    """A value read at scrape time from `collect`, keyed by label values."""
+
+    TYPE = "gauge"
+
+    def __init__(
+        self: Gauge,
+        name: str,
+        help: str,
+        label_names: Labels = (),
+        collect: Callable[[], Dict[Labels, float]] = dict,
+    ):
+        super().__init__(name, help, label_names)
+        self.collect = collect
+
+    def samples(self: Gauge) -> Iterable[str]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            LOG.error(f"Failed to collect {self.name}: {e}")
+            return
+        for labels, value in values.items():
+            yield f"{self.name}{format_labels(self.label_names, labels)} {value}"
+
+
+class MetricsRegistry:
+    """Every metric the app exposes, rendered in the Prometheus text format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    metrics: Dict[str, Metric]
+
+    def __init__(self: MetricsRegistry):
+        self.metrics = {}
+
+    def register(self: MetricsRegistry, metric: Metric) -> Metric:
+        # Unlabelled series are exported from the start, even while still 0
+        if not metric.label_names and isinstance(metric, SeriesMetric):
+            metric.labels()
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self: MetricsRegistry, name: str, help: str, label_names: Labels = ()
+    ) -> Counter:
+        return self.register(Counter(name, help, label_names))
+
+    def histogram(
+        self: MetricsRegistry, name: str, help: str, label_names: Labels = ()
+    ) -> Histogram:
+        return self.register(Histogram(name, help, label_names))
+
+    def gauge(
+        self: MetricsRegistry,
+        name: str,
+        help: str,
+        label_names: Labels,
+        collect: Callable[[], Dict[Labels, float]],
+    ) -> Gauge:
+        return self.register(Gauge(name, help, label_names, collect))
+
+    def render(self: MetricsRegistry) -> str:
+        blocks: List[str] = [m.render() for m in list(self.metrics.values())]
+        return "\n".join(blocks) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+EVENTS_RECEIVED = METRICS.counter(
+    "omt_events_received_total",
+    "Events received by type, from Twitch or the trigger API.",
+    ("type",),
+)
+DISPATCH_RESULTS = METRICS.counter(
+    "omt_dispatch_total",
+    "Chat messages checked against the trigger table, by result.",
+    ("result",),
+)
+TRIGGER_LATENCY = METRICS.histogram(
+    "omt_trigger_latency_seconds",
+    "Time from receiving a Twitch event to OBS acknowledging its trigger.",
+    ("obs_id",),
+)
+OBS_REQUEST_SECONDS = METRICS.histogram(
+    "omt_obs_request_seconds",
+    "Round trip of requests and request batches sent to OBS.",
+    ("obs_id",),
+)
+OBS_REQUEST_ERRORS = METRICS.counter(
+    "omt_obs_request_errors_total",
+    "Requests to OBS that failed, by kind of failure.",
+    ("obs_id", "kind"),
+)
+THROTTLE_VERDICTS = METRICS.counter(
+    "omt_throttle_verdicts_total",
+    "Triggers allowed, queued, coalesced or throttled, by overflow policy.",
+    ("policy", "verdict"),
+)
+THROTTLE_HELD = METRICS.counter(
+    "omt_throttle_held_total",
+    "Triggers held back by a cooldown or a full queue, by overflow policy.",
+    ("policy", "reason"),
+)
+OBS_RECONNECTS = METRICS.counter(
+    "omt_obs_reconnects_total", "Successful reconnects to an OBS host.", ("obs_id",)
+)
+EVENTSUB_RECONNECTS = METRICS.counter(
+    "omt_eventsub_reconnects_total",
+    "Reopened Twitch EventSub websockets.",
+    ("connection",),
+)
@@ -1,21 +1,53 @@
 from __future__ import annotations
 
-from time import sleep
-from typing import Union
+import json
+from uuid import uuid4
+from contextlib import contextmanager
+from typing import Iterator, Union
+from threading import Lock, RLock
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
 from logging import getLogger
 from .twitch import TwitchClient
-from obsws_python import ReqClient
-from .events import EventSubsManager
-from ..models import OBSWSClientModel
+from .scenes import SceneItemIndex
+from obsws_python import EventClient, ReqClient, Subs
+from .fanout import EventFanOut
+from .events import EventSub, EventSubsManager
+from .dispatch import TriggerAction, TriggerStep
+from flask import Flask, current_app
+from flask_login import current_user
+from werkzeug.datastructures import MultiDict
+from .triggers import TriggerExecutor
+from .throttle import Throttle, ThrottleConfig, Verdict
+from .gifts import GiftAggregator
+from .tracing import Trace, TraceBuffer
+from .live import LiveFeed
+from .journal import EventJournal
+from .bulk import ConfigTransfer
+from time import perf_counter
+from .metrics import (
+    METRICS,
+    DISPATCH_RESULTS,
+    OBS_REQUEST_ERRORS,
+    OBS_REQUEST_SECONDS,
+)
+from ..models import ChannelRouteModel, EventTypes, OBSWSClientModel
 from flask_sqlalchemy import SQLAlchemy
-from obsws_python.error import OBSSDKError
+from sqlalchemy.exc import SQLAlchemyError
+from websocket import WebSocketTimeoutException
+from obsws_python.error import OBSSDKError, OBSSDKRequestError, OBSSDKTimeoutError
+from obsws_python.baseclient import ObsClient
+from .supervisor import CONNECTION_ERRORS, ConnectionState, ConnectionSupervisor
 from twitchAPI.object.eventsub import ChannelChatMessageEvent, ChannelChatMessageData
+from twitchAPI.object.eventsub import ChannelSubscriptionGiftEvent
 
 LOG = getLogger(__name__)
 
 
 class OBSActiveClient(ReqClient):
     DEFAULT_ACTIVE_SCENE = "NO_ACTIVE_SCENE"
+    BATCH_SERIAL_REALTIME = 0
+    MEDIA_RESTART = "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_RESTART"
 
     db: SQLAlchemy
     db_info: OBSWSClientModel
@@ -23,15 +55,34 @@ class OBSActiveClient(ReqClient):
     host: str
     port: int
     password: str
+    timeout: int
     active_scene: str
     events: EventSubsManager
+    executor: TriggerExecutor
+    lock: Lock
+    scenes: SceneItemIndex
+    obs_events: EventClient
+    fanout: EventFanOut
+    throttle: Throttle
+    live: LiveFeed
+    media_playback: bool
+    playing: dict[str, tuple[str, int]]
+    journal: Union[EventJournal | None]
+    channels: set[str]
 
     def __init__(
         self: OBSActiveClient,
         db: SQLAlchemy,
         db_info: OBSWSClientModel,
         twitch: TwitchClient,
+        executor: TriggerExecutor,
+        fanout: EventFanOut,
+        throttle: ThrottleConfig,
         timeout: int = 1,
+        gift_window: float = GiftAggregator.DEFAULT_WINDOW,
+        live: LiveFeed = None,
+        media_playback: bool = False,
+        journal: EventJournal = None,
     ):
         super().__init__(
             host=db_info.host,
@@ -44,56 +95,555 @@ class OBSActiveClient(ReqClient):
         self.host = db_info.host
         self.port = db_info.port
         self.password = db_info.password
+        self.timeout = timeout
         self.active_scene = OBSActiveClient.DEFAULT_ACTIVE_SCENE
-        self.events = EventSubsManager(db, twitch)
+        self.events = EventSubsManager(db, twitch, db_info.id, gift_window)
+        self.executor = executor
+        self.fanout = fanout
+        self.throttle = Throttle(throttle, executor.timers)
+        self.live = LiveFeed() if live is None else live
+        self.media_playback = media_playback
+        self.journal = journal
+        # Media inputs shown by a trigger, until OBS says they finished playing
+        self.playing = {}
+        self.lock = Lock()
+
+        # Keep a live index of scene items so triggers never query OBS for ids
+        self.scenes = SceneItemIndex(self.__on_scenes_changed)
+        try:
+            self.__connect_events()
+        except Exception:
+            super().disconnect()
+            raise
+        try:
+            self.fanout.add_target(
+                EventTypes.CHANNEL_CHAT_MESSAGE, self.id, self.handle_chat_message
+            )
+            self.fanout.add_target(
+                EventTypes.CHANNEL_SUBSCRIPTION_GIFT,
+                self.id,
+                self.handle_subscription_gift,
+            )
+            self.load_channels()
+            self.subscribe_channels()
+        except Exception:
+            # The manager never sees this client, so nothing else would
+            # release its targets, lane or sockets
+            self.disconnect()
+            raise
 
     def __eq__(self: OBSActiveClient, other_id: int) -> bool:
         return self.id == other_id
 
-    def get_all_sources(self: OBSActiveClient):
+    def send(self: OBSActiveClient, param, data=None, raw=False):
+        # The websocket is shared by every trigger, so requests and their
+        # responses must not interleave across executor threads.
+        with self.lock:
+            with self.measure():
+                return super().send(param, data=data, raw=raw)
+
+    @contextmanager
+    def measure(self: OBSActiveClient) -> Iterator[None]:
+        began = perf_counter()
+        try:
+            yield
+        except OBSSDKTimeoutError:
+            OBS_REQUEST_ERRORS.labels(self.id, "timeout").inc()
+            raise
+        except Exception:
+            OBS_REQUEST_ERRORS.labels(self.id, "error").inc()
+            raise
+        OBS_REQUEST_SECONDS.labels(self.id).observe(perf_counter() - began)
+
+    def send_batch(
+        self: OBSActiveClient,
+        requests: list[tuple[str, Union[dict | None]]],
+        halt_on_failure: bool = False,
+    ) -> list[dict]:
+        """Send several requests as one obs-websocket v5 RequestBatch.
+
+        Returns the result of every request, in order. Raises if any failed.
+        """
+        with self.lock:
+            return self.__send_batch(requests, halt_on_failure)
+
+    def __send_batch(
+        self: OBSActiveClient,
+        requests: list[tuple[str, Union[dict | None]]],
+        halt_on_failure: bool = False,
+    ) -> list[dict]:
+        # Callers hold self.lock
+        payload = {
+            "op": 8,
+            "d": {
+                "requestId": uuid4().hex,
+                "haltOnFailure": halt_on_failure,
+                "executionType": OBSActiveClient.BATCH_SERIAL_REALTIME,
+                "requests": [
+                    {"requestType": t, "requestData": d} if d else {"requestType": t}
+                    for t, d in requests
+                ],
+            },
+        }
+        LOG.debug(f"Sending request batch {payload}")
+        with self.measure():
+            try:
+                self.base_client.ws.send(json.dumps(payload))
+                response = json.loads(self.base_client.ws.recv())
+            except WebSocketTimeoutException as e:
+                raise OBSSDKTimeoutError("Timeout while sending a request batch") from e
+
+            results = response["d"]["results"]
+            for result in results:
+                status = result["requestStatus"]
+                if not status["result"]:
+                    raise OBSSDKRequestError(
+                        result["requestType"], status["code"], status.get("comment")
+                    )
+        return results
+
+    def __connect_events(self: OBSActiveClient) -> None:
+        self.obs_events = EventClient(
+            host=self.host,
+            port=self.port,
+            password=self.password,
+            timeout=self.timeout,
+            subs=Subs.SCENES | Subs.SCENEITEMS | Subs.INPUTS | Subs.MEDIAINPUTS,
+        )
+        self.obs_events.callback.register(self.scenes.callbacks)
+        self.obs_events.callback.register(self.on_media_input_playback_ended)
+        self.scenes.load(self)
+        # Start on what OBS is showing, so unattended clients trigger right
+        # away; a scene picked in the dashboard survives reconnects
+        no_scene = self.active_scene == OBSActiveClient.DEFAULT_ACTIVE_SCENE
+        if no_scene and self.scenes.program_scene is not None:
+            self.active_scene = self.scenes.program_scene
+
+    def reconnect(self: OBSActiveClient) -> None:
+        with self.lock:
+            super().disconnect()
+            base_client = ObsClient(
+                host=self.host,
+                port=self.port,
+                password=self.password,
+                timeout=self.timeout,
+            )
+            base_client.authenticate()
+            self.base_client = base_client
+        self.obs_events.disconnect()
+        self.__connect_events()
+
+    def disconnect(self: OBSActiveClient) -> None:
+        self.fanout.remove_target(self.id)
+        self.executor.close_lane(self.id)
+        self.obs_events.disconnect()
+        super().disconnect()
+
+    def get_all_sources(self: OBSActiveClient) -> list[str]:
         LOG.debug(f"Looking for sources in active scene: {self.active_scene}")
-        items = self.get_scene_item_list(self.active_scene).scene_items
-        return list(map(lambda x: x["sourceName"], items))
+        return self.scenes.get_source_names(self.active_scene)
+
+    def get_scene_names(self: OBSActiveClient) -> list[str]:
+        return self.scenes.get_scene_names()
+
+    def set_active_scene(self: OBSActiveClient, scene_name: str) -> None:
+        self.active_scene = scene_name
+        self.live.publish(self.id, "active_scene", **self.snapshot())
+
+    def snapshot(self: OBSActiveClient) -> dict:
+        """Everything the events page shows about this client, from memory."""
+        return {
+            "active_scene": self.active_scene,
+            "program_scene": self.scenes.program_scene,
+            "scenes": self.get_scene_names(),
+            "sources": self.get_all_sources(),
+        }
+
+    def __on_scenes_changed(self: OBSActiveClient, kind: str) -> None:
+        self.live.publish(self.id, kind, **self.snapshot())
 
-    def subscribe_to_event(self: OBSActiveClient, form: dict) -> None:
+    def __publish_fired(self: OBSActiveClient, future: Future, sources: list) -> None:
+        error = None
+        if future.cancelled():
+            error = "cancelled"
+        elif future.exception() is not None:
+            error = str(future.exception())
+        self.live.publish(self.id, "fired", sources=sources, error=error)
+
+    def subscribe_to_event(self: OBSActiveClient, form: MultiDict) -> EventSub:
         LOG.debug(f'Subscribing to event with payload: {form}')
-        self.events.add_event_sub(self.handle_chat_message)
+        try:
+            quantity = form.get("e_quantity")
+            quantity = int(quantity) if quantity else None
+        except ValueError:
+            raise RuntimeError(f"Quantity must be a number, got: {quantity}")
+
+        # Steps keep the order they were typed in, hidden ones prefixed with -
+        steps = TriggerAction.parse_steps(form.get("e_template") or "")
+        event_sub = self.events.create_event_sub(
+            self.events.parse_event_sub_type(form.get("e_type")),
+            TriggerAction.format_steps(steps),
+            quantity=quantity,
+            allow_anon=form.get("e_allow_anon") is not None,
+        )
+        self.add_channel(current_user.id)
+        self.fanout.subscribe(event_sub.type, current_user.id)
+        return event_sub
+
+    def load_channels(self: OBSActiveClient) -> None:
+        self.channels = {
+            route.broadcaster_id
+            for route in ChannelRouteModel.query.filter_by(obs_id=self.id).all()
+        }
+        self.fanout.set_channels(self.id, self.channels)
+
+    def add_channel(self: OBSActiveClient, broadcaster_id: str) -> None:
+        if broadcaster_id in self.channels:
+            return
+        self.db.session.add(
+            ChannelRouteModel(obs_id=self.id, broadcaster_id=broadcaster_id)
+        )
+        self.db.session.commit()
+        self.channels = {*self.channels, broadcaster_id}
+        self.fanout.set_channels(self.id, self.channels)
+
+    def subscribe_channels(self: OBSActiveClient, broadcaster_id: str = None) -> None:
+        """Subscribe to this client's event types on its logged-in channels."""
+        pool = self.fanout.twitch.eventsub
+        channels = self.channels or set(pool.sessions)
+        if broadcaster_id is not None:
+            channels = channels & {broadcaster_id}
+        types = {sub.type for sub in self.events.get_all_event_subs(self.id)}
+        for channel in channels:
+            if not pool.has_broadcaster(channel):
+                continue
+            for type in types:
+                try:
+                    self.fanout.subscribe(type, channel)
+                except RuntimeError as e:
+                    LOG.error(f"OBS Client #{self.id} failed to subscribe: {e}")
+
+    def fire_steps(
+        self: OBSActiveClient,
+        steps: list[TriggerStep],
+        duration: float = TriggerExecutor.DEFAULT_DURATION,
+        trace: Union[Trace | None] = None,
+        scene_name: str = None,
+        entry: Union[int | None] = None,
+    ) -> Union[Future | None]:
+        """Apply every step in one request batch and revert them in another.
+
+        With media playback on, media inputs are restarted instead and stay
+        shown until OBS reports they finished, whatever the clip's length.
+        `entry` is the journal entry of a trigger that was journaled when the
+        throttle admitted it; otherwise one is recorded here.
+        """
+        scene_name = self.active_scene if scene_name is None else scene_name
+        start, stop, media = [], [], []
+        for step in steps:
+            item_id = self.scenes.get_item_id(scene_name, step.source_name)
+            if item_id is None:
+                LOG.error(f"A source for template: {step.source_name} was not found!")
+                if trace is not None:
+                    trace.mark("missing_source", self.id, step.source_name)
+                continue
+            if (
+                self.media_playback
+                and step.enabled
+                and self.scenes.is_media_input(step.source_name)
+            ):
+                start.extend(self.__media_requests(scene_name, item_id, step))
+                media.append((step.source_name, scene_name, item_id))
+                continue
+            for requests, enabled in ((start, step.enabled), (stop, not step.enabled)):
+                requests.append(
+                    (
+                        "SetSceneItemEnabled",
+                        {
+                            "sceneName": scene_name,
+                            "sceneItemId": item_id,
+                            "sceneItemEnabled": enabled,
+                        },
+                    )
+                )
+        if not start:
+            if self.journal is not None:
+                self.journal.set_status(entry, EventJournal.FAILED, "no source found")
+            return None
+
+        LOG.debug(f"Scheduling {len(start)} scene item changes in {scene_name}")
+        future = self.executor.fire(
+            partial(self.__start_batch, start, trace, media),
+            partial(self.__stop_batch, stop, trace) if stop else None,
+            duration=duration,
+            lane=self.id,
+            key=(scene_name, tuple(steps)),
+        )
+        if trace is not None:
+            trace.mark("queued", self.id, scene_name)
+            future.add_done_callback(lambda f: self.__trace_ack(f, trace))
+        if self.live.subscriptions:
+            sources = [step.source_name for step in steps]
+            future.add_done_callback(lambda f: self.__publish_fired(f, sources))
+        if self.journal is not None:
+            if entry is None:
+                entry = self.journal.record_trigger(
+                    None if trace is None else trace.journal_id,
+                    self.id,
+                    scene_name,
+                    TriggerAction.format_steps(steps),
+                )
+            future.add_done_callback(lambda f: self.__journal_ack(f, entry))
+        return future
+
+    def __journal_ack(self: OBSActiveClient, future: Future, entry: int) -> None:
+        if future.cancelled():
+            self.journal.set_status(entry, EventJournal.CANCELLED)
+        elif future.exception() is not None:
+            self.journal.set_status(
+                entry, EventJournal.FAILED, str(future.exception())
+            )
+        else:
+            self.journal.set_status(entry, EventJournal.ACKED)
+
+    def __media_requests(
+        self: OBSActiveClient, scene_name: str, item_id: int, step: TriggerStep
+    ) -> list[tuple[str, dict]]:
+        # Showing an item that is already shown is a no-op in OBS, so a media
+        # input that stays loaded is only ever rewound, never reloaded
+        return [
+            (
+                "SetSceneItemEnabled",
+                {
+                    "sceneName": scene_name,
+                    "sceneItemId": item_id,
+                    "sceneItemEnabled": True,
+                },
+            ),
+            (
+                "TriggerMediaInputAction",
+                {
+                    "inputName": step.source_name,
+                    "mediaAction": OBSActiveClient.MEDIA_RESTART,
+                },
+            ),
+        ]
+
+    def __start_batch(
+        self: OBSActiveClient,
+        requests: list[tuple[str, dict]],
+        trace: Union[Trace | None],
+        media: list[tuple[str, str, int]],
+        count: int,
+    ) -> list[dict]:
+        if count > 1:
+            LOG.debug(f"Playing one trigger for {count} identical chat messages")
+        if trace is not None:
+            trace.mark("sent", self.id, f"{len(requests)} requests x{count}")
+        with self.lock:
+            results = self.__send_batch(requests)
+            # Recorded before the event thread can look, even for a clip that
+            # ends while the batch is still in flight
+            for input_name, scene_name, item_id in media:
+                self.playing[input_name] = (scene_name, item_id)
+        return results
+
+    def on_media_input_playback_ended(self: OBSActiveClient, data) -> None:
+        """Hide a media input a trigger played, now that its clip is over."""
+        with self.lock:
+            played = self.playing.pop(data.input_name, None)
+        if played is None:
+            return
+        scene_name, item_id = played
+        hide = [
+            (
+                "SetSceneItemEnabled",
+                {
+                    "sceneName": scene_name,
+                    "sceneItemId": item_id,
+                    "sceneItemEnabled": False,
+                },
+            )
+        ]
+        LOG.debug(f"Media input {data.input_name} ended, hiding it")
+        lane = self.executor.lanes.get(self.id)
+        try:
+            # Never block the OBS event thread on a request
+            if lane is None:
+                raise RuntimeError("the client was disconnected")
+            lane.submit(partial(self.send_batch, hide))
+        except RuntimeError as e:
+            LOG.error(f"Failed to hide media input {data.input_name}: {e}")
 
-    # def toggle_media(self: OBSActiveClient, src_name: str) -> None:
-    #     scene_name = self.active_scene
-    #     item_id = self.get_scene_item_id(scene_name, src_name)
-    #     self.set_scene_item_enabled(scene_name, item_id, True)
-    #     sleep(3)
-    #     self.set_scene_item_enabled(scene_name, item_id, False)
+    def __stop_batch(
+        self: OBSActiveClient,
+        requests: list[tuple[str, dict]],
+        trace: Union[Trace | None],
+    ) -> list[dict]:
+        results = self.send_batch(requests)
+        if trace is not None:
+            trace.mark("disabled", self.id)
+        return results
+
+    def __trace_ack(self: OBSActiveClient, future: Future, trace: Trace) -> None:
+        if future.cancelled():
+            trace.mark("failed", self.id, "cancelled")
+        elif future.exception() is not None:
+            trace.mark("failed", self.id, str(future.exception()))
+        else:
+            trace.mark("acked", self.id)
 
-    async def handle_chat_message(self: OBSActiveClient, event: ChannelChatMessageEvent):
+    def handle_chat_message(
+        self: OBSActiveClient, event: ChannelChatMessageEvent, trace: Trace
+    ) -> list[Future]:
         data: ChannelChatMessageData = event.event
-        cmd = data.message.text.title()
-        srcs = self.get_all_sources()
+        actions = self.events.dispatcher.match(data.message.text)
+        if actions is None:
+            DISPATCH_RESULTS.labels("miss").inc()
+            trace.mark("unmatched", self.id)
+            return []
+        DISPATCH_RESULTS.labels("match").inc()
+        trace.mark("matched", self.id, " | ".join(a.src_template for a in actions))
+
+        verdict, future = self.fire_actions(actions, data.chatter_user_id, trace)
+        if verdict != Verdict.ALLOWED:
+            LOG.debug(f"Trigger {data.message.text} was {verdict.value}")
+        return [] if future is None else [future]
+
+    def handle_api_trigger(
+        self: OBSActiveClient, name: str, user: Union[str | None], trace: Trace
+    ) -> str:
+        """Fire the chat command `name` as if it had been sent in chat.
+
+        Returns what happened to it without waiting on OBS: accepted, queued,
+        throttled, or unknown when the client has no such trigger.
+        """
+        actions = self.events.dispatcher.match(name)
+        if actions is None:
+            trace.mark("unmatched", self.id)
+            return "unknown"
+        trace.mark("matched", self.id, " | ".join(a.src_template for a in actions))
 
-        if(cmd in srcs):
-            LOG.debug(f"Enabling Source by command: {cmd}")
-            item_id = self.get_scene_item_id(self.active_scene, cmd).scene_item_id
+        verdict, future = self.fire_actions(actions, user, trace)
+        if verdict == Verdict.ALLOWED:
+            return "accepted" if future is not None else "missing_source"
+        if verdict == Verdict.THROTTLED:
+            return "throttled"
+        return "queued"
 
-            if(item_id is None):
-                LOG.error(f'A source for cmd: {cmd} was not found!')
-                return
+    def fire_actions(
+        self: OBSActiveClient,
+        actions: tuple[TriggerAction, ...],
+        user: Union[str | None],
+        trace: Trace,
+    ) -> tuple[Verdict, Union[Future | None]]:
+        """Pass `actions` through the throttle, firing them if it allows."""
+        # Every trigger matched by one message goes out in a single batch
+        steps = [step for action in actions for step in action.steps]
+        entry = None
+        if self.journal is not None:
+            # Journaled before the throttle can hold it, so a trigger still
+            # held when the app stops is replayed on the next start
+            entry = self.journal.record_trigger(
+                trace.journal_id,
+                self.id,
+                self.active_scene,
+                TriggerAction.format_steps(steps),
+            )
+        verdict = self.throttle.admit(
+            actions, user, partial(self.fire_steps, steps, trace=trace, entry=entry)
+        )
+        if verdict != Verdict.ALLOWED:
+            trace.mark(verdict.value, self.id)
+            if self.journal is not None and verdict != Verdict.QUEUED:
+                self.journal.set_status(entry, verdict.value)
+            return verdict, None
+        return verdict, self.fire_steps(steps, trace=trace, entry=entry)
+
+    def handle_subscription_gift(
+        self: OBSActiveClient, event: ChannelSubscriptionGiftEvent, trace: Trace
+    ) -> list[Future]:
+        data = event.event
+        gifter = None if data.is_anonymous else data.user_id
+        actions = self.events.gifts.record(data.broadcaster_user_id, gifter, data.total)
+        if not actions:
+            trace.mark("below_quantity", self.id)
+            return []
 
-            self.set_scene_item_enabled(self.active_scene, item_id, True)
-            sleep(3)
-            LOG.debug(f"Disabling {cmd}#{item_id}")
-            self.set_scene_item_enabled(self.active_scene, item_id, False)
+        LOG.debug(f"{data.total} gifted subs set off {len(actions)} triggers")
+        trace.mark("matched", self.id, " | ".join(a.src_template for a in actions))
+        steps = [step for action in actions for step in action.steps]
+        future = self.fire_steps(steps, trace=trace)
+        return [] if future is None else [future]
 
 
 class OBSClientsManager:
-    active_clients: list[OBSActiveClient]
+    CONNECT_WORKERS = 16
+    API_EVENT = "API_TRIGGER"
+
+    active_clients: dict[int, OBSActiveClient]
     db: SQLAlchemy
     twitch: TwitchClient
+    executor: TriggerExecutor
+    fanout: EventFanOut
+    live: LiveFeed
+    supervisor: ConnectionSupervisor
+    throttle: ThrottleConfig
+    gift_window: float
+    media_playback: bool
+    journal: EventJournal
+    lock: RLock
+    connect_errors: dict[int, str]
 
-    def __init__(self: OBSClientsManager, db: SQLAlchemy, twitch: TwitchClient):
-        self.active_clients = []
+    def __init__(
+        self: OBSClientsManager,
+        db: SQLAlchemy,
+        twitch: TwitchClient,
+        throttle: ThrottleConfig = None,
+        executor: TriggerExecutor = None,
+        gift_window: float = None,
+        trace_size: int = None,
+        media_playback: bool = False,
+        replay_age: float = None,
+    ):
+        self.active_clients = {}
+        self.lock = RLock()
+        self.__connecting = set()
+        self.__connector = ThreadPoolExecutor(
+            max_workers=OBSClientsManager.CONNECT_WORKERS,
+            thread_name_prefix="omt-connect",
+        )
+        self.connect_errors = {}
         self.db = db
         self.twitch = twitch
+        self.gift_window = (
+            GiftAggregator.DEFAULT_WINDOW if gift_window is None else gift_window
+        )
+        self.throttle = ThrottleConfig() if throttle is None else throttle
+        self.media_playback = media_playback
+        self.executor = TriggerExecutor() if executor is None else executor
+        self.journal = EventJournal(
+            EventJournal.DEFAULT_REPLAY_AGE if replay_age is None else replay_age
+        )
+        self.fanout = EventFanOut(
+            twitch,
+            TraceBuffer.DEFAULT_SIZE if trace_size is None else trace_size,
+            self.journal,
+        )
+        self.live = LiveFeed()
+        self.supervisor = ConnectionSupervisor(on_state=self.__publish_state)
+        METRICS.gauge(
+            "omt_trigger_queue_depth",
+            "Triggers waiting per OBS client, in the throttle or on its lane.",
+            ("obs_id", "stage"),
+            self.get_queue_depths,
+        )
+        METRICS.gauge(
+            "omt_triggers_in_flight",
+            "Triggers started but not yet reverted, across all OBS clients.",
+            (),
+            lambda: {(): self.executor.pending},
+        )
 
     def __validate_permission(
         self: OBSClientsManager, db_info: OBSWSClientModel
@@ -101,34 +651,216 @@ class OBSClientsManager:
         return True
 
     def __getitem__(self: OBSClientsManager, id: int) -> OBSActiveClient:
-        matches = list(filter(lambda x: x == id, self.active_clients))
-        if len(matches) == 0:
+        client = self.active_clients.get(id)
+        if client is None:
             raise IndexError(f"Client #{id} was not found among the active clients!")
-        return matches[0]
+        return client
+
+    def get_queue_depths(self: OBSClientsManager) -> dict[tuple, int]:
+        depths = {}
+        for id, client in list(self.active_clients.items()):
+            depths[(id, "throttle")] = client.throttle.depth
+            lane = self.executor.lanes.get(id)
+            depths[(id, "lane")] = 0 if lane is None else lane.depth
+        return depths
+
+    def __publish_state(
+        self: OBSClientsManager,
+        id: int,
+        state: ConnectionState,
+        error: Union[str | None] = None,
+    ) -> None:
+        if error is None:
+            error = self.supervisor.get_last_error(id)
+        self.live.publish(id, "state", state=state.name, error=error)
 
     def is_disconnected(self: OBSClientsManager, id: int) -> bool:
-        return len(list(filter(lambda x: x.id == id, self.active_clients))) == 0
+        return id not in self.active_clients
+
+    def get_state(self: OBSClientsManager, id: int) -> ConnectionState:
+        if id in self.__connecting:
+            return ConnectionState.CONNECTING
+        return self.supervisor.get_state(id)
 
     def connect_client(self: OBSClientsManager, id: int) -> None:
+        self.__claim(id)
+        self.__connect(id)
+
+    def connect_client_async(self: OBSClientsManager, id: int) -> Future:
+        """Connect in the background; the client shows as CONNECTING meanwhile.
+
+        Must be called within an app context, which the connect runs under.
+        """
+        self.__claim(id)
+        app = current_app._get_current_object()
+        try:
+            return self.__connector.submit(self.__connect_in_background, app, id)
+        except RuntimeError:
+            with self.lock:
+                self.__connecting.discard(id)
+            raise
+
+    def connect_all(self: OBSClientsManager) -> list[Future]:
+        """Connect every saved client at once, skipping those already up."""
+        futures = []
+        for db_info in self.get_active_user_clients():
+            try:
+                futures.append(self.connect_client_async(db_info.id))
+            except RuntimeError as e:
+                LOG.debug(f"Not autoconnecting OBS Client #{db_info.id}: {e}")
+        LOG.info(f"Connecting {len(futures)} OBS clients in the background")
+        return futures
+
+    def __claim(self: OBSClientsManager, id: int) -> None:
+        # Connecting can take a while, so only claim the id under the lock
+        with self.lock:
+            if id in self.active_clients or id in self.__connecting:
+                raise RuntimeError(f"Client #{id} is already connected!")
+            self.__connecting.add(id)
+            self.connect_errors.pop(id, None)
+        self.__publish_state(id, ConnectionState.CONNECTING)
+
+    def __connect_in_background(self: OBSClientsManager, app: Flask, id: int) -> None:
+        with app.app_context():
+            try:
+                self.__connect(id)
+                LOG.info(f"OBS Client #{id} succesfully connected!")
+            except CONNECTION_ERRORS + (RuntimeError,) as e:
+                LOG.error(f"OBS Client #{id} connection failed: {e}")
+                self.connect_errors[id] = str(e)
+                self.__publish_state(id, ConnectionState.DISCONNECTED, str(e))
+                raise
+
+    def __connect(self: OBSClientsManager, id: int) -> None:
         try:
             db_info: OBSWSClientModel = self.get_db_info_by_id(id)
             if db_info is None:
                 raise RuntimeError(f"Client #{id} was not found in the DB!")
-            new_client = OBSActiveClient(self.db, db_info, self.twitch)
-            self.active_clients.append(new_client)
+            new_client = OBSActiveClient(
+                self.db,
+                db_info,
+                self.twitch,
+                self.executor,
+                self.fanout,
+                self.throttle,
+                gift_window=self.gift_window,
+                live=self.live,
+                media_playback=self.media_playback,
+                journal=self.journal,
+            )
+            with self.lock:
+                self.active_clients[id] = new_client
+                self.supervisor.watch(id, new_client)
+                self.__connecting.discard(id)
+            self.__publish_state(id, ConnectionState.CONNECTED)
             LOG.debug(f"Active client count: {len(self.active_clients)}")
+            self.__replay(new_client)
         except OBSSDKError as e:
             raise RuntimeError(e)
+        finally:
+            with self.lock:
+                self.__connecting.discard(id)
 
     def disconnect_client(self: OBSClientsManager, id: int) -> None:
-        client = self[id]
+        with self.lock:
+            client = self[id]
+            self.supervisor.forget(id)
+            del self.active_clients[id]
+        self.__publish_state(id, ConnectionState.DISCONNECTED)
         try:
             client.disconnect()
-            self.active_clients.remove(client)
             LOG.debug(f"Active client count: {len(self.active_clients)}")
         except OBSSDKError as e:
             raise RuntimeError(e)
 
+    def __replay(self: OBSClientsManager, client: OBSActiveClient) -> None:
+        """Fire the triggers a previous run queued for `client` but never ran."""
+        try:
+            entries = self.journal.get_replayable(client.id)
+        except SQLAlchemyError as e:
+            LOG.error(f"Failed to read journal for OBS Client #{client.id}: {e}")
+            return
+        for entry in entries:
+            self.journal.set_status(entry.id, EventJournal.REPLAYED)
+            client.fire_steps(
+                TriggerAction.parse_steps(entry.steps), scene_name=entry.scene_name
+            )
+        if entries:
+            LOG.info(f"Replayed {len(entries)} triggers for OBS Client #{client.id}")
+
+    def shutdown(self: OBSClientsManager) -> None:
+        # Stop journaling first, so triggers cut short are replayed next start
+        self.journal.stop()
+        self.live.close()
+        self.__connector.shutdown(wait=False, cancel_futures=True)
+        for id in list(self.active_clients):
+            try:
+                self.disconnect_client(id)
+            except (IndexError, RuntimeError) as e:
+                LOG.error(f"OBS Client #{id} failed to disconnect cleanly: {e}")
+        self.supervisor.stop()
+        self.executor.shutdown()
+
+    def subscribe_channel(self: OBSClientsManager, broadcaster_id: str) -> None:
+        """Subscribe connected clients to the events of a channel that logged in."""
+        for client in list(self.active_clients.values()):
+            client.subscribe_channels(broadcaster_id)
+
+    def invalidate_event_subs(self: OBSClientsManager, obs_id: int = None) -> None:
+        """Reload cached event subs after the table was edited outside the app."""
+        clients = list(self.active_clients.values())
+        for client in clients:
+            if obs_id is None or client.id == obs_id:
+                client.events.invalidate()
+
+    def fire_trigger(
+        self: OBSClientsManager,
+        name: str,
+        obs_id: int = None,
+        user: str = None,
+    ) -> list[dict]:
+        """Fire the trigger `name` on client `obs_id`, or on every connected one.
+
+        Never waits on OBS: each client reports what its throttle decided and
+        the trigger itself runs on that client's lane.
+        """
+        trace = self.fanout.start_trace(OBSClientsManager.API_EVENT, name[:100])
+        if obs_id is None:
+            clients = list(self.active_clients.values())
+        else:
+            client = self.active_clients.get(obs_id)
+            if client is None:
+                trace.mark("not_connected", obs_id)
+                return [{"obs_id": obs_id, "status": "not_connected"}]
+            clients = [client]
+
+        results = []
+        for client in clients:
+            try:
+                status = client.handle_api_trigger(name, user, trace)
+            except Exception as e:
+                LOG.error(f"OBS Client #{client.id} failed to fire {name}: {e}")
+                trace.mark("failed", client.id, str(e))
+                status = "failed"
+            results.append({"obs_id": client.id, "status": status})
+        return results
+
+    def export_config(self: OBSClientsManager, include_secrets: bool = False) -> dict:
+        return ConfigTransfer(self.db).export(include_secrets)
+
+    def import_config(
+        self: OBSClientsManager, data: object, replace: bool = False
+    ) -> dict:
+        result = ConfigTransfer(self.db).load(data, replace=replace)
+        # Connected clients pick up their new triggers and channels in one go
+        for id in result["obs_ids"]:
+            client = self.active_clients.get(id)
+            if client is not None:
+                client.events.invalidate()
+                client.load_channels()
+                client.subscribe_channels()
+        return result
+
     def add_client(self: OBSClientsManager, host: str, port: int, password: str):
         new_client = OBSWSClientModel(host=host, port=port, password=password)
         self.db.session.add(new_client)
@@ -147,6 +879,7 @@ class OBSClientsManager:
         if db_info is None:
             raise RuntimeError("client not found")
         self.__validate_permission(db_info)
+        ChannelRouteModel.query.filter_by(obs_id=id).delete()
         self.db.session.delete(db_info)
         self.db.session.commit()
 
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from time import monotonic
+from logging import getLogger
+from collections import deque
+from dataclasses import dataclass, field
+from concurrent.futures import Future
+from threading import Condition, Thread
+from typing import Callable, Deque, Dict, Hashable, Tuple, Union
+
+LOG = getLogger(__name__)
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class PendingTrigger:
+    key: Hashable
+    action: Callable[[int], object]
+    ready_at: float
+    count: int = 1
+    future: Future = field(default_factory=Future)
+
+
+class TriggerQueue:
+    """A bounded, coalescing queue of OBS work served by one worker thread.
+
+    Triggers are held for `window` seconds before they run. Any identical
+    trigger (same key) that arrives while one is still pending joins it instead
+    of queueing again, so the pending trigger runs once and receives the
+    aggregate count. Untimed work such as reverting a finished trigger goes
+    through `submit`, which is never coalesced and runs ahead of new triggers.
+    """
+
+    DEFAULT_SIZE = 64
+    DEFAULT_WINDOW = 0.0
+
+    name: str
+    size: int
+    window: float
+    executed: int
+    coalesced: int
+    dropped: int
+
+    def __init__(
+        self: TriggerQueue,
+        name: str,
+        size: int = DEFAULT_SIZE,
+        window: float = DEFAULT_WINDOW,
+    ):
+        self.name = name
+        self.size = size
+        self.window = window
+        self.executed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.__pending: Dict[Hashable, PendingTrigger] = {}
+        self.__urgent: Deque[PendingTrigger] = deque()
+        self.__closed = False
+        self.__cond = Condition()
+        self.__thread = Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    @property
+    def depth(self: TriggerQueue) -> int:
+        return len(self.__pending) + len(self.__urgent)
+
+    def put(
+        self: TriggerQueue, key: Hashable, action: Callable[[int], object]
+    ) -> Tuple[Future, bool]:
+        """Queue `action` under `key`, or join an identical pending trigger.
+
+        Returns the future of the execution and whether this call created it.
+        """
+        if key is None:
+            key = object()
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError(f"Trigger queue {self.name} is closed")
+            pending = self.__pending.get(key)
+            if pending is not None:
+                pending.count += 1
+                self.coalesced += 1
+                return pending.future, False
+            if len(self.__pending) >= self.size:
+                self.dropped += 1
+                future = Future()
+                future.set_exception(QueueFull(f"Trigger queue {self.name} is full"))
+                return future, True
+
+            pending = PendingTrigger(key, action, monotonic() + self.window)
+            self.__pending[key] = pending
+            self.__cond.notify()
+            return pending.future, True
+
+    def submit(self: TriggerQueue, fn: Callable[[], object]) -> Future:
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError(f"Trigger queue {self.name} is closed")
+            pending = PendingTrigger(None, lambda count: fn(), 0.0)
+            self.__urgent.append(pending)
+            self.__cond.notify()
+            return pending.future
+
+    def close(self: TriggerQueue) -> None:
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify()
+            abandoned = [*self.__pending.values(), *self.__urgent]
+            self.__pending.clear()
+            self.__urgent.clear()
+        for pending in abandoned:
+            pending.future.cancel()
+
+    def __next(self: TriggerQueue) -> Union[PendingTrigger | None]:
+        with self.__cond:
+            while True:
+                if self.__closed:
+                    return None
+                if self.__urgent:
+                    return self.__urgent.popleft()
+                if self.__pending:
+                    key, pending = next(iter(self.__pending.items()))
+                    wait = pending.ready_at - monotonic()
+                    if wait <= 0:
+                        return self.__pending.pop(key)
+                    self.__cond.wait(wait)
+                else:
+                    self.__cond.wait()
+
+    def __run(self: TriggerQueue) -> None:
+        while (pending := self.__next()) is not None:
+            if not pending.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = pending.action(pending.count)
+            except BaseException as e:
+                pending.future.set_exception(e)
+            else:
+                pending.future.set_result(result)
+            self.executed += 1
+            if pending.count > 1:
+                LOG.debug(f"{self.name} ran {pending.key} once for {pending.count} triggers")
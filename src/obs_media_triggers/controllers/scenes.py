@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from threading import RLock
+from logging import getLogger
+from dataclasses import dataclass
+from obsws_python import ReqClient
+from typing import Callable, Dict, List, Union
+
+LOG = getLogger(__name__)
+
+
+@dataclass
+class SceneItem:
+    id: int
+    source_name: str
+    enabled: bool
+
+
+class SceneItemIndex:
+    """In-memory map of scene -> source name -> scene item.
+
+    The index is loaded once with `load` and then kept current by registering
+    its `on_*` methods as obsws `EventClient` callbacks, so lookups on the
+    trigger path never make a round trip to OBS.
+
+    `on_change(kind)` is called after the scenes, their sources or the program
+    scene change, but not when an item is merely shown or hidden.
+    """
+
+    MEDIA_INPUT_KINDS = frozenset({"ffmpeg_source", "vlc_source"})
+
+    program_scene: Union[str | None]
+    by_name: Dict[str, Dict[str, SceneItem]]
+    by_id: Dict[str, Dict[int, SceneItem]]
+    input_kinds: Dict[str, str]
+    on_change: Union[Callable[[str], None] | None]
+
+    def __init__(
+        self: SceneItemIndex, on_change: Union[Callable[[str], None] | None] = None
+    ):
+        self.program_scene = None
+        self.by_name = {}
+        self.by_id = {}
+        self.input_kinds = {}
+        self.on_change = on_change
+        self.__lock = RLock()
+
+    @property
+    def callbacks(self: SceneItemIndex) -> list:
+        return [
+            self.on_current_program_scene_changed,
+            self.on_scene_created,
+            self.on_scene_removed,
+            self.on_scene_name_changed,
+            self.on_scene_item_created,
+            self.on_scene_item_removed,
+            self.on_scene_item_enable_state_changed,
+            self.on_input_created,
+            self.on_input_removed,
+            self.on_input_name_changed,
+        ]
+
+    def load(self: SceneItemIndex, req: ReqClient) -> None:
+        with self.__lock:
+            scene_list = req.get_scene_list()
+            self.program_scene = scene_list.current_program_scene_name
+            self.by_name.clear()
+            self.by_id.clear()
+            self.input_kinds.clear()
+            for scene in scene_list.scenes:
+                name = scene["sceneName"]
+                self.__add_scene(name)
+                for item in req.get_scene_item_list(name).scene_items:
+                    self.__add_item(
+                        name,
+                        item["sceneItemId"],
+                        item["sourceName"],
+                        item["sceneItemEnabled"],
+                    )
+                    if item.get("inputKind"):
+                        self.input_kinds[item["sourceName"]] = item["inputKind"]
+        LOG.debug(f"Indexed {len(self.by_name)} scenes, program: {self.program_scene}")
+        self.__changed("scenes")
+
+    def get_scene_names(self: SceneItemIndex) -> List[str]:
+        return list(self.by_name)
+
+    def get_source_names(self: SceneItemIndex, scene_name: str) -> List[str]:
+        return list(self.by_name.get(scene_name, ()))
+
+    def get_item(
+        self: SceneItemIndex, scene_name: str, source_name: str
+    ) -> Union[SceneItem | None]:
+        items = self.by_name.get(scene_name)
+        if items is None:
+            return None
+        return items.get(source_name)
+
+    def get_item_id(
+        self: SceneItemIndex, scene_name: str, source_name: str
+    ) -> Union[int | None]:
+        item = self.get_item(scene_name, source_name)
+        return None if item is None else item.id
+
+    def is_media_input(self: SceneItemIndex, source_name: str) -> bool:
+        return self.input_kinds.get(source_name) in SceneItemIndex.MEDIA_INPUT_KINDS
+
+    def __changed(self: SceneItemIndex, kind: str) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change(kind)
+            except Exception as e:
+                LOG.error(f"Scene index listener failed on {kind}: {e}")
+
+    def __add_scene(self: SceneItemIndex, scene_name: str) -> None:
+        self.by_name.setdefault(scene_name, {})
+        self.by_id.setdefault(scene_name, {})
+
+    def __add_item(
+        self: SceneItemIndex,
+        scene_name: str,
+        item_id: int,
+        source_name: str,
+        enabled: bool,
+    ) -> None:
+        self.__add_scene(scene_name)
+        item = SceneItem(item_id, source_name, enabled)
+        self.by_name[scene_name][source_name] = item
+        self.by_id[scene_name][item_id] = item
+
+    def on_current_program_scene_changed(self: SceneItemIndex, data) -> None:
+        self.program_scene = data.scene_name
+        self.__changed("program_scene")
+
+    def on_scene_created(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            self.__add_scene(data.scene_name)
+        self.__changed("scenes")
+
+    def on_scene_removed(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            self.by_name.pop(data.scene_name, None)
+            self.by_id.pop(data.scene_name, None)
+        self.__changed("scenes")
+
+    def on_scene_name_changed(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            self.by_name[data.scene_name] = self.by_name.pop(data.old_scene_name, {})
+            self.by_id[data.scene_name] = self.by_id.pop(data.old_scene_name, {})
+            if self.program_scene == data.old_scene_name:
+                self.program_scene = data.scene_name
+        self.__changed("scenes")
+
+    def on_scene_item_created(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            # Creation events do not carry the enabled state; new items are
+            # visible by default in OBS.
+            self.__add_item(data.scene_name, data.scene_item_id, data.source_name, True)
+        self.__changed("sources")
+
+    def on_scene_item_removed(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            item = self.by_id.get(data.scene_name, {}).pop(data.scene_item_id, None)
+            if item is not None:
+                self.by_name[data.scene_name].pop(item.source_name, None)
+        self.__changed("sources")
+
+    def on_scene_item_enable_state_changed(self: SceneItemIndex, data) -> None:
+        item = self.by_id.get(data.scene_name, {}).get(data.scene_item_id)
+        if item is not None:
+            item.enabled = data.scene_item_enabled
+
+    def on_input_created(self: SceneItemIndex, data) -> None:
+        self.input_kinds[data.input_name] = data.input_kind
+
+    def on_input_removed(self: SceneItemIndex, data) -> None:
+        self.input_kinds.pop(data.input_name, None)
+
+    def on_input_name_changed(self: SceneItemIndex, data) -> None:
+        with self.__lock:
+            kind = self.input_kinds.pop(data.old_input_name, None)
+            if kind is not None:
+                self.input_kinds[data.input_name] = kind
+            for items in self.by_name.values():
+                item = items.pop(data.old_input_name, None)
+                if item is not None:
+                    item.source_name = data.input_name
+                    items[data.input_name] = item
+        self.__changed("sources")
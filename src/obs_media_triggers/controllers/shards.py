@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+from itertools import count
+from threading import RLock
+from logging import getLogger
+from operator import methodcaller
+from aiohttp import ClientError, ClientSession
+from .loop import BackgroundLoop
+from ..models import EventTypes
+from .metrics import EVENTSUB_RECONNECTS
+from .supervisor import ConnectionState, ConnectionSupervisor
+from twitchAPI.twitch import Twitch
+from twitchAPI.type import AuthScope, TwitchAPIException, TwitchBackendException
+from twitchAPI.eventsub.websocket import EventSubWebsocket
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple, Union
+
+LOG = getLogger(__name__)
+
+SubKey = Tuple[EventTypes, str]
+Callback = Callable[[object], Awaitable[None]]
+
+
+class EventSubShard:
+    """One EventSub websocket, holding subscriptions for one broadcaster.
+
+    The pool's supervisor heartbeats a shard with `check()`, which asks Twitch
+    which subscriptions are still enabled on the shard's session, and calls
+    `reconnect()` once they are gone for good.
+    """
+
+    pool: EventSubPool
+    id: int
+    broadcaster_id: str
+    socket: Union[EventSubWebsocket | None]
+    keys: Set[SubKey]
+    missing: Set[SubKey]
+
+    def __init__(self: EventSubShard, pool: EventSubPool, id: int, broadcaster_id: str):
+        self.pool = pool
+        self.id = id
+        self.broadcaster_id = broadcaster_id
+        self.socket = None
+        self.keys = set()
+        self.missing = set()
+
+    def __len__(self: EventSubShard) -> int:
+        return len(self.keys)
+
+    @property
+    def session(self: EventSubShard) -> Twitch:
+        return self.pool.sessions[self.broadcaster_id]
+
+    def open(self: EventSubShard) -> None:
+        socket = EventSubWebsocket(self.session, connection_url=self.pool.connection_url)
+        if self.pool.reconnect_delays is not None:
+            socket.reconnect_delay_steps = list(self.pool.reconnect_delays)
+        # `start` waits forever when its first connect fails, so make sure
+        # Twitch is reachable before handing over
+        self.pool.loop.run(self.__probe(socket.connection_url))
+        socket.start()
+        self.socket = socket
+        self.missing = set()
+
+    async def __probe(self: EventSubShard, url: str) -> None:
+        async with ClientSession(timeout=self.session.session_timeout) as session:
+            async with session.ws_connect(url):
+                pass
+
+    def close(self: EventSubShard) -> None:
+        socket, self.socket = self.socket, None
+        if socket is None:
+            return
+        try:
+            self.pool.loop.run(socket.stop(), timeout=5)
+        except RuntimeError:
+            pass  # It was never started
+        except Exception as e:
+            LOG.error(f"Failed to stop Twitch EventSub cleanly: {e}")
+
+    def listen(self: EventSubShard, key: SubKey, callback: Callback) -> None:
+        type, broadcaster_id = key
+
+        # Events arrive on the socket's own loop and are handled on the pool's
+        async def deliver(event: object) -> None:
+            self.pool.loop.submit(callback(event))
+
+        if type == EventTypes.CHANNEL_CHAT_MESSAGE:
+            listen = self.socket.listen_channel_chat_message(
+                broadcaster_id, broadcaster_id, deliver
+            )
+        elif type == EventTypes.CHANNEL_SUBSCRIPTION_GIFT:
+            listen = self.socket.listen_channel_subscription_gift(broadcaster_id, deliver)
+        else:
+            raise RuntimeError(f"Subscribing to {type.name} is not supported yet!")
+        res = self.pool.loop.run(listen)
+        LOG.info(f"Registered subscription with Twitch: {res}")
+
+    def check(self: EventSubShard) -> None:
+        """Raise once a subscription is missing from Twitch two checks running.
+
+        Twitch drops websocket subscriptions with their session, and the
+        socket subscribes again by itself after reconnecting, so one missed
+        check may just be a reconnect in progress.
+        """
+        keys, socket = set(self.keys), self.socket
+        if socket is None:
+            raise TwitchBackendException("EventSub connection is closed")
+        enabled = self.pool.loop.run(self.__enabled(), timeout=10)
+        session_id = socket.active_session.id
+        missing = {
+            k
+            for k in keys
+            if (EventSubPool.SUB_TYPES[k[0]], k[1], session_id) not in enabled
+        }
+        lost, self.missing = missing & self.missing, missing
+        if lost:
+            raise TwitchBackendException(
+                f"Twitch dropped {len(lost)} subscriptions of session {session_id}"
+            )
+
+    async def __enabled(self: EventSubShard) -> Set[Tuple[str, str, str]]:
+        # Twitch.get_eventsub_subscriptions only takes an app token, while
+        # websocket subscriptions are only listed for the user that made them
+        session = self.session
+        token = await session.get_refreshed_user_auth_token()
+        headers = {"Client-ID": session.app_id, "Authorization": f"Bearer {token}"}
+        url = f"{session.base_url}eventsub/subscriptions"
+        params = {"status": "enabled"}
+        enabled = set()
+        async with ClientSession(timeout=session.session_timeout) as client:
+            while True:
+                async with client.get(url, headers=headers, params=params) as res:
+                    res.raise_for_status()
+                    body = await res.json()
+                for sub in body.get("data", []):
+                    enabled.add(
+                        (
+                            sub["type"],
+                            sub["condition"].get("broadcaster_user_id"),
+                            sub["transport"].get("session_id"),
+                        )
+                    )
+                cursor = body.get("pagination", {}).get("cursor")
+                if not cursor:
+                    return enabled
+                params["after"] = cursor
+
+    def reconnect(self: EventSubShard) -> None:
+        with self.pool.lock:
+            if self not in self.pool.shards:
+                return
+            self.close()
+            self.open()
+            for key in list(self.keys):
+                self.listen(key, self.pool.wanted[key])
+
+
+class EventSubPool:
+    """EventSub websockets for every broadcaster logged into the app.
+
+    Twitch caps how many subscriptions a websocket may hold and how many
+    websockets one user token may open. Each broadcaster gets a Twitch
+    session of their own, and their subscriptions go to the least loaded of
+    their websockets, opening another one while under the cap. A websocket
+    that loses its subscriptions and cannot get them back by itself is
+    reopened by the pool's supervisor, which subscribes it again.
+    """
+
+    MAX_SUBSCRIPTIONS = 300
+    MAX_CONNECTIONS = 3
+    HEARTBEAT_INTERVAL = 30.0
+    CONNECTION_ERRORS = (TwitchAPIException, ClientError, OSError, TimeoutError)
+    SUB_TYPES = {
+        EventTypes.CHANNEL_CHAT_MESSAGE: "channel.chat.message",
+        EventTypes.CHANNEL_SUBSCRIPTION_GIFT: "channel.subscription.gift",
+    }
+
+    twitch: Twitch
+    loop: BackgroundLoop
+    scopes: List[AuthScope]
+    connection_url: Union[str | None]
+    reconnect_delays: Union[List[float] | None]
+    shard_size: int
+    max_shards: int
+    sessions: Dict[str, Twitch]
+    shards: List[EventSubShard]
+    wanted: Dict[SubKey, Callback]
+    placed: Dict[SubKey, EventSubShard]
+    lock: RLock
+    supervisor: ConnectionSupervisor
+
+    def __init__(
+        self: EventSubPool,
+        twitch: Twitch,
+        loop: BackgroundLoop,
+        scopes: List[AuthScope],
+        shard_size: int = MAX_SUBSCRIPTIONS,
+        max_shards: int = MAX_CONNECTIONS,
+    ):
+        self.twitch = twitch
+        self.loop = loop
+        self.scopes = scopes
+        self.connection_url = None
+        self.reconnect_delays = None
+        self.shard_size = max(shard_size, 1)
+        self.max_shards = max(max_shards, 1)
+        self.sessions = {}
+        self.shards = []
+        self.wanted = {}
+        self.placed = {}
+        self.lock = RLock()
+        self.supervisor = ConnectionSupervisor(
+            name="EventSub connection",
+            heartbeat=methodcaller("check"),
+            errors=EventSubPool.CONNECTION_ERRORS,
+            reconnects=EVENTSUB_RECONNECTS,
+            interval=EventSubPool.HEARTBEAT_INTERVAL,
+        )
+        self.__ids = count(1)
+
+    def add_broadcaster(
+        self: EventSubPool,
+        broadcaster_id: str,
+        token: str,
+        refresh_token: Union[str | None] = None,
+    ) -> None:
+        with self.lock:
+            session = self.sessions.get(broadcaster_id)
+            if session is None:
+                session = Twitch(
+                    self.twitch.app_id,
+                    self.twitch.app_secret,
+                    authenticate_app=False,
+                    base_url=self.twitch.base_url,
+                    auth_base_url=self.twitch.auth_base_url,
+                    session_timeout=self.twitch.session_timeout,
+                )
+            # Without a refresh token the session lasts as long as the token
+            session.auto_refresh_auth = refresh_token is not None
+            self.loop.run(
+                session.set_user_authentication(
+                    token, self.scopes, refresh_token=refresh_token, validate=False
+                )
+            )
+            self.sessions[broadcaster_id] = session
+        LOG.info(f"Broadcaster {broadcaster_id} can now receive Twitch events")
+
+    def remove_broadcaster(self: EventSubPool, broadcaster_id: str) -> None:
+        with self.lock:
+            self.sessions.pop(broadcaster_id, None)
+            for key in [k for k in self.wanted if k[1] == broadcaster_id]:
+                del self.wanted[key]
+                self.placed.pop(key, None)
+            for shard in [s for s in self.shards if s.broadcaster_id == broadcaster_id]:
+                self.__close(shard)
+        LOG.info(f"Broadcaster {broadcaster_id} no longer receives Twitch events")
+
+    def renew(self: EventSubPool, broadcaster_id: str) -> None:
+        """Subscribe again to whatever `broadcaster_id` has lost."""
+        with self.lock:
+            self.__place_all(
+                k for k in self.wanted if k[1] == broadcaster_id and k not in self.placed
+            )
+
+    def has_broadcaster(self: EventSubPool, broadcaster_id: str) -> bool:
+        return broadcaster_id in self.sessions
+
+    def is_subscribed(self: EventSubPool, type: EventTypes, broadcaster_id: str) -> bool:
+        return (type, broadcaster_id) in self.placed
+
+    def subscribe(
+        self: EventSubPool, type: EventTypes, broadcaster_id: str, callback: Callback
+    ) -> None:
+        key = (type, broadcaster_id)
+        with self.lock:
+            if key in self.placed:
+                return
+            if broadcaster_id not in self.sessions:
+                raise RuntimeError(
+                    f"Twitch user {broadcaster_id} must log in to receive events!"
+                )
+            self.wanted[key] = callback
+            self.__place(key)
+
+    def __place(self: EventSubPool, key: SubKey) -> None:
+        broadcaster_id = key[1]
+        shards = [s for s in self.shards if s.broadcaster_id == broadcaster_id]
+        open_shards = [
+            s
+            for s in shards
+            if len(s) < self.shard_size
+            and self.supervisor.get_state(s.id) == ConnectionState.CONNECTED
+        ]
+        if open_shards:
+            shard = min(open_shards, key=len)
+        elif len(shards) < self.max_shards:
+            shard = self.__open(broadcaster_id)
+        else:
+            raise RuntimeError(
+                f"Twitch user {broadcaster_id} has no EventSub connection left!"
+            )
+        try:
+            shard.listen(key, self.wanted[key])
+        except TwitchAPIException as e:
+            raise RuntimeError(f"Failed to subscribe to {key[0].name}: {e}")
+        shard.keys.add(key)
+        self.placed[key] = shard
+        LOG.info(
+            f"Subscribed to {key[0].name} for {broadcaster_id} on EventSub"
+            f" connection #{shard.id} ({len(shard)} subscriptions)"
+        )
+
+    def __open(self: EventSubPool, broadcaster_id: str) -> EventSubShard:
+        shard = EventSubShard(self, next(self.__ids), broadcaster_id)
+        try:
+            shard.open()
+        except EventSubPool.CONNECTION_ERRORS as e:
+            shard.close()
+            raise RuntimeError(f"Failed to connect to Twitch EventSub: {e}")
+        self.shards.append(shard)
+        self.supervisor.watch(shard.id, shard)
+        return shard
+
+    def __close(self: EventSubPool, shard: EventSubShard) -> None:
+        self.supervisor.forget(shard.id)
+        if shard in self.shards:
+            self.shards.remove(shard)
+        for key in shard.keys:
+            if self.placed.get(key) is shard:
+                del self.placed[key]
+        shard.close()
+
+    def __place_all(self: EventSubPool, keys: Iterable[SubKey]) -> None:
+        for key in list(keys):
+            try:
+                self.__place(key)
+            except (RuntimeError, TwitchAPIException) as e:
+                LOG.error(f"Failed to subscribe again to {key[0].name}: {e}")
+
+    def stop(self: EventSubPool) -> None:
+        self.supervisor.stop()
+        with self.lock:
+            for shard in list(self.shards):
+                self.__close(shard)
+            self.wanted.clear()
+            self.placed.clear()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import enum as e
+from logging import getLogger
+from time import monotonic
+from operator import methodcaller
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from obsws_python.error import OBSSDKError
+from websocket import WebSocketException
+from .metrics import OBS_RECONNECTS, Counter
+
+LOG = getLogger(__name__)
+
+CONNECTION_ERRORS = (OBSSDKError, OSError, WebSocketException)
+
+
+class ConnectionState(e.Enum):
+    DISCONNECTED = 0
+    CONNECTING = 1
+    CONNECTED = 2
+    RECONNECTING = 3
+
+
+@dataclass
+class Supervised:
+    client: object
+    state: ConnectionState = ConnectionState.CONNECTED
+    attempts: int = 0
+    due: float = 0.0
+    busy: bool = False
+    last_error: Union[str | None] = None
+
+
+class ConnectionSupervisor:
+    """Heartbeats every watched client and reconnects the ones that drop.
+
+    By default a client is an OBS client, with `get_version()` as its
+    heartbeat; `heartbeat` and `errors` adapt it to other connections. A
+    client exposes `reconnect()` to re-establish its sockets in place, so
+    anything holding a reference to it keeps working once it is back.
+    `on_state(id, state)` is called whenever a watched client drops or comes
+    back.
+    """
+
+    TICK = 0.25
+    HEARTBEAT_INTERVAL = 2.0
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30.0
+
+    watched: Dict[int, Supervised]
+    on_state: Union[Callable[[int, ConnectionState], None] | None]
+    name: str
+    heartbeat: Callable[[object], object]
+    errors: Tuple[type, ...]
+    reconnects: Counter
+    interval: float
+
+    def __init__(
+        self: ConnectionSupervisor,
+        workers: int = 4,
+        on_state: Union[Callable[[int, ConnectionState], None] | None] = None,
+        name: str = "OBS Client",
+        heartbeat: Callable[[object], object] = methodcaller("get_version"),
+        errors: Tuple[type, ...] = CONNECTION_ERRORS,
+        reconnects: Counter = OBS_RECONNECTS,
+        interval: float = HEARTBEAT_INTERVAL,
+    ):
+        self.watched = {}
+        self.on_state = on_state
+        self.name = name
+        self.heartbeat = heartbeat
+        self.errors = errors
+        self.reconnects = reconnects
+        self.interval = interval
+        self.__lock = Lock()
+        self.__stop = Event()
+        self.__pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="omt-supervisor"
+        )
+        self.__thread = Thread(target=self.__run, name="omt-supervisor", daemon=True)
+        self.__thread.start()
+
+    def get_state(self: ConnectionSupervisor, id: int) -> ConnectionState:
+        supervised = self.watched.get(id)
+        return ConnectionState.DISCONNECTED if supervised is None else supervised.state
+
+    def get_last_error(self: ConnectionSupervisor, id: int) -> Union[str | None]:
+        supervised = self.watched.get(id)
+        return None if supervised is None else supervised.last_error
+
+    def watch(self: ConnectionSupervisor, id: int, client: object) -> None:
+        with self.__lock:
+            self.watched[id] = Supervised(client, due=monotonic() + self.interval)
+
+    def forget(self: ConnectionSupervisor, id: int) -> None:
+        with self.__lock:
+            self.watched.pop(id, None)
+
+    def stop(self: ConnectionSupervisor) -> None:
+        self.__stop.set()
+        self.__thread.join()
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+
+    def __set_state(
+        self: ConnectionSupervisor,
+        id: int,
+        supervised: Supervised,
+        state: ConnectionState,
+    ) -> None:
+        supervised.state = state
+        if self.on_state is not None:
+            try:
+                self.on_state(id, state)
+            except Exception as e:
+                LOG.error(f"State listener failed for {self.name} #{id}: {e}")
+
+    def __run(self: ConnectionSupervisor) -> None:
+        while not self.__stop.wait(ConnectionSupervisor.TICK):
+            now = monotonic()
+            with self.__lock:
+                due = [
+                    (id, s)
+                    for id, s in self.watched.items()
+                    if not s.busy and s.due <= now
+                ]
+                for _, supervised in due:
+                    supervised.busy = True
+            for id, supervised in due:
+                self.__pool.submit(self.__check, id, supervised)
+
+    def __check(self: ConnectionSupervisor, id: int, supervised: Supervised) -> None:
+        try:
+            if supervised.state == ConnectionState.CONNECTED:
+                self.__heartbeat(id, supervised)
+            else:
+                self.__reconnect(id, supervised)
+        finally:
+            supervised.busy = False
+
+    def __heartbeat(self: ConnectionSupervisor, id: int, supervised: Supervised) -> None:
+        try:
+            self.heartbeat(supervised.client)
+            supervised.due = monotonic() + self.interval
+        except self.errors as e:
+            LOG.warning(f"{self.name} #{id} missed its heartbeat: {e}")
+            supervised.last_error = str(e)
+            supervised.attempts = 0
+            supervised.due = monotonic()
+            self.__set_state(id, supervised, ConnectionState.RECONNECTING)
+
+    def __reconnect(self: ConnectionSupervisor, id: int, supervised: Supervised) -> None:
+        try:
+            supervised.client.reconnect()
+        except self.errors as e:
+            delay = min(
+                ConnectionSupervisor.BACKOFF_BASE * 2**supervised.attempts,
+                ConnectionSupervisor.BACKOFF_MAX,
+            )
+            supervised.attempts += 1
+            supervised.last_error = str(e)
+            supervised.due = monotonic() + delay
+            LOG.debug(f"{self.name} #{id} reconnect failed, retrying in {delay}s: {e}")
+            return
+
+        LOG.info(f"{self.name} #{id} reconnected after {supervised.attempts + 1} attempts")
+        self.reconnects.labels(id).inc()
+        supervised.attempts = 0
+        supervised.last_error = None
+        supervised.due = monotonic() + self.interval
+        self.__set_state(id, supervised, ConnectionState.CONNECTED)
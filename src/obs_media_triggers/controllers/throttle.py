@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import enum as e
+from threading import Lock
+from time import monotonic
+from logging import getLogger
+from collections import deque
+from .loop import BackgroundLoop
+from .metrics import THROTTLE_HELD, THROTTLE_VERDICTS
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, Union
+
+LOG = getLogger(__name__)
+
+
+class OverflowPolicy(e.Enum):
+    DROP = "drop"
+    QUEUE = "queue"
+    COALESCE = "coalesce"
+
+
+class Verdict(e.Enum):
+    ALLOWED = "allowed"
+    QUEUED = "queued"
+    COALESCED = "coalesced"
+    THROTTLED = "throttled"
+
+
+@dataclass
+class ThrottleConfig:
+    """Limits applied to triggers before any OBS request is made.
+
+    `rate` and `burst` size a token bucket shared by every trigger of one OBS
+    client. Cooldowns are in seconds; 0 disables them. Triggers held back by
+    the bucket or their own cooldown follow `policy`, while a user still in
+    their cooldown is always dropped so one spammer cannot fill the queue.
+    """
+
+    rate: float = 10.0
+    burst: int = 20
+    trigger_cooldown: float = 0.0
+    user_cooldown: float = 0.0
+    policy: OverflowPolicy = OverflowPolicy.DROP
+    queue_size: int = 32
+    max_tracked_users: int = 10000
+
+    def __post_init__(self: ThrottleConfig):
+        if not self.rate > 0:
+            raise RuntimeError(f"Throttle rate must be over 0, got: {self.rate}")
+        if self.burst < 1:
+            raise RuntimeError(f"Throttle burst must be at least 1, got: {self.burst}")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self: TokenBucket, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.stamp = monotonic()
+
+    def refill(self: TokenBucket, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self: TokenBucket, now: float) -> bool:
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self: TokenBucket, now: float) -> float:
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+@dataclass
+class Deferred:
+    key: Hashable
+    fire: Callable[[], object]
+
+
+class Throttle:
+    """Admits, defers or drops triggers for one OBS client."""
+
+    MIN_DRAIN_DELAY = 0.01
+
+    config: ThrottleConfig
+    timers: BackgroundLoop
+    bucket: TokenBucket
+    counters: Dict[str, int]
+
+    def __init__(self: Throttle, config: ThrottleConfig, timers: BackgroundLoop):
+        self.config = config
+        self.timers = timers
+        self.bucket = TokenBucket(config.rate, config.burst)
+        self.counters = {v.value: 0 for v in Verdict}
+        self.counters.update(user_cooldown=0, trigger_cooldown=0, overflow=0)
+        self.__lock = Lock()
+        self.__last_fired: Dict[Hashable, float] = {}
+        self.__last_user: Dict[str, float] = {}
+        self.__pending: Deque[Deferred] = deque()
+        self.__draining = False
+
+    @property
+    def depth(self: Throttle) -> int:
+        return len(self.__pending)
+
+    def admit(
+        self: Throttle,
+        key: Hashable,
+        user: Union[str | None],
+        fire: Callable[[], object],
+    ) -> Verdict:
+        """Decide what happens to a trigger identified by `key`.
+
+        On ALLOWED the caller fires it immediately. On QUEUED or COALESCED the
+        throttle calls `fire` itself once there is room.
+        """
+        now = monotonic()
+        config = self.config
+        with self.__lock:
+            if user is not None and config.user_cooldown > 0:
+                last = self.__last_user.get(user)
+                if last is not None and now - last < config.user_cooldown:
+                    self.__hold("user_cooldown")
+                    return self.__count(Verdict.THROTTLED)
+                self.__track_user(user, now)
+
+            cooling = self.__cooldown_left(key, now) > 0
+            if cooling:
+                self.__hold("trigger_cooldown")
+            if not cooling and not self.__pending and self.bucket.take(now):
+                self.__last_fired[key] = now
+                return self.__count(Verdict.ALLOWED)
+            return self.__count(self.__defer(key, fire))
+
+    def __count(self: Throttle, verdict: Verdict) -> Verdict:
+        self.counters[verdict.value] += 1
+        THROTTLE_VERDICTS.labels(self.config.policy.value, verdict.value).inc()
+        return verdict
+
+    def __hold(self: Throttle, reason: str) -> None:
+        self.counters[reason] += 1
+        THROTTLE_HELD.labels(self.config.policy.value, reason).inc()
+
+    def __track_user(self: Throttle, user: str, now: float) -> None:
+        users = self.__last_user
+        if len(users) >= self.config.max_tracked_users:
+            horizon = now - self.config.user_cooldown
+            for u in [u for u, t in users.items() if t < horizon]:
+                del users[u]
+            if len(users) >= self.config.max_tracked_users:
+                users.clear()
+        users[user] = now
+
+    def __cooldown_left(self: Throttle, key: Hashable, now: float) -> float:
+        if self.config.trigger_cooldown <= 0:
+            return 0.0
+        last = self.__last_fired.get(key)
+        if last is None:
+            return 0.0
+        return max(0.0, self.config.trigger_cooldown - (now - last))
+
+    def __defer(self: Throttle, key: Hashable, fire: Callable[[], object]) -> Verdict:
+        policy = self.config.policy
+        if policy == OverflowPolicy.DROP:
+            return Verdict.THROTTLED
+        if policy == OverflowPolicy.COALESCE:
+            for deferred in self.__pending:
+                if deferred.key == key:
+                    return Verdict.COALESCED
+        if len(self.__pending) >= self.config.queue_size:
+            self.__hold("overflow")
+            return Verdict.THROTTLED
+
+        deferred = Deferred(key, fire)
+        self.__pending.append(deferred)
+        if not self.__draining:
+            # Only flag the drain once it is scheduled, or nothing ever drains
+            try:
+                self.timers.call_later(self.__next_delay(monotonic()), self.__drain)
+            except Exception:
+                self.__pending.remove(deferred)
+                raise
+            self.__draining = True
+        return Verdict.QUEUED
+
+    def __next_delay(self: Throttle, now: float) -> float:
+        waits = [self.__cooldown_left(d.key, now) for d in self.__pending]
+        return max(
+            Throttle.MIN_DRAIN_DELAY,
+            self.bucket.wait_time(now),
+            min(waits, default=0.0),
+        )
+
+    def __drain(self: Throttle) -> None:
+        ready = []
+        with self.__lock:
+            now = monotonic()
+            for deferred in list(self.__pending):
+                if self.__cooldown_left(deferred.key, now) > 0:
+                    continue
+                if not self.bucket.take(now):
+                    break
+                self.__pending.remove(deferred)
+                self.__last_fired[deferred.key] = now
+                ready.append(deferred)
+            if self.__pending:
+                self.timers.call_later(self.__next_delay(now), self.__drain)
+            else:
+                self.__draining = False
+
+        for deferred in ready:
+            try:
+                deferred.fire()
+            except Exception as e:
+                LOG.error(f"Deferred trigger {deferred.key} failed with reason: {e}")
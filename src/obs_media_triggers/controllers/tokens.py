@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+from time import time
+from functools import partial
+from logging import getLogger
+from .loop import BackgroundLoop
+from .shards import EventSubPool
+from concurrent.futures import Future
+from twitchAPI.twitch import Twitch
+from twitchAPI.type import TwitchAPIException
+from twitchAPI.oauth import refresh_access_token, validate_token
+from typing import Callable, Dict, List
+
+LOG = getLogger(__name__)
+
+
+class UserToken:
+    user_id: str
+    token: str
+    refresh_token: str
+    expires_at: float
+    sessions: List[Twitch]
+
+    def __init__(
+        self: UserToken,
+        user_id: str,
+        token: str,
+        refresh_token: str,
+        sessions: List[Twitch],
+    ):
+        self.user_id = user_id
+        self.token = token
+        self.refresh_token = refresh_token
+        self.expires_at = 0.0
+        self.sessions = sessions
+
+
+class TokenRefresher:
+    """Refreshes broadcasters' user tokens before they expire.
+
+    Each logged-in broadcaster gets a task on the Twitch loop that sleeps
+    until `margin` seconds before their token expires, refreshes it, hands it
+    to their EventSub session and any other session acting as them, such as
+    the app's own client, and saves it. Their subscriptions keep running
+    throughout; any the pool lost along the way are placed again with the new
+    token. Nothing else waits on a refresh, and twitchAPI's own refresh on an
+    expired token is left as a fallback.
+    """
+
+    MARGIN = 600.0
+    RETRY = 30.0
+    MAX_RETRY = 600.0
+
+    pool: EventSubPool
+    loop: BackgroundLoop
+    save: Callable[[str, str], None]
+    margin: float
+    tokens: Dict[str, UserToken]
+
+    def __init__(
+        self: TokenRefresher,
+        pool: EventSubPool,
+        save: Callable[[str, str], None],
+        margin: float = MARGIN,
+    ):
+        self.pool = pool
+        self.loop = pool.loop
+        self.save = save
+        self.margin = margin
+        self.tokens = {}
+        self.refreshed = 0
+        self.__tasks: Dict[str, Future] = {}
+
+    def watch(
+        self: TokenRefresher,
+        user_id: str,
+        token: str,
+        refresh_token: str,
+        *sessions: Twitch,
+    ) -> None:
+        """Keep `user_id` fresh on their EventSub session and `sessions`."""
+        self.unwatch(user_id)
+        # A session acts as one user at a time, so it leaves whoever had it
+        for other in self.tokens.values():
+            other.sessions = [s for s in other.sessions if s not in sessions]
+        state = UserToken(user_id, token, refresh_token, list(sessions))
+        self.tokens[user_id] = state
+        for session in self.__sessions(state):
+            session.user_auth_refresh_callback = partial(self.__on_refreshed, state)
+        self.__tasks[user_id] = self.loop.submit(self.__keep_fresh(state))
+
+    def unwatch(self: TokenRefresher, user_id: str) -> None:
+        self.tokens.pop(user_id, None)
+        task = self.__tasks.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def stop(self: TokenRefresher) -> None:
+        for user_id in list(self.__tasks):
+            self.unwatch(user_id)
+
+    def __sessions(self: TokenRefresher, state: UserToken) -> List[Twitch]:
+        session = self.pool.sessions.get(state.user_id)
+        return state.sessions if session is None else [session, *state.sessions]
+
+    async def __keep_fresh(self: TokenRefresher, state: UserToken) -> None:
+        failures = 0
+        while True:
+            try:
+                if not state.expires_at:
+                    await self.__validate(state)
+                await asyncio.sleep(max(state.expires_at - self.margin - time(), 0))
+                await self.refresh(state)
+                failures = 0
+            except Exception as e:
+                # Anything escaping here would end the task, and the token
+                # would quietly expire; cancelling still stops it
+                delay = min(
+                    TokenRefresher.RETRY * 2**failures, TokenRefresher.MAX_RETRY
+                )
+                failures += 1
+                LOG.error(
+                    f"Failed to refresh Twitch token of {state.user_id},"
+                    f" retrying in {delay:.0f}s: {e!r}"
+                )
+                await asyncio.sleep(delay)
+
+    async def __validate(self: TokenRefresher, state: UserToken) -> bool:
+        # A token Twitch no longer accepts is due for a refresh right away
+        info = await validate_token(
+            state.token, auth_base_url=self.pool.twitch.auth_base_url
+        )
+        state.expires_at = time() + info.get("expires_in", 0)
+        return "expires_in" in info
+
+    async def refresh(self: TokenRefresher, state: UserToken) -> None:
+        twitch = self.pool.twitch
+        token, refresh_token = await refresh_access_token(
+            state.refresh_token,
+            twitch.app_id,
+            twitch.app_secret,
+            auth_base_url=twitch.auth_base_url,
+        )
+        for session in self.__sessions(state):
+            await session.set_user_authentication(
+                token, self.pool.scopes, refresh_token=refresh_token, validate=False
+            )
+        await self.__on_refreshed(state, token, refresh_token)
+        if not await self.__validate(state):
+            raise TwitchAPIException("Twitch did not accept the refreshed token")
+        await asyncio.to_thread(self.pool.renew, state.user_id)
+
+    async def __on_refreshed(
+        self: TokenRefresher, state: UserToken, token: str, refresh_token: str
+    ) -> None:
+        # Also called by twitchAPI when it refreshes lazily, in the middle of
+        # a subscribe that holds the pool, so this must not wait on either
+        state.token = token
+        state.refresh_token = refresh_token
+        self.refreshed += 1
+        LOG.info(f"Refreshed Twitch token of {state.user_id}")
+        asyncio.get_running_loop().run_in_executor(
+            None, self.save, state.user_id, token
+        )
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from threading import Lock
+from time import perf_counter, time
+from logging import getLogger
+from typing import List, Tuple, Union
+
+LOG = getLogger(__name__)
+
+Span = Tuple[str, float, Union[int | None], str]
+
+
+class Trace:
+    """Timestamped spans of one Twitch event on its way to OBS.
+
+    Span times are seconds since the event was received. Spans are only ever
+    appended, so pipeline threads can add to a trace without locking it.
+    """
+
+    __slots__ = (
+        "id", "type", "summary", "received_at", "began", "spans", "journal_id"
+    )
+
+    id: int
+    type: str
+    summary: str
+    received_at: float
+    began: float
+    spans: List[Span]
+    journal_id: Union[int | None]
+
+    def __init__(self: Trace, id: int, type: str, summary: str = ""):
+        self.id = id
+        self.type = type
+        self.summary = summary
+        self.received_at = time()
+        self.began = perf_counter()
+        self.spans = [("received", 0.0, None, "")]
+        self.journal_id = None
+
+    def mark(
+        self: Trace, name: str, obs_id: Union[int | None] = None, detail: str = ""
+    ) -> None:
+        self.spans.append((name, perf_counter() - self.began, obs_id, detail))
+
+    @property
+    def duration(self: Trace) -> float:
+        return self.spans[-1][1]
+
+    @property
+    def latency(self: Trace) -> float:
+        """Time until OBS first acknowledged (or failed) the trigger."""
+        for name, at, _, _ in list(self.spans):
+            if name in ("acked", "failed"):
+                return at
+        return self.duration
+
+    def to_dict(self: Trace) -> dict:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "summary": self.summary,
+            "received_at": self.received_at,
+            "latency": self.latency,
+            "duration": self.duration,
+            "spans": [
+                {"name": n, "at": at, "obs_id": obs_id, "detail": detail}
+                for n, at, obs_id, detail in list(self.spans)
+            ],
+        }
+
+
+class TraceBuffer:
+    """The last `size` traces, in a ring allocated up front."""
+
+    DEFAULT_SIZE = 512
+
+    size: int
+
+    def __init__(self: TraceBuffer, size: int = DEFAULT_SIZE):
+        self.size = max(size, 1)
+        self.__ring: List[Union[Trace | None]] = [None] * self.size
+        self.__next = 0
+        self.__lock = Lock()
+
+    def __len__(self: TraceBuffer) -> int:
+        return min(self.__next, self.size)
+
+    def start(self: TraceBuffer, type: str, summary: str = "") -> Trace:
+        with self.__lock:
+            id = self.__next
+            self.__next += 1
+            trace = Trace(id, type, summary)
+            self.__ring[id % self.size] = trace
+        return trace
+
+    def get_traces(self: TraceBuffer, slowest: bool = False) -> List[Trace]:
+        """Newest first, or slowest first if asked."""
+        with self.__lock:
+            end = self.__next
+            ring = list(self.__ring)
+        traces = [
+            ring[i % self.size] for i in range(end - 1, max(end - self.size, 0) - 1, -1)
+        ]
+        if slowest:
+            traces.sort(key=lambda t: t.latency, reverse=True)
+        return traces
+
+    def to_list(self: TraceBuffer) -> List[dict]:
+        return [t.to_dict() for t in self.get_traces()]
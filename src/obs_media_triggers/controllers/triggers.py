@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from time import perf_counter
+from logging import getLogger
+from .loop import BackgroundLoop
+from .queue import TriggerQueue
+from typing import Callable, Dict, Hashable, Union
+from threading import Event, Lock
+from concurrent.futures import Future, ThreadPoolExecutor
+
+LOG = getLogger(__name__)
+
+Action = Callable[[], object]
+
+
+class TriggerExecutor:
+    """Runs trigger actions off the EventSub loop.
+
+    Blocking OBS requests run on a worker pool, and the action that undoes a
+    trigger is scheduled as a timer on a dedicated event loop, so any number of
+    triggers can be playing at once without holding up the caller.
+
+    Actions fired with a `lane` run on a bounded TriggerQueue reserved for that
+    lane, so a slow or hung OBS host only ever delays its own triggers, and
+    identical triggers waiting on the same lane run once.
+    """
+
+    DEFAULT_DURATION = 3
+    DEFAULT_WORKERS = 8
+
+    timers: BackgroundLoop
+    pool: ThreadPoolExecutor
+    lanes: Dict[Hashable, TriggerQueue]
+    pending_limit: int
+    coalesce_window: float
+    fired: int
+    coalesced: int
+    completed: int
+    failed: int
+
+    def __init__(
+        self: TriggerExecutor,
+        workers: int = DEFAULT_WORKERS,
+        pending_limit: int = TriggerQueue.DEFAULT_SIZE,
+        coalesce_window: float = TriggerQueue.DEFAULT_WINDOW,
+    ):
+        self.timers = BackgroundLoop("omt-trigger-timers")
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="omt-trigger"
+        )
+        self.lanes = {}
+        self.pending_limit = pending_limit
+        self.coalesce_window = coalesce_window
+        self.fired = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.__stats_lock = Lock()
+
+    def get_lane(self: TriggerExecutor, lane: Hashable) -> TriggerQueue:
+        queue = self.lanes.get(lane)
+        if queue is None:
+            with self.__stats_lock:
+                queue = self.lanes.get(lane)
+                if queue is None:
+                    queue = TriggerQueue(
+                        f"omt-trigger-{lane}", self.pending_limit, self.coalesce_window
+                    )
+                    self.lanes[lane] = queue
+        return queue
+
+    def close_lane(self: TriggerExecutor, lane: Hashable) -> None:
+        with self.__stats_lock:
+            queue = self.lanes.pop(lane, None)
+        if queue is not None:
+            queue.close()
+
+    def fire(
+        self: TriggerExecutor,
+        start: Action,
+        stop: Union[Action | None] = None,
+        duration: float = DEFAULT_DURATION,
+        lane: Union[Hashable | None] = None,
+        key: Union[Hashable | None] = None,
+    ) -> Future:
+        """Run `start` now and `stop` `duration` seconds after it succeeds.
+
+        On a lane, a trigger fired with the same `key` as one still waiting to
+        run joins it instead: `start` runs once and is called with the number
+        of triggers it stands for. Returns the future of `start`, which
+        resolves once the trigger is live.
+        """
+        with self.__stats_lock:
+            self.fired += 1
+        if lane is None:
+            future, created = self.pool.submit(start), True
+        elif key is None:
+            future, created = self.get_lane(lane).put(None, lambda count: start())
+        else:
+            future, created = self.get_lane(lane).put(key, start)
+
+        if created:
+            future.add_done_callback(
+                lambda f: self.__on_started(f, stop, duration, lane)
+            )
+        else:
+            with self.__stats_lock:
+                self.coalesced += 1
+        return future
+
+    def __on_started(
+        self: TriggerExecutor,
+        future: Future,
+        stop: Union[Action | None],
+        duration: float,
+        lane: Union[Hashable | None],
+    ) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.__on_stopped(future)
+        elif stop is None:
+            self.__on_stopped(future)
+        else:
+            self.timers.call_later(duration, self.__stop, stop, lane)
+
+    def __stop(
+        self: TriggerExecutor, stop: Action, lane: Union[Hashable | None]
+    ) -> None:
+        executor = self.pool if lane is None else self.lanes.get(lane)
+        try:
+            # The lane's OBS client may have gone away while the trigger played
+            if executor is None:
+                raise RuntimeError(f"Lane {lane} was closed")
+            future = executor.submit(stop)
+        except RuntimeError as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(self.__on_stopped)
+
+    def __on_stopped(self: TriggerExecutor, future: Future) -> None:
+        if future.cancelled():
+            e = RuntimeError("Trigger was cancelled")
+        else:
+            e = future.exception()
+        with self.__stats_lock:
+            if e is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+        if e is not None:
+            LOG.error(f"Trigger action failed with reason: {e}")
+
+    @property
+    def pending(self: TriggerExecutor) -> int:
+        return self.fired - self.coalesced - self.completed - self.failed
+
+    def measure_throughput(
+        self: TriggerExecutor,
+        count: int = 10000,
+        start: Action = lambda: None,
+        stop: Action = lambda: None,
+    ) -> float:
+        """Fire `count` triggers back to back and return completed triggers/sec.
+
+        The default no-op actions measure the executor itself; pass real OBS
+        actions to measure a live connection.
+        """
+        if count < 1:
+            raise ValueError(f"Need at least one trigger to measure, got: {count}")
+        done = Event()
+        lock = Lock()
+        remaining = count
+
+        def count_down():
+            nonlocal remaining
+            with lock:
+                remaining -= 1
+                if remaining == 0:
+                    done.set()
+
+        def start_or_count():
+            try:
+                start()
+            except Exception:
+                count_down()
+                raise
+
+        def stop_and_count():
+            try:
+                stop()
+            finally:
+                count_down()
+
+        began = perf_counter()
+        for _ in range(count):
+            self.fire(start_or_count, stop_and_count, duration=0)
+        done.wait()
+        elapsed = perf_counter() - began
+        LOG.info(f"Executed {count} triggers in {elapsed:.3f}s")
+        return count / elapsed
+
+    def shutdown(self: TriggerExecutor) -> None:
+        self.timers.stop()
+        for lane in list(self.lanes):
+            self.close_lane(lane)
+        self.pool.shutdown(wait=True)
@@ -1,17 +1,21 @@
 from __future__ import annotations
 
-from asyncio import run
-from typing import Awaitable, Union
+from .loop import BackgroundLoop
+from threading import RLock
+from concurrent.futures import Future
+from typing import Any, Coroutine, Tuple, Union
 from logging import getLogger
 from twitchAPI.helper import first
 from twitchAPI.type import AuthScope
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from twitchAPI.oauth import UserAuthenticator
 from twitchAPI.twitch import Twitch, TwitchUser
 from ..models import TwitchOAuthUserModel
-from twitchAPI.eventsub.websocket import EventSubWebsocket
-from .. import __app_port__, __app_id__, __app_secret__
+from .shards import EventSubPool
+from .tokens import TokenRefresher
+from .. import __app_port__, __app_id__, get_app_secret
+from flask import g
 from flask_login import current_user, login_user, logout_user, LoginManager
 
 LOG = getLogger(__name__)
@@ -24,12 +28,17 @@ class TwitchClient(Twitch):
         AuthScope.USER_READ_SUBSCRIPTIONS,
         AuthScope.CHANNEL_READ_SUBSCRIPTIONS,
     ]
+    REQUEST_USER = "omt_twitch_user"
 
+    app: object
     db: SQLAlchemy
+    loop: BackgroundLoop
     callback_url: str
     auth: UserAuthenticator
-    events: EventSubWebsocket
+    eventsub: EventSubPool
+    tokens: TokenRefresher
     login_manager: LoginManager
+    session_lock: RLock
 
     def __init__(
         self: TwitchClient,
@@ -39,16 +48,26 @@ class TwitchClient(Twitch):
         host: str = 'localhost',
         port: int = __app_port__,
         app_id: str = __app_id__,
-        app_secret: str = __app_secret__,
+        app_secret: str = None,
+        shard_size: int = EventSubPool.MAX_SUBSCRIPTIONS,
         **kwargs,
     ):
+        if app_secret is None:
+            app_secret = get_app_secret()
         super().__init__(app_id, app_secret, **kwargs)
 
+        # Every Twitch coroutine and EventSub callback runs on this one loop
+        self.loop = BackgroundLoop("omt-twitch")
+
+        # Serializes login, logout and starting EventSub across request threads
+        self.session_lock = RLock()
+
         # Twitch Client Options
         self.auto_refresh_auth = True
         self.callback_url = f"{scheme}://{host}:{port}/twitch/login"
 
         # Setup Twitch peripheral managers
+        self.app = app
         self.db = db
         self.auth = UserAuthenticator(
             self,
@@ -56,7 +75,11 @@ class TwitchClient(Twitch):
             force_verify=False,
             url=self.callback_url,
         )
-        self.events = EventSubWebsocket(self)
+        # Every logged-in broadcaster's events arrive through this pool
+        self.eventsub = EventSubPool(
+            self, self.loop, TwitchClient.API_SCOPES, shard_size=shard_size
+        )
+        self.tokens = TokenRefresher(self.eventsub, self.save_user_token)
 
         # Setup login manager
         self.login_manager = LoginManager(app)
@@ -65,7 +88,23 @@ class TwitchClient(Twitch):
 
         @self.login_manager.user_loader
         def load_user(id: str):
-            return TwitchOAuthUserModel.query.filter_by(id=id).one_or_none()
+            user = TwitchOAuthUserModel.query.filter_by(id=id).one_or_none()
+            setattr(g, TwitchClient.REQUEST_USER, user)
+            return user
+
+    def submit(self: TwitchClient, coro: Coroutine) -> Future:
+        return self.loop.submit(coro)
+
+    def run(
+        self: TwitchClient, coro: Coroutine, timeout: Union[float | None] = None
+    ) -> Any:
+        return self.loop.run(coro, timeout)
+
+    def shutdown(self: TwitchClient) -> None:
+        with self.session_lock:
+            self.tokens.stop()
+            self.eventsub.stop()
+        self.loop.stop()
 
     def get_login(self: TwitchClient) -> LoginManager:
         return self.login_manager
@@ -76,45 +115,46 @@ class TwitchClient(Twitch):
     def login(
         self: TwitchClient, user_token: str
     ) -> Union[TwitchOAuthUserModel | None]:
-        access_token, refresh_token = run(self.auth.authenticate(user_token=user_token))
-        run(
-            self.set_user_authentication(
-                access_token,
-                refresh_token=refresh_token,
-                scope=TwitchClient.API_SCOPES,
-                validate=True,
-            )
-        )
-        run(self.authenticate_app(TwitchClient.API_SCOPES))
-        db_user = self.sync_api_user_to_db()
-        if db_user is None:
-            raise RuntimeError(f"Failed to create local sync of user: {db_user}!")
+        with self.session_lock:
+            access_token, refresh_token = self.run(self.api_login(user_token))
+            db_user = self.sync_api_user_to_db()
+            if db_user is None:
+                raise RuntimeError(f"Failed to create local sync of user: {db_user}!")
+            self.eventsub.add_broadcaster(db_user.id, access_token, refresh_token)
+            self.tokens.watch(db_user.id, access_token, refresh_token, self)
         login_user(db_user)
         LOG.debug(f"User logged in with info: {db_user}")
         return db_user
 
-    def logout(self: TwitchClient) -> None:
-        if self.events is not None:
-            if self.events._running:
-                run(self.events.unsubscribe_all())
-                run(self.events.stop())
-        if self.auth._server_running:
-            self.set_user_authentication(None, TwitchClient.API_SCOPES, None)
-            run(self.auth.stop())
+    async def api_login(self: TwitchClient, user_token: str) -> Tuple[str, str]:
+        access_token, refresh_token = await self.auth.authenticate(
+            user_token=user_token
+        )
+        await self.set_user_authentication(
+            access_token,
+            refresh_token=refresh_token,
+            scope=TwitchClient.API_SCOPES,
+            validate=True,
+        )
+        await self.authenticate_app(TwitchClient.API_SCOPES)
+        return access_token, refresh_token
 
+    def logout(self: TwitchClient) -> None:
+        with self.session_lock:
+            self.tokens.unwatch(current_user.id)
+            self.eventsub.remove_broadcaster(current_user.id)
+            self.run(self.api_logout())
+            g.pop(TwitchClient.REQUEST_USER, None)
         LOG.debug("User logged out!")
         logout_user()
 
-    def sync_api_user_to_db(self: TwitchClient) -> Union[TwitchOAuthUserModel | None]:
-        api_user: TwitchUser = run(self.api_get_user())
+    async def api_logout(self: TwitchClient) -> None:
+        if self.auth._server_running:
+            await self.set_user_authentication(None, TwitchClient.API_SCOPES, None)
+            await self.auth.stop()
 
-        db_user = TwitchOAuthUserModel(
-            id=api_user.id,
-            login_name=api_user.login,
-            display_name=api_user.display_name,
-            pfp_url=api_user.profile_image_url,
-            user_token=run(self.get_refreshed_user_auth_token()),
-        )
+    def sync_api_user_to_db(self: TwitchClient) -> Union[TwitchOAuthUserModel | None]:
+        db_user: TwitchOAuthUserModel = self.run(self.api_get_user_model())
         user_exists = (
             TwitchOAuthUserModel.query.filter_by(id=db_user.id).one_or_none()
             is not None
@@ -122,30 +162,49 @@ class TwitchClient(Twitch):
 
         try:
             if user_exists:
-                TwitchOAuthUserModel.query.update(db_user.to_dict())
+                TwitchOAuthUserModel.query.filter_by(id=db_user.id).update(
+                    db_user.to_dict()
+                )
             else:
                 self.db.session.add(db_user)
             self.db.session.commit()
+            g.pop(TwitchClient.REQUEST_USER, None)
             return db_user
         except IntegrityError as e:
             LOG.error(f"Failed to add sync user {db_user} to DB with reason: {e}")
 
+    def save_user_token(self: TwitchClient, user_id: str, token: str) -> None:
+        with self.app.app_context():
+            try:
+                TwitchOAuthUserModel.query.filter_by(id=user_id).update(
+                    {"user_token": token}
+                )
+                self.db.session.commit()
+            except SQLAlchemyError as e:
+                self.db.session.rollback()
+                LOG.error(f"Failed to save refreshed token of {user_id}: {e}")
+
     async def api_get_user(self: TwitchClient) -> object:
         return await first(self.get_users())
 
-    def db_get_user(self: TwitchClient) -> Union[TwitchOAuthUserModel | None]:
-        return TwitchOAuthUserModel.query.filter_by(id=current_user.id).one_or_none()
+    async def api_get_user_model(self: TwitchClient) -> TwitchOAuthUserModel:
+        api_user: TwitchUser = await self.api_get_user()
+        return TwitchOAuthUserModel(
+            id=api_user.id,
+            login_name=api_user.login,
+            display_name=api_user.display_name,
+            pfp_url=api_user.profile_image_url,
+            user_token=await self.get_refreshed_user_auth_token(),
+        )
 
-    async def subscribe_to_chat_message_event(
-        self: TwitchClient, callback: Awaitable
-    ) -> None:
-        try:
-            self.events.start()
-        except RuntimeError:
-            LOG.warn("Twitch ES server is already running!")
-        user: TwitchUser = current_user
-        res = await self.events.listen_channel_chat_message(user.id, user.id, callback)
-        LOG.info(f"Registered subscription with Twitch: {res}")
+    def db_get_user(self: TwitchClient) -> Union[TwitchOAuthUserModel | None]:
+        # Reading current_user runs load_user, which caches the row for the
+        # rest of the request
+        id = current_user.id
+        if TwitchClient.REQUEST_USER not in g:
+            user = TwitchOAuthUserModel.query.filter_by(id=id).one_or_none()
+            setattr(g, TwitchClient.REQUEST_USER, user)
+        return g.get(TwitchClient.REQUEST_USER)
 
     @property
     def is_logged_in(self: TwitchClient) -> bool:
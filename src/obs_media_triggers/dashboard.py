@@ -1,16 +1,25 @@
 from __future__ import annotations
 
-import random, string
-from .models import DB
+import random, signal, string
+from . import __app_threads__
+from .models import DB, DEFAULT_DB_NAME, configure_sqlite
 from flask import Flask
 from logging import getLogger
+from time import monotonic
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import current_user, LoginManager
-from .views import view_events, view_obs, view_twitch
-from .controllers import OBSClientsManager, TwitchClient
+from .views import (
+    view_api,
+    view_events,
+    view_history,
+    view_metrics,
+    view_obs,
+    view_traces,
+    view_twitch,
+)
+from .controllers import OBSClientsManager, ThrottleConfig, TriggerExecutor, TwitchClient
 
 LOG = getLogger(__name__)
-DEFAULT_DB_NAME = "obs-media-triggers.db"
 
 
 def gen_secret(length: int = 64) -> str:
@@ -19,10 +28,13 @@ def gen_secret(length: int = 64) -> str:
 
 class Dashboard(Flask):
     DATA_DIR = "./"
+    DEFAULT_THREADS = __app_threads__
+    DRAIN_TIMEOUT = 10
 
     debug: bool = False
     host: str
     port: int
+    threads: int
     db: SQLAlchemy
     obs: OBSClientsManager
     twitch: TwitchClient
@@ -34,9 +46,21 @@ class Dashboard(Flask):
         port: int = 7064,
         debug: bool = False,
         secret_key: str = "Something Random",
+        throttle: ThrottleConfig = None,
+        executor: TriggerExecutor = None,
+        gift_window: float = None,
+        trace_size: int = None,
+        autoconnect: bool = False,
+        media_playback: bool = False,
+        replay_age: float = None,
+        api_token: str = None,
+        threads: int = DEFAULT_THREADS,
     ):
         super().__init__(__name__)
         self.debug = debug
+        self.threads = max(threads, 1)
+        self.__stopping = False
+        self.__server = None
         self.db = DB
         self.host = host
         self.port = port
@@ -45,17 +69,38 @@ class Dashboard(Flask):
         self.register_blueprint(view_obs, url_prefix="/")
         self.register_blueprint(view_twitch, url_prefix="/twitch/")
         self.register_blueprint(view_events, url_prefix="/event/")
+        self.register_blueprint(view_metrics, url_prefix="/metrics")
+        self.register_blueprint(view_traces, url_prefix="/traces/")
+        self.register_blueprint(view_history, url_prefix="/history/")
+        self.register_blueprint(view_api, url_prefix="/api/")
 
         # Setup Controlelrs
         self.twitch = TwitchClient(self, db=self.db, port=port)
-        self.obs = OBSClientsManager(db=self.db, twitch=self.twitch)
+        self.obs = OBSClientsManager(
+            db=self.db,
+            twitch=self.twitch,
+            throttle=throttle,
+            executor=executor,
+            gift_window=gift_window,
+            trace_size=trace_size,
+            media_playback=media_playback,
+            replay_age=replay_age,
+        )
         self.login_manager = self.twitch.get_login()
+        # Each open live view holds a request thread until it is closed
+        self.obs.live.max_subscriptions = Dashboard.live_streams(self.threads)
 
         # Configure Flask app
         self.config["SECRET_KEY"] = secret_key
+        self.config["API_TOKEN"] = api_token
         self.config["SQLALCHEMY_DATABASE_URI"] = (
             f"sqlite:///{Dashboard.DATA_DIR}/{DEFAULT_DB_NAME}"
         )
+        self.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": self.threads,
+            "max_overflow": self.threads,
+            "connect_args": {"timeout": 5},
+        }
         LOG.debug(
             f'Initializing Database at -> {self.config["SQLALCHEMY_DATABASE_URI"]}'
         )
@@ -68,7 +113,76 @@ class Dashboard(Flask):
         # Initialize the database schemas and link to flask
         with self.app_context():
             self.db.init_app(self)
+            configure_sqlite(self.db.engine)
             self.db.create_all()
+            self.obs.journal.start(self.db.engine)
+            if autoconnect:
+                self.obs.connect_all()
 
     def run(self: Dashboard) -> any:
         return super().run(host=self.host, port=self.port, debug=self.debug)
+
+    @staticmethod
+    def live_streams(threads: int) -> int:
+        """Live views allowed open at once, keeping half the threads free."""
+        return max(threads // 2, 1)
+
+    def serve(self: Dashboard) -> None:
+        """Serve the dashboard with waitress until SIGINT or SIGTERM.
+
+        On a signal the listening socket is closed first, then requests
+        already being handled get up to DRAIN_TIMEOUT seconds to finish
+        writing their responses before the OBS and Twitch connections are
+        torn down.
+        """
+        try:
+            from waitress import create_server, wasyncore
+        except ImportError:
+            raise RuntimeError(
+                "Server mode needs waitress: pip install obs-media-triggers[server]"
+            )
+
+        sockets = {}
+        server = self.__server = create_server(
+            self, map=sockets, host=self.host, port=self.port, threads=self.threads
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.__on_signal)
+        LOG.info(
+            f"Serving on http://{self.host}:{self.port} with {self.threads} threads"
+        )
+        try:
+            while not self.__stopping and sockets:
+                wasyncore.loop(timeout=1, map=sockets, count=1)
+        finally:
+            # Stop accepting, but keep the trigger that wakes the loop when a
+            # worker has output for its connection
+            wasyncore.dispatcher.close(server)
+            # Live streams never finish on their own, so end them first
+            self.obs.live.close()
+            deadline = monotonic() + Dashboard.DRAIN_TIMEOUT
+            while Dashboard.__is_busy(sockets) and monotonic() < deadline:
+                wasyncore.loop(timeout=0.1, map=sockets, count=1)
+            server.task_dispatcher.shutdown()
+            wasyncore.close_all(sockets)
+            self.shutdown()
+
+    @staticmethod
+    def __is_busy(sockets: dict) -> bool:
+        # Connections still handling a request or holding unsent output
+        return any(
+            getattr(channel, "requests", None)
+            or getattr(channel, "total_outbufs_len", 0)
+            for channel in list(sockets.values())
+        )
+
+    def __on_signal(self: Dashboard, signum: int, frame) -> None:
+        # Only ask the serving loop to stop, and wake it; it drains itself
+        self.__stopping = True
+        if self.__server is not None:
+            self.__server.pull_trigger()
+
+    def shutdown(self: Dashboard) -> None:
+        LOG.info("Shutting down OBS clients and Twitch connections")
+        self.obs.shutdown()
+        self.twitch.shutdown()
@@ -2,16 +2,40 @@ from __future__ import annotations
 
 import enum as e
 from logging import getLogger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey, Sequence
+from sqlalchemy import Float, Index
 
 
 MAX_VARCHAR_LEN = 255
+DEFAULT_DB_NAME = "obs-media-triggers.db"
 
 DB = SQLAlchemy()
 LOG = getLogger(__name__)
 
+# Dashboard requests, trigger threads and the supervisor share the database
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def configure_sqlite(engine: Engine) -> None:
+    """Apply `SQLITE_PRAGMAS` to every connection `engine` opens to SQLite."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 
 class OBSWSClientModel(DB.Model):
     __tablename__ = "obs_clients"
@@ -42,6 +66,39 @@ class EventSubModel(DB.Model):
     allow_anon = Column(Boolean)
 
 
+class ChannelRouteModel(DB.Model):
+    """A Twitch channel whose events an OBS client triggers on.
+
+    A client without any reacts to every logged-in channel.
+    """
+
+    __tablename__ = "obs_channels"
+
+    obs_id = Column(Integer, ForeignKey("obs_clients.id"), primary_key=True)
+    broadcaster_id = Column(String(MAX_VARCHAR_LEN), primary_key=True)
+
+
+class JournalEntryModel(DB.Model):
+    """A received Twitch event, or a trigger an OBS client fired for one."""
+
+    __tablename__ = "journal"
+    # Pages are read newest first per client, and replay looks for the few
+    # triggers still queued
+    __table_args__ = (Index("ix_journal_status_obs_id", "status", "obs_id"),)
+
+    id = Column(Integer, primary_key=True)
+    at = Column(Float, nullable=False, index=True)
+    kind = Column(String(16), nullable=False)
+    status = Column(String(16), nullable=False)
+    event_id = Column(Integer)
+    obs_id = Column(Integer, index=True)
+    type = Column(String(MAX_VARCHAR_LEN))
+    summary = Column(String(MAX_VARCHAR_LEN))
+    scene_name = Column(String(MAX_VARCHAR_LEN))
+    steps = Column(String(MAX_VARCHAR_LEN))
+    detail = Column(String(MAX_VARCHAR_LEN))
+
+
 class TwitchOAuthUserModel(DB.Model, UserMixin):
     __tablename__ = "twitch_users"
 
@@ -0,0 +1,82 @@
+window.addEventListener('load', function () {
+  'use strict'
+  var MAX_FIRED = 20
+  var state = document.getElementById('live-state')
+  var scenes = document.getElementById('active_scene')
+  var sources = document.getElementById('live-sources')
+  var fired = document.getElementById('live-fired')
+
+  function setState(name) {
+    state.textContent = name
+    state.className = 'badge ' + (name === 'CONNECTED' ? 'bg-success' : 'bg-danger')
+  }
+
+  function setScenes(names, active) {
+    var options = Array.prototype.slice.call(scenes.options, 1)
+    options.forEach(function (o) { o.remove() })
+    names.forEach(function (name) {
+      var option = new Option(name, name)
+      option.selected = name === active
+      scenes.add(option)
+    })
+  }
+
+  function setSources(names) {
+    sources.replaceChildren()
+    names.forEach(function (name) {
+      var badge = document.createElement('span')
+      badge.className = 'badge bg-secondary me-1'
+      badge.textContent = name
+      sources.appendChild(badge)
+    })
+  }
+
+  function showScenes(data) {
+    setScenes(data.scenes || [], data.active_scene)
+    setSources(data.sources || [])
+  }
+
+  var live = null
+  var RETRY_MS = 5000
+
+  function connect() {
+    live = new EventSource(LIVE_URL)
+    live.addEventListener('snapshot', function (e) {
+      var data = JSON.parse(e.data)
+      setState(data.state)
+      showScenes(data)
+    })
+    live.addEventListener('state', function (e) {
+      setState(JSON.parse(e.data).state)
+    })
+    ;['scenes', 'sources', 'program_scene', 'active_scene'].forEach(function (kind) {
+      live.addEventListener(kind, function (e) { showScenes(JSON.parse(e.data)) })
+    })
+    live.addEventListener('fired', function (e) {
+      var data = JSON.parse(e.data)
+      var item = document.createElement('li')
+      item.className = 'list-group-item' + (data.error ? ' list-group-item-danger' : '')
+      item.textContent = new Date(data.at * 1000).toLocaleTimeString() + ' '
+        + data.sources.join(' + ') + (data.error ? ' (' + data.error + ')' : '')
+      fired.prepend(item)
+      while (fired.children.length > MAX_FIRED) {
+        fired.lastElementChild.remove()
+      }
+    })
+    live.onerror = function () {
+      setState('RECONNECTING')
+      // Browsers give up on a stream the server turned away, e.g. when every
+      // stream is in use, so try again later ourselves
+      if (live.readyState === EventSource.CLOSED) {
+        setTimeout(connect, RETRY_MS)
+      }
+    }
+  }
+
+  connect()
+  // Let the server free this tab's stream now rather than on its next write
+  window.addEventListener('pagehide', function () { live.close() })
+  window.addEventListener('pageshow', function (e) {
+    if (e.persisted) { connect() }
+  })
+})
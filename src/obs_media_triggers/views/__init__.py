@@ -1,9 +1,17 @@
+from .api import view_api
 from .events import view_events
+from .history import view_history
+from .metrics import view_metrics
+from .traces import view_traces
 from .obs import view_obs
 from .twitch import view_twitch
 
 __all__ = [
+    "view_api",
     "view_events",
+    "view_history",
+    "view_metrics",
     "view_obs",
     "view_twitch",
+    "view_traces",
 ]
@@ -0,0 +1,71 @@
+from hmac import compare_digest
+from logging import getLogger
+from .. import __api_token_env__
+from ..controllers import OBSClientsManager
+from flask import Blueprint, current_app, request
+
+LOG = getLogger(__name__)
+
+view_api = Blueprint("view_api", __name__)
+
+MAX_BATCH = 100
+
+
+def is_authorized() -> bool:
+    token = current_app.config.get("API_TOKEN")
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and compare_digest(
+        given.strip().encode(), token.encode()
+    )
+
+
+def parse_triggers(body: object) -> list[dict]:
+    items = body.get("triggers", [body]) if isinstance(body, dict) else body
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH:
+        raise RuntimeError(f"Expected 1 to {MAX_BATCH} triggers!")
+
+    triggers, errors = [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(f"triggers[{i}]: expected an object")
+            continue
+        name = item.get("trigger")
+        obs_id = item.get("obs_id")
+        user = item.get("user")
+        if not isinstance(name, str) or not name.strip():
+            errors.append(f"triggers[{i}].trigger: expected a trigger name")
+        if obs_id is not None and (type(obs_id) is not int or obs_id < 1):
+            errors.append(f"triggers[{i}].obs_id: expected an OBS client id")
+        if user is not None and not isinstance(user, str):
+            errors.append(f"triggers[{i}].user: expected a string")
+        triggers.append({"trigger": name, "obs_id": obs_id, "user": user})
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return triggers
+
+
+@view_api.route("/trigger", methods=["POST"])
+def post_trigger():
+    """Fire one or a batch of named triggers, answering before OBS does.
+
+    The body is {"trigger": "Clip", "obs_id": 1, "user": "bot"}, a list of
+    those, or {"triggers": [...]}. Without an obs_id the trigger fires on every
+    connected OBS client. Authenticate with "Authorization: Bearer <token>".
+    """
+    if not current_app.config.get("API_TOKEN"):
+        return {"err": f"Set {__api_token_env__} to enable the trigger API!"}, 403
+    if not is_authorized():
+        return {"err": "Bad token!"}, 401, {"WWW-Authenticate": "Bearer"}
+
+    try:
+        triggers = parse_triggers(request.get_json(silent=True))
+    except RuntimeError as e:
+        return {"err": str(e)}, 400
+
+    obs: OBSClientsManager = current_app.obs
+    results = []
+    for t in triggers:
+        clients = obs.fire_trigger(t["trigger"], obs_id=t["obs_id"], user=t["user"])
+        LOG.debug(f"API trigger {t['trigger']}: {clients}")
+        results.append({"trigger": t["trigger"], "obs_clients": clients})
+    return {"results": results}, 202
@@ -1,4 +1,5 @@
 from logging import getLogger
+from .live import stream_updates
 from flask_login import login_required
 from ..controllers import EventSubsManager, OBSClientsManager, OBSActiveClient
 from flask import (
@@ -31,6 +32,33 @@ def get_root_id(id: int):
         return redirect(url_for("view_obs.get_root"))
 
 
+@view_events.route("/<int:id>/throttle", methods=["GET"])
+@login_required
+def get_id_throttle(id: int):
+    try:
+        client: OBSActiveClient = current_app.obs[id]
+    except IndexError as e:
+        return {"err": str(e)}, 404
+    return {
+        **client.throttle.counters,
+        "depth": client.throttle.depth,
+        "gifts": client.events.gifts.channel_total,
+    }
+
+
+@view_events.route("/<int:id>/live", methods=["GET"])
+@login_required
+def get_id_live(id: int):
+    """Server-sent events for the client's connection, scenes and triggers."""
+    obs: OBSClientsManager = current_app.obs
+    snapshot = {"obs_id": id, "state": obs.get_state(id).name}
+    try:
+        snapshot.update(obs[id].snapshot())
+    except IndexError:
+        pass
+    return stream_updates(obs.live, id, snapshot)
+
+
 @view_events.route("/<int:id>/scene", methods=["POST"])
 @login_required
 def post_id_scene(id: int):
@@ -43,7 +71,7 @@ def post_id_scene(id: int):
         form_active_scene is not None
         and form_active_scene != OBSActiveClient.DEFAULT_ACTIVE_SCENE
     ):
-        client.active_scene = form_active_scene
+        client.set_active_scene(form_active_scene)
         msg = f"Set active scene to {form_active_scene} for {client}"
         LOG.debug(msg)
         flash(msg, category="success")
@@ -71,21 +99,37 @@ def post_id_add(id: int):
     obs: OBSActiveClient = current_app.obs[id]
     form = request.form
 
-    # TODO: Reflect form in event creation
-    # fomr_src_template = form.get("event_src_template")
-    # form_type = form.get("event_type")
-    # form_qt = form.get("event_qt")
-    # form_allow_anon = form.get("event_allow_anon") is not None
+    try:
+        event_sub = obs.subscribe_to_event(form)
+        msg = f"Created {event_sub.type.name} event for {event_sub.src_template}"
+        LOG.debug(msg)
+        flash(msg, category="success")
+    except RuntimeError as e:
+        msg = f"Failed to create event with reason: {e}"
+        LOG.error(msg)
+        flash(msg, category="danger")
+    return redirect(url_for("view_events.get_root_id", id=id))
+
 
-    obs.subscribe_to_event(form)
+@view_events.route("/<int:id>/remove/<int:event_id>", methods=["GET"])
+@login_required
+def get_id_remove(id: int, event_id: int):
+    obs: OBSActiveClient = current_app.obs[id]
 
-    msg = f"Created events with form: {form}"
-    LOG.debug(msg)
-    flash(msg, category="success")
+    try:
+        obs.events.delete_event_sub(event_id)
+        flash(f"Event #{event_id} has been removed!", category="success")
+    except RuntimeError as e:
+        msg = f"Event #{event_id} deletion failed with reason: {e}"
+        LOG.error(msg)
+        flash(msg, category="danger")
+    return redirect(url_for("view_events.get_root_id", id=id))
+
+
+@view_events.route("/<int:id>/reload", methods=["GET"])
+@login_required
+def get_id_reload(id: int):
+    obs: OBSClientsManager = current_app.obs
+    obs.invalidate_event_subs(id)
+    flash(f"Reloaded events for OBS Client #{id}", category="success")
     return redirect(url_for("view_events.get_root_id", id=id))
-    # try:
-    # except RuntimeError as e:
-    #     msg = f"Failed to create event with reason: {e}"
-    #     LOG.error(msg)
-    #     flash(msg, category="danger")
-    #     redirect(url_for("view_events.get_root_id", id=id))
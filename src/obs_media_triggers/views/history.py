@@ -0,0 +1,21 @@
+from flask_login import login_required
+from flask import Blueprint, current_app, render_template, request
+
+view_history = Blueprint("view_history", __name__)
+
+
+@view_history.route("/", methods=["GET"])
+@login_required
+def get_root():
+    obs_id = request.args.get("obs_id", type=int)
+    before = request.args.get("before", type=int)
+    journal = current_app.obs.journal
+    # One extra row tells whether there is an older page, without counting
+    entries = journal.get_page(obs_id, before, journal.PAGE_SIZE + 1)
+    older = entries[-2].id if len(entries) > journal.PAGE_SIZE else None
+    return render_template(
+        "history.html",
+        entries=entries[: journal.PAGE_SIZE],
+        obs_id=obs_id,
+        older=older,
+    )
@@ -0,0 +1,45 @@
+import json
+from flask import Response
+from ..controllers import LiveFeed
+
+# Seconds between comments sent on an idle stream; a closed tab is only
+# noticed, and its request thread freed, on the next write
+LIVE_KEEPALIVE = 5
+# Milliseconds browsers wait before opening a stream again
+LIVE_RETRY = 5000
+
+
+def format_sse(kind: str, data: dict) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_updates(
+    live: LiveFeed, obs_id: int = None, snapshot: dict = None, kinds: list = None
+):
+    """A server-sent events response of `live` updates, after `snapshot`."""
+    try:
+        subscription = live.subscribe(obs_id, kinds)
+    except RuntimeError as e:
+        return {"err": str(e)}, 503, {"Retry-After": str(LIVE_RETRY // 1000)}
+
+    def stream():
+        try:
+            yield f"retry: {LIVE_RETRY}\n\n"
+            if snapshot is not None:
+                yield format_sse("snapshot", snapshot)
+            while True:
+                update = subscription.get(LIVE_KEEPALIVE)
+                if subscription.closed:
+                    break
+                if update is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(update.kind, update.to_dict())
+        finally:
+            live.unsubscribe(subscription)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
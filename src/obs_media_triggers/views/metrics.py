@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from ..controllers.metrics import METRICS
+
+view_metrics = Blueprint("view_metrics", __name__)
+
+
+@view_metrics.route("", methods=["GET"])
+def get_root():
+    return Response(METRICS.render(), content_type=METRICS.CONTENT_TYPE)
@@ -1,5 +1,5 @@
 from logging import getLogger
-from websocket import WebSocketAddressException
+from .live import stream_updates
 from flask_login import login_required
 from ..controllers import OBSClientsManager
 from flask import (
@@ -114,21 +114,54 @@ def get_connect(id: int):
     obs: OBSClientsManager = current_app.obs
     LOG.debug(f"Attempting connection to OBS Client #{id}")
     try:
-        obs.connect_client(id)
-        msg = f"OBS Client #{id} succesfully connected!"
-        LOG.info(msg)
-        flash(id, category="success")
-    except (
-        RuntimeError,
-        ConnectionRefusedError,
-        WebSocketAddressException,
-        TimeoutError,
-    ) as e:
+        obs.connect_client_async(id)
+        flash(f"Connecting to OBS Client #{id}...", category="info")
+    except RuntimeError as e:
         msg = f"OBS Client #{id} connection faild: {e}"
         LOG.error(msg)
         flash(msg, category="danger")
-    finally:
-        return redirect(url_for("view_obs.get_root"))
+    return redirect(url_for("view_obs.get_root"))
+
+
+@view_obs.route("/connect", methods=["GET"])
+@login_required
+def get_connect_all():
+    obs: OBSClientsManager = current_app.obs
+    futures = obs.connect_all()
+    flash(f"Connecting to {len(futures)} OBS Clients...", category="info")
+    return redirect(url_for("view_obs.get_root"))
+
+
+@view_obs.route("/export", methods=["GET"])
+@login_required
+def get_export():
+    """Every OBS client with its triggers and channels, as JSON.
+
+    Passwords are left out unless `include_secrets` is set.
+    """
+    obs: OBSClientsManager = current_app.obs
+    secrets = request.args.get("include_secrets", "").lower() in ("1", "true", "yes")
+    return obs.export_config(include_secrets=secrets)
+
+
+@view_obs.route("/import", methods=["POST"])
+@login_required
+def post_import():
+    """Import clients and triggers exported by /export, all or nothing."""
+    obs: OBSClientsManager = current_app.obs
+    replace = request.args.get("replace", "").lower() in ("1", "true", "yes")
+    try:
+        return obs.import_config(request.get_json(silent=True), replace=replace)
+    except RuntimeError as e:
+        LOG.error(f"OBS configuration import failed: {e}")
+        return {"err": str(e)}, 400
+
+
+@view_obs.route("/live", methods=["GET"])
+@login_required
+def get_live():
+    """Server-sent connection state changes of every OBS client."""
+    return stream_updates(current_app.obs.live, kinds=["state"])
 
 
 @view_obs.route("/disconnect/<int:id>", methods=["GET"])
@@ -0,0 +1,18 @@
+from flask_login import login_required
+from flask import Blueprint, current_app, render_template, request
+
+view_traces = Blueprint("view_traces", __name__)
+
+
+@view_traces.route("/", methods=["GET"])
+@login_required
+def get_root():
+    slowest = request.args.get("slowest") is not None
+    traces = current_app.obs.fanout.traces.get_traces(slowest=slowest)
+    return render_template("traces.html", traces=traces, slowest=slowest)
+
+
+@view_traces.route("/export", methods=["GET"])
+@login_required
+def get_export():
+    return {"traces": current_app.obs.fanout.traces.to_list()}
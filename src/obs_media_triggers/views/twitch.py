@@ -44,6 +44,7 @@ def get_login():
 
     try:
         db_user: TwitchOAuthUserModel = twitch.login(user_token)
+        current_app.obs.subscribe_channel(db_user.id)
         msg = f"Logged into Twitch as {db_user.display_name}"
         LOG.debug(msg)
         flash(msg, category="success")
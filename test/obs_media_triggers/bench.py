@@ -0,0 +1,340 @@
+"""End-to-end trigger latency benchmark.
+
+Streams chat messages or gift subs through the real TwitchClient EventSub
+socket into a real OBSActiveClient, both talking to the local stand-ins in
+`fakes`, and times each event from the moment it is sent to the moment the
+matching SetSceneItemEnabled request reaches OBS.
+
+    python -m test.obs_media_triggers.bench --kind chat --rate 500 --count 5000
+    python -m test.obs_media_triggers.bench --ceiling
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import argparse
+from time import perf_counter, sleep
+from threading import Lock
+from collections import deque
+from tempfile import mkdtemp
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional
+
+os.environ.setdefault("OMT_APP_SECRET", "bench")
+
+from flask import Flask  # noqa: E402
+from obs_media_triggers.models import (  # noqa: E402
+    DB,
+    EventSubModel,
+    EventTypes,
+    OBSWSClientModel,
+)
+from obs_media_triggers.controllers import (  # noqa: E402
+    EventFanOut,
+    OBSActiveClient,
+    ThrottleConfig,
+    TriggerExecutor,
+    TwitchClient,
+)
+from .fakes import FakeOBS, FakeServers, FakeTwitch  # noqa: E402
+
+CHAT = "channel.chat.message"
+GIFT = "channel.subscription.gift"
+
+
+@dataclass
+class BenchResult:
+    kind: str
+    rate: float
+    sent: int
+    expected: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def acked(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.acked / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return float("nan")
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "rate": self.rate,
+            "sent": self.sent,
+            "expected": self.expected,
+            "acked": self.acked,
+            "events_per_sec": round(self.throughput, 1),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+        }
+
+    def __str__(self) -> str:
+        d = self.to_dict()
+        return (
+            f"{d['kind']} @ {d['rate']:.0f}/s: {d['acked']}/{d['expected']} acked, "
+            f"{d['events_per_sec']} events/s, p50 {d['p50_ms']}ms, "
+            f"p95 {d['p95_ms']}ms, p99 {d['p99_ms']}ms"
+        )
+
+
+class Bench:
+    """One app instance wired to fake Twitch and OBS servers."""
+
+    def __init__(self, sources: int = 8, data_dir: Optional[str] = None) -> None:
+        self.servers = FakeServers()
+        self.twitch_server = FakeTwitch(self.servers)
+        self.sources = [f"bench{i}" for i in range(sources)]
+        self.obs_server = FakeOBS(self.servers, self.sources, self.__on_enabled)
+        self.outstanding: Dict[int, Deque[float]] = {}
+        self.latencies: List[float] = []
+        self.lock = Lock()
+
+        data_dir = mkdtemp(prefix="omt-bench-") if data_dir is None else data_dir
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{data_dir}/bench.db"
+        DB.init_app(self.app)
+        with self.app.app_context():
+            DB.create_all()
+            db_info = OBSWSClientModel(
+                host="127.0.0.1", port=self.obs_server.port, password=""
+            )
+            DB.session.add(db_info)
+            DB.session.commit()
+            for source in self.sources:
+                DB.session.add(
+                    EventSubModel(
+                        obs_id=db_info.id,
+                        type=EventTypes.CHANNEL_CHAT_MESSAGE,
+                        src_template=source,
+                    )
+                )
+            DB.session.add(
+                EventSubModel(
+                    obs_id=db_info.id,
+                    type=EventTypes.CHANNEL_SUBSCRIPTION_GIFT,
+                    src_template=self.sources[0],
+                    quantity=1,
+                    allow_anon=True,
+                )
+            )
+            DB.session.commit()
+
+            self.twitch = TwitchClient(
+                self.app,
+                DB,
+                base_url=self.twitch_server.base_url,
+                auth_base_url=self.twitch_server.auth_base_url,
+            )
+            self.twitch.eventsub.connection_url = self.twitch_server.connection_url
+            self.twitch.run(
+                self.twitch.set_user_authentication(
+                    "bench",
+                    TwitchClient.API_SCOPES,
+                    refresh_token="bench",
+                    validate=False,
+                )
+            )
+            self.twitch.eventsub.add_broadcaster(FakeTwitch.USER_ID, "bench", "bench")
+            self.executor = TriggerExecutor()
+            self.fanout = EventFanOut(self.twitch)
+            self.client = OBSActiveClient(
+                DB,
+                db_info,
+                self.twitch,
+                self.executor,
+                self.fanout,
+                ThrottleConfig(rate=1e9, burst=10**9),
+            )
+        self.fanout.subscribe(EventTypes.CHANNEL_CHAT_MESSAGE, FakeTwitch.USER_ID)
+        self.fanout.subscribe(EventTypes.CHANNEL_SUBSCRIPTION_GIFT, FakeTwitch.USER_ID)
+
+    def close(self) -> None:
+        # Let playing triggers revert before their lane goes away
+        deadline = perf_counter() + TriggerExecutor.DEFAULT_DURATION + 2
+        while self.executor.pending and perf_counter() < deadline:
+            sleep(0.05)
+        self.client.disconnect()
+        self.executor.shutdown()
+        self.twitch.shutdown()
+        self.servers.stop()
+
+    def __on_enabled(self, item_id: int, at: float) -> None:
+        with self.lock:
+            sent = self.outstanding.get(item_id)
+            # Everything sent for this item before it was enabled was served
+            # by this request, including triggers coalesced into it
+            while sent and sent[0] <= at:
+                self.latencies.append(at - sent.popleft())
+
+    def expected_items(self, type: str, event: dict) -> List[int]:
+        if type == GIFT:
+            return [self.obs_server.item_id(self.sources[0])]
+        actions = self.client.events.dispatcher.match(event["message"]["text"])
+        if actions is None:
+            return []
+        return sorted(
+            {
+                self.obs_server.item_id(step.source_name)
+                for action in actions
+                for step in action.steps
+                if step.enabled
+            }
+        )
+
+    def synthetic(self, kind: str, count: int) -> Iterable[tuple[str, dict]]:
+        for i in range(count):
+            if kind == "gift":
+                yield GIFT, {
+                    "user_id": str(100 + i % 50),
+                    "user_login": "gifter",
+                    "user_name": "Gifter",
+                    "broadcaster_user_id": FakeTwitch.USER_ID,
+                    "broadcaster_user_login": "bench",
+                    "broadcaster_user_name": "Bench",
+                    "total": 1,
+                    "tier": "1000",
+                    "cumulative_total": None,
+                    "is_anonymous": False,
+                }
+            else:
+                yield CHAT, {
+                    "broadcaster_user_id": FakeTwitch.USER_ID,
+                    "broadcaster_user_login": "bench",
+                    "broadcaster_user_name": "Bench",
+                    "chatter_user_id": str(100 + i % 50),
+                    "chatter_user_login": "chatter",
+                    "chatter_user_name": "Chatter",
+                    "message_id": str(i),
+                    "message": {
+                        "text": f"!{self.sources[i % len(self.sources)]}",
+                        "fragments": [],
+                    },
+                    "message_type": "text",
+                    "badges": [],
+                    "color": "",
+                }
+
+    @staticmethod
+    def replay(path: str) -> Iterable[tuple[str, dict]]:
+        """Read a recording of `{"type": <EventSub type>, "event": {...}}` lines."""
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["type"], record["event"]
+
+    def run(
+        self,
+        events: Iterable[tuple[str, dict]],
+        rate: float,
+        kind: str = "chat",
+        drain_timeout: float = 5.0,
+    ) -> BenchResult:
+        with self.lock:
+            self.outstanding.clear()
+            self.latencies = []
+        sent = expected = 0
+        interval = 1 / rate
+        began = perf_counter()
+        for type, event in events:
+            delay = began + sent * interval - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            items = self.expected_items(type, event)
+            now = perf_counter()
+            with self.lock:
+                for item in items:
+                    self.outstanding.setdefault(item, deque()).append(now)
+            expected += len(items)
+            self.twitch_server.notify(type, event)
+            sent += 1
+
+        deadline = perf_counter() + drain_timeout
+        while perf_counter() < deadline:
+            with self.lock:
+                if not any(self.outstanding.values()):
+                    break
+            sleep(0.005)
+        with self.lock:
+            latencies = list(self.latencies)
+        return BenchResult(
+            kind, rate, sent, expected, perf_counter() - began, latencies
+        )
+
+    def ceiling(
+        self,
+        kind: str = "chat",
+        start: float = 100,
+        duration: float = 2.0,
+        budget: float = 0.25,
+        limit: float = 100000,
+    ) -> List[BenchResult]:
+        """Double the event rate until OBS falls behind or p99 exceeds `budget`."""
+        results = []
+        rate = start
+        while rate <= limit:
+            result = self.run(self.synthetic(kind, int(rate * duration)), rate, kind)
+            results.append(result)
+            if result.acked < result.expected or result.percentile(99) > budget:
+                break
+            rate *= 2
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kind", choices=["chat", "gift"], default="chat")
+    parser.add_argument("--rate", type=float, default=200, help="Events/sec to send.")
+    parser.add_argument("--count", type=int, default=2000, help="Events to send.")
+    parser.add_argument("--sources", type=int, default=8, help="Distinct triggers.")
+    parser.add_argument("--replay", help="JSON lines recording to replay instead.")
+    parser.add_argument(
+        "--ceiling",
+        action="store_true",
+        help="Ramp the rate up to find the maximum sustained events/sec.",
+    )
+    parser.add_argument(
+        "--budget", type=float, default=0.25, help="p99 seconds allowed by --ceiling."
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    bench = Bench(sources=args.sources)
+    try:
+        if args.ceiling:
+            results = bench.ceiling(args.kind, budget=args.budget)
+        elif args.replay:
+            results = [bench.run(Bench.replay(args.replay), args.rate, "replay")]
+        else:
+            events = bench.synthetic(args.kind, args.count)
+            results = [bench.run(events, args.rate, args.kind)]
+    finally:
+        bench.close()
+
+    if args.json:
+        print(json.dumps([r.to_dict() for r in results], indent=2))
+    else:
+        for result in results:
+            print(result)
+    if args.ceiling:
+        sustained = [
+            r for r in results
+            if r.acked == r.expected and r.percentile(99) <= args.budget
+        ]
+        best = max((r.throughput for r in sustained), default=0.0)
+        print(f"Max sustained: {best:.0f} events/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Local stand-ins for the Twitch EventSub and OBS websocket v5 servers.
+
+Both run on one asyncio loop in a background thread and only implement the
+parts of each protocol the app actually uses, so the real TwitchClient and
+OBSActiveClient can be driven end to end without a network connection.
+"""
+
+from __future__ import annotations
+
+import json
+import asyncio
+from uuid import uuid4
+from aiohttp import web
+from threading import Thread
+from time import perf_counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+
+class FakeServers:
+    """Runs a set of aiohttp apps on an ephemeral localhost port each."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="bench-fakes", daemon=True)
+        self.runners: List[web.AppRunner] = []
+        self.thread.start()
+
+    def call(self, coro, timeout: float = 10):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def serve(self, app: web.Application) -> int:
+        async def start() -> int:
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self.runners.append(runner)
+            return site._server.sockets[0].getsockname()[1]
+
+        return self.call(start())
+
+    def stop(self) -> None:
+        async def cleanup() -> None:
+            for runner in self.runners:
+                await runner.cleanup()
+
+        self.call(cleanup())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class FakeOBS:
+    """An obs-websocket v5 server with one scene holding the given sources.
+
+    `on_enabled(item_id, at)` is called every time a scene item is enabled,
+    with the perf_counter timestamp at which the request arrived.
+    """
+
+    SCENE = "Bench"
+
+    def __init__(
+        self,
+        servers: FakeServers,
+        sources: List[str],
+        on_enabled: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
+        self.sources = sources
+        self.on_enabled = on_enabled
+        self.requests = 0
+        app = web.Application()
+        app.router.add_get("/", self.handle)
+        self.port = servers.serve(app)
+
+    def item_id(self, source_name: str) -> int:
+        return self.sources.index(source_name) + 1
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json(
+            {"op": 0, "d": {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}}
+        )
+        async for message in ws:
+            arrived = perf_counter()
+            data = json.loads(message.data)
+            op, d = data["op"], data["d"]
+            if op == 1:
+                await ws.send_json({"op": 2, "d": {"negotiatedRpcVersion": 1}})
+            elif op == 6:
+                await ws.send_json({"op": 7, "d": self.respond(d, arrived)})
+            elif op == 8:
+                results = [self.respond(r, arrived) for r in d["requests"]]
+                await ws.send_json(
+                    {"op": 9, "d": {"requestId": d["requestId"], "results": results}}
+                )
+        return ws
+
+    def respond(self, request: dict, arrived: float) -> dict:
+        self.requests += 1
+        type, data = request["requestType"], request.get("requestData", {})
+        response = {
+            "requestType": type,
+            "requestStatus": {"result": True, "code": 100},
+        }
+        if "requestId" in request:
+            response["requestId"] = request["requestId"]
+
+        if type == "GetVersion":
+            response["responseData"] = {
+                "obsVersion": "30.0.0",
+                "obsWebSocketVersion": "5.0.0",
+                "rpcVersion": 1,
+                "availableRequests": [],
+                "supportedImageFormats": [],
+                "platform": "bench",
+                "platformDescription": "",
+            }
+        elif type == "GetSceneList":
+            response["responseData"] = {
+                "currentProgramSceneName": FakeOBS.SCENE,
+                "currentPreviewSceneName": None,
+                "scenes": [{"sceneName": FakeOBS.SCENE, "sceneIndex": 0}],
+            }
+        elif type == "GetSceneItemList":
+            response["responseData"] = {
+                "sceneItems": [
+                    {
+                        "sceneItemId": i + 1,
+                        "sourceName": name,
+                        "sceneItemEnabled": False,
+                    }
+                    for i, name in enumerate(self.sources)
+                ]
+            }
+        elif type == "SetSceneItemEnabled":
+            if data["sceneItemEnabled"] and self.on_enabled is not None:
+                self.on_enabled(data["sceneItemId"], arrived)
+        return response
+
+
+class FakeTwitch:
+    """The Helix, OAuth and EventSub websocket endpoints used by TwitchClient.
+
+    Subscriptions are accepted for any type and channel, and belong to the
+    EventSub session named in their transport, like on Twitch. `notify` pushes
+    an event to the session subscribed to its type and broadcaster. `drop`
+    cuts a session off so the client notices once its keepalive runs out, and
+    `refuse` turns away the next few connection attempts.
+    """
+
+    USER_ID = "1"
+    KEEPALIVE = 600
+    EXPIRES_IN = 3600
+
+    def __init__(self, servers: FakeServers) -> None:
+        self.servers = servers
+        self.sessions: Dict[str, web.WebSocketResponse] = {}
+        self.subscriptions: Dict[tuple, dict] = {}
+        self.refusals = 0
+        self.keepalive = FakeTwitch.KEEPALIVE
+        self.expires_in = FakeTwitch.EXPIRES_IN
+        self.refreshes = 0
+        self.connected = asyncio.Event()
+        app = web.Application()
+        app.router.add_get("/ws", self.handle_socket)
+        app.router.add_get("/oauth2/validate", self.handle_validate)
+        app.router.add_post("/oauth2/token", self.handle_token)
+        app.router.add_post("/helix/eventsub/subscriptions", self.handle_subscribe)
+        app.router.add_get("/helix/eventsub/subscriptions", self.handle_subscriptions)
+        self.port = servers.serve(app)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/helix/"
+
+    @property
+    def auth_base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/oauth2/"
+
+    @property
+    def connection_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/ws"
+
+    async def handle_validate(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "client_id": "bench",
+                "login": "bench",
+                "scopes": [],
+                "user_id": FakeTwitch.USER_ID,
+                "expires_in": self.expires_in,
+            }
+        )
+
+    async def handle_token(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.refreshes += 1
+        return web.json_response(
+            {
+                "access_token": uuid4().hex,
+                "refresh_token": form["refresh_token"],
+                "expires_in": self.expires_in,
+                "scope": [],
+                "token_type": "bearer",
+            }
+        )
+
+    async def handle_subscribe(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        subscription = {
+            "id": uuid4().hex,
+            "type": body["type"],
+            "version": body["version"],
+            "status": "enabled",
+            "cost": 0,
+            "condition": body["condition"],
+            "transport": body["transport"],
+            "created_at": self.now(),
+        }
+        key = (body["type"], body["condition"]["broadcaster_user_id"])
+        self.subscriptions[key] = subscription
+        return web.json_response(
+            {"data": [subscription], "total": 1, "total_cost": 0, "max_total_cost": 10},
+            status=202,
+        )
+
+    async def handle_subscriptions(self, request: web.Request) -> web.Response:
+        status = request.query.get("status")
+        data = [
+            s
+            for s in self.subscriptions.values()
+            if status is None or s["status"] == status
+        ]
+        return web.json_response(
+            {
+                "data": data,
+                "total": len(data),
+                "total_cost": 0,
+                "max_total_cost": 10,
+                "pagination": {},
+            }
+        )
+
+    async def handle_socket(self, request: web.Request) -> web.StreamResponse:
+        if self.refusals > 0:
+            self.refusals -= 1
+            return web.Response(status=503)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = uuid4().hex
+        await ws.send_json(
+            {
+                "metadata": self.metadata("session_welcome"),
+                "payload": {
+                    "session": {
+                        "id": session_id,
+                        "status": "connected",
+                        "connected_at": self.now(),
+                        "keepalive_timeout_seconds": self.keepalive,
+                        "reconnect_url": None,
+                    }
+                },
+            }
+        )
+        self.sessions[session_id] = ws
+        self.connected.set()
+        keepalive = asyncio.ensure_future(self.send_keepalives(ws))
+        async for _ in ws:
+            pass
+        keepalive.cancel()
+        # Subscriptions end with the session they were made on
+        del self.sessions[session_id]
+        for key, subscription in list(self.subscriptions.items()):
+            if subscription["transport"]["session_id"] == session_id:
+                del self.subscriptions[key]
+        return ws
+
+    async def send_keepalives(self, ws: web.WebSocketResponse) -> None:
+        while not ws.closed:
+            await asyncio.sleep(self.keepalive / 2)
+            if not ws.closed:
+                await ws.send_json({"metadata": self.metadata("session_keepalive")})
+
+    def session_of(self, type: str, broadcaster_id: str) -> Optional[str]:
+        subscription = self.subscriptions.get((type, broadcaster_id))
+        return None if subscription is None else subscription["transport"]["session_id"]
+
+    def notify(self, type: str, event: dict) -> None:
+        """Send one notification; safe to call from any thread."""
+        subscription = self.subscriptions[(type, event["broadcaster_user_id"])]
+        message = json.dumps(
+            {
+                "metadata": self.metadata("notification"),
+                "payload": {"subscription": subscription, "event": event},
+            }
+        )
+        socket = self.sessions[subscription["transport"]["session_id"]]
+        asyncio.run_coroutine_threadsafe(socket.send_str(message), self.servers.loop)
+
+    def drop(self, session_id: str, refusals: int = 0) -> None:
+        """Close a session without telling the client, as if the network went."""
+        self.refuse(refusals)
+        self.servers.call(self.sessions[session_id].close())
+
+    def refuse(self, count: int) -> None:
+        self.refusals = count
+
+    @staticmethod
+    def metadata(message_type: str) -> dict:
+        return {
+            "message_id": uuid4().hex,
+            "message_type": message_type,
+            "message_timestamp": FakeTwitch.now(),
+        }
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
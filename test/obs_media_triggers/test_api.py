@@ -0,0 +1,83 @@
+import unittest
+
+try:
+    from flask import Flask
+    from obs_media_triggers.views.api import MAX_BATCH, view_api
+except ImportError:  # The app is not installed
+    view_api = None
+
+TOKEN = "secret"
+
+
+class RecordingManager:
+    """Stands in for OBSClientsManager, answering for one connected client."""
+
+    def __init__(self):
+        self.fired = []
+
+    def fire_trigger(self, name: str, obs_id: int = None, user: str = None) -> list:
+        self.fired.append((name, obs_id, user))
+        return [{"obs_id": obs_id or 1, "status": "accepted"}]
+
+
+@unittest.skipIf(view_api is None, "app dependencies are not installed")
+class TestTriggerAPI(unittest.TestCase):
+    """The trigger endpoint behind a bearer token."""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.config["API_TOKEN"] = TOKEN
+        app.register_blueprint(view_api, url_prefix="/api/")
+        app.obs = self.obs = RecordingManager()
+        self.app = app
+        self.client = app.test_client()
+
+    def post(self, body: object, token: str = TOKEN):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return self.client.post("/api/trigger", json=body, headers=headers)
+
+    def test_single_trigger_is_accepted(self):
+        res = self.post({"trigger": "Clip", "obs_id": 2, "user": "bot"})
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(
+            res.json["results"],
+            [{"trigger": "Clip", "obs_clients": [{"obs_id": 2, "status": "accepted"}]}],
+        )
+        self.assertEqual(self.obs.fired, [("Clip", 2, "bot")])
+
+    def test_batches_fire_in_order(self):
+        triggers = [{"trigger": "A"}, {"trigger": "B"}]
+        for body in (triggers, {"triggers": triggers}):
+            self.obs.fired.clear()
+            self.assertEqual(self.post(body).status_code, 202)
+            self.assertEqual([f[0] for f in self.obs.fired], ["A", "B"])
+
+    def test_missing_or_wrong_token_is_rejected(self):
+        for token in (None, "wrong", TOKEN.upper()):
+            res = self.post({"trigger": "Clip"}, token=token)
+            self.assertEqual(res.status_code, 401)
+            self.assertEqual(res.headers["WWW-Authenticate"], "Bearer")
+        self.assertEqual(self.obs.fired, [])
+
+    def test_api_is_off_without_a_configured_token(self):
+        self.app.config["API_TOKEN"] = None
+        self.assertEqual(self.post({"trigger": "Clip"}).status_code, 403)
+
+    def test_batch_size_is_limited(self):
+        batch = [{"trigger": "Clip"}] * MAX_BATCH
+        self.assertEqual(self.post(batch).status_code, 202)
+        self.obs.fired.clear()
+        self.assertEqual(self.post(batch + [{"trigger": "Clip"}]).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.obs.fired, [])
+
+    def test_invalid_items_fire_nothing(self):
+        res = self.post([{"trigger": "Clip"}, {"trigger": " ", "obs_id": True}])
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("triggers[1].trigger", res.json["err"])
+        self.assertIn("triggers[1].obs_id", res.json["err"])
+        self.assertEqual(self.obs.fired, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
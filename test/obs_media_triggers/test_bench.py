@@ -0,0 +1,56 @@
+import unittest
+
+try:
+    from .bench import Bench
+    from .fakes import FakeOBS
+except ImportError:  # The app or aiohttp is not installed
+    Bench = None
+
+
+@unittest.skipIf(Bench is None, "app dependencies are not installed")
+class TestTriggerLatency(unittest.TestCase):
+    """A short offline run of the benchmark; prints its numbers.
+
+    The thresholds leave plenty of room for slow CI runners, which still
+    deliver well under 5ms at p95, but catch the trigger path falling behind.
+    """
+
+    RATE = 200
+    COUNT = 200
+    # Share of the offered rate that must be acknowledged by OBS
+    MIN_THROUGHPUT = 0.9
+    # Seconds from a Twitch event to OBS acknowledging its trigger
+    MAX_P95_LATENCY = 0.05
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bench = Bench(sources=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bench.close()
+
+    def run_kind(self, kind: str):
+        events = self.bench.synthetic(kind, self.COUNT)
+        result = self.bench.run(events, self.RATE, kind)
+        print(f"\n{result}")
+        self.assertGreaterEqual(result.throughput, self.RATE * self.MIN_THROUGHPUT)
+        self.assertLessEqual(result.percentile(95), self.MAX_P95_LATENCY)
+        return result
+
+    def test_client_starts_on_the_program_scene(self):
+        self.assertEqual(self.bench.client.active_scene, FakeOBS.SCENE)
+
+    def test_chat_messages_reach_obs(self):
+        result = self.run_kind("chat")
+        self.assertEqual(result.sent, self.COUNT)
+        self.assertEqual(result.acked, result.expected)
+
+    def test_gift_subs_reach_obs(self):
+        result = self.run_kind("gift")
+        self.assertEqual(result.sent, self.COUNT)
+        self.assertEqual(result.acked, result.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+
+try:
+    from flask import Flask
+    from obs_media_triggers.models import DB, EventTypes
+    from obs_media_triggers.controllers.bulk import ConfigTransfer
+except ImportError:  # The app is not installed
+    ConfigTransfer = None
+
+
+def document(**client) -> dict:
+    event = {"type": "CHANNEL_CHAT_MESSAGE", "src_template": "Clip + -Cam"}
+    return {
+        "version": ConfigTransfer.VERSION,
+        "obs_clients": [
+            {"host": "localhost", "port": 4455, "events": [event], **client}
+        ],
+    }
+
+
+@unittest.skipIf(ConfigTransfer is None, "app dependencies are not installed")
+class TestConfigValidation(unittest.TestCase):
+    """Documents checked as a whole before anything is written."""
+
+    def setUp(self):
+        self.transfer = ConfigTransfer(None)
+
+    def errors(self, data: object) -> str:
+        with self.assertRaises(RuntimeError) as caught:
+            self.transfer.validate(data)
+        return str(caught.exception)
+
+    def test_valid_document_is_normalized(self):
+        data = document(port="4455", channels=["2", "1", "2"])
+        (client,) = self.transfer.validate(data)
+        self.assertEqual(client["port"], 4455)
+        self.assertIsNone(client["password"])
+        self.assertEqual(client["channels"], ["1", "2"])
+        self.assertEqual(client["events"][0]["type"], EventTypes.CHANNEL_CHAT_MESSAGE)
+        self.assertFalse(client["events"][0]["allow_anon"])
+
+    def test_booleans_are_not_numbers(self):
+        gift = {"type": "CHANNEL_SUBSCRIPTION_GIFT", "src_template": "Clip"}
+        errors = self.errors(document(port=True, events=[{**gift, "quantity": True}]))
+        self.assertIn("obs_clients[0].port", errors)
+        self.assertIn("obs_clients[0].events[0].quantity", errors)
+
+    def test_every_problem_is_reported_at_once(self):
+        data = document(host="", events=[{"type": "NOPE", "src_template": " + "}])
+        data["obs_clients"].append(data["obs_clients"][0])
+        data["version"] = 2
+        errors = self.errors(data).split("; ")
+        self.assertIn("version: 2 is not supported", errors)
+        self.assertIn("obs_clients[0].host: expected a host name", errors)
+        self.assertIn("obs_clients[0].events[0].type: unknown event type NOPE", errors)
+        self.assertIn(
+            "obs_clients[0].events[0].src_template: expected at least one OBS source",
+            errors,
+        )
+        self.assertIn("obs_clients[1]: ws://:4455 is listed twice", errors)
+
+    def test_malformed_documents(self):
+        self.errors([])
+        self.errors({"obs_clients": {}})
+        self.assertIn("expected an object", self.errors({"obs_clients": [1]}))
+
+
+@unittest.skipIf(ConfigTransfer is None, "app dependencies are not installed")
+class TestConfigTransfer(unittest.TestCase):
+    """Round trips through an in-memory database."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        DB.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        DB.create_all()
+        self.transfer = ConfigTransfer(DB)
+
+    def tearDown(self):
+        DB.drop_all()
+        self.context.pop()
+
+    def test_importing_twice_changes_nothing(self):
+        data = document(channels=["1"])
+        self.transfer.load(data)
+        exported = self.transfer.export()
+        self.transfer.load(data)
+        self.assertEqual(self.transfer.export(), exported)
+        (client,) = exported["obs_clients"]
+        self.assertEqual(client["channels"], ["1"])
+        self.assertEqual(len(client["events"]), 1)
+
+    def test_passwords_are_exported_only_when_asked(self):
+        self.transfer.load(document(password="hunter2"))
+        (client,) = self.transfer.export()["obs_clients"]
+        self.assertNotIn("password", client)
+        (client,) = self.transfer.export(include_secrets=True)["obs_clients"]
+        self.assertEqual(client["password"], "hunter2")
+
+    def test_importing_without_a_password_keeps_the_saved_one(self):
+        self.transfer.load(document(password="hunter2"))
+        self.transfer.load(self.transfer.export())
+        (client,) = self.transfer.export(include_secrets=True)["obs_clients"]
+        self.assertEqual(client["password"], "hunter2")
+        self.transfer.load(document(password=""))
+        (client,) = self.transfer.export(include_secrets=True)["obs_clients"]
+        self.assertEqual(client["password"], "")
+
+    def test_invalid_import_writes_nothing(self):
+        data = document()
+        data["obs_clients"].append({"host": "other", "port": 0})
+        with self.assertRaises(RuntimeError):
+            self.transfer.load(data)
+        self.assertEqual(self.transfer.export()["obs_clients"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+
+try:
+    from obs_media_triggers.controllers.dispatch import (
+        CommandDispatcher,
+        TriggerAction,
+        TriggerStep,
+    )
+except ImportError:  # The app is not installed
+    CommandDispatcher = None
+
+
+def row(id: int, src_template: str) -> SimpleNamespace:
+    return SimpleNamespace(id=id, src_template=src_template)
+
+
+@unittest.skipIf(CommandDispatcher is None, "app dependencies are not installed")
+class TestCommandDispatcher(unittest.TestCase):
+    """Two triggers on one source, and one that also hides a source."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dispatcher = CommandDispatcher(
+            [row(1, "Air Horn"), row(2, "Air Horn"), row(3, "Clap + -Webcam")]
+        )
+
+    def ids(self, text: str) -> list:
+        actions = self.dispatcher.match(text)
+        return None if actions is None else [a.event_id for a in actions]
+
+    def test_whole_message_matches_with_or_without_prefix(self):
+        for text in ("Air Horn", "air horn", "airhorn", "!AirHorn", "  !air horn "):
+            self.assertEqual(self.ids(text), [1, 2], text)
+
+    def test_prefixed_command_may_be_followed_by_more_words(self):
+        self.assertEqual(self.ids("!clap for the streamer"), [3])
+
+    def test_plain_chat_starting_with_a_source_name_does_not_fire(self):
+        self.assertIsNone(self.ids("clap for the streamer"))
+        self.assertIsNone(self.ids("airhorns are loud"))
+
+    def test_unknown_and_empty_messages(self):
+        self.assertIsNone(self.ids(""))
+        self.assertIsNone(self.ids("!"))
+        self.assertIsNone(self.ids("!boo"))
+        self.assertIsNone(self.ids("hello"))
+
+    def test_steps_are_parsed_from_the_template(self):
+        (action,) = self.dispatcher.match("!clap")
+        self.assertEqual(
+            action.steps, (TriggerStep("Clap"), TriggerStep("Webcam", enabled=False))
+        )
+        self.assertEqual(TriggerAction.format_steps(action.steps), "Clap + -Webcam")
+
+    def test_recompiling_replaces_the_table(self):
+        dispatcher = CommandDispatcher([row(1, "Clap")])
+        dispatcher.compile([])
+        self.assertEqual(len(dispatcher), 0)
+        self.assertIsNone(dispatcher.match("!clap"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+try:
+    from obs_media_triggers.controllers.dispatch import TriggerAction
+    from obs_media_triggers.controllers.gifts import (
+        GiftAggregator,
+        GiftRule,
+        SlidingWindow,
+    )
+except ImportError:  # The app is not installed
+    GiftAggregator = None
+
+ANON = None
+
+
+@unittest.skipIf(GiftAggregator is None, "app dependencies are not installed")
+class TestSlidingWindow(unittest.TestCase):
+    """A 12 second window, one bucket per second."""
+
+    def test_amounts_expire_with_their_bucket(self):
+        window = SlidingWindow(12, now=0)
+        self.assertEqual(window.add(3, now=0.5), 3)
+        self.assertEqual(window.add(2, now=6), 5)
+        self.assertEqual(window.advance(12.5), 2)
+        self.assertEqual(window.advance(18.5), 0)
+
+    def test_a_long_gap_empties_the_window(self):
+        window = SlidingWindow(12, now=0)
+        window.add(5, now=1)
+        self.assertEqual(window.advance(1000), 0)
+        self.assertEqual(window.add(1, now=1000), 1)
+
+
+@unittest.skipIf(GiftAggregator is None, "app dependencies are not installed")
+class TestGiftAggregator(unittest.TestCase):
+    """Rules for 5 gifts from anyone, and for 10 gifts that may be anonymous."""
+
+    FIVE = TriggerAction(1, "Five")
+    TEN = TriggerAction(2, "Ten")
+
+    def setUp(self):
+        self.gifts = GiftAggregator(
+            rules=[GiftRule(5, False, self.FIVE), GiftRule(10, True, self.TEN)]
+        )
+
+    def test_gifter_total_crosses_the_quantity(self):
+        self.assertEqual(self.gifts.record("1", "a", 4), [])
+        self.assertEqual(self.gifts.record("1", "a", 1), [self.FIVE])
+        self.assertEqual(self.gifts.record("1", "a", 4), [])
+        self.assertEqual(self.gifts.record("1", "a", 1), [self.FIVE, self.TEN])
+
+    def test_channel_total_crosses_the_quantity(self):
+        self.assertEqual(self.gifts.record("1", "a", 3), [])
+        self.assertEqual(self.gifts.record("1", "b", 2), [self.FIVE])
+
+    def test_one_big_gift_fires_each_rule_once(self):
+        self.assertEqual(self.gifts.record("1", "a", 25), [self.FIVE, self.TEN])
+
+    def test_anonymous_gifts_only_count_where_allowed(self):
+        self.assertEqual(self.gifts.record("1", ANON, 5), [])
+        self.assertEqual(self.gifts.record("1", "a", 1), [])
+        self.assertEqual(self.gifts.record("1", ANON, 4), [self.TEN])
+
+    def test_channels_are_counted_apart(self):
+        self.assertEqual(self.gifts.record("1", "a", 3), [])
+        self.assertEqual(self.gifts.record("2", "a", 3), [])
+        self.assertEqual(self.gifts.record("2", "b", 2), [self.FIVE])
+        self.assertEqual(self.gifts.channel_total, 8)
+
+    def test_window_must_be_positive(self):
+        with self.assertRaises(RuntimeError):
+            GiftAggregator(window=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from time import monotonic, sleep
+
+try:
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.pool import StaticPool
+    from obs_media_triggers.controllers.journal import JOURNAL, EventJournal
+except ImportError:  # The app is not installed
+    EventJournal = None
+
+
+@unittest.skipIf(EventJournal is None, "app dependencies are not installed")
+class TestEventJournal(unittest.TestCase):
+    """One in-memory database shared with the journal's writer thread."""
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        JOURNAL.create(self.engine)
+        self.journal = EventJournal()
+        self.journal.start(self.engine)
+
+    def tearDown(self):
+        self.journal.stop()
+        self.engine.dispose()
+
+    def rows(self) -> list:
+        with self.engine.connect() as conn:
+            return conn.execute(select(JOURNAL).order_by(JOURNAL.c.id)).all()
+
+    def wait_for(self, condition) -> None:
+        deadline = monotonic() + 5
+        while not condition():
+            self.assertLess(monotonic(), deadline, "timed out")
+            sleep(0.01)
+
+    def test_buffered_status_changes_are_written_once(self):
+        entry = self.journal.record_trigger(None, 1, "Scene", "Clip")
+        self.journal.set_status(entry, EventJournal.ACKED)
+        self.journal.stop()
+        (row,) = self.rows()
+        self.assertEqual((row.id, row.status), (entry, EventJournal.ACKED))
+        self.assertEqual(self.journal.written, 1)
+
+    def test_a_failed_batch_is_written_with_the_next(self):
+        JOURNAL.drop(self.engine)
+        first = self.journal.record_trigger(None, 1, "Scene", "Clip")
+        self.wait_for(lambda: self.journal.failures > 0)
+        self.journal.set_status(first, EventJournal.ACKED)
+        second = self.journal.record_trigger(None, 1, "Scene", "Cam")
+        JOURNAL.create(self.engine)
+        self.journal.stop()
+        statuses = [(row.id, row.status) for row in self.rows()]
+        self.assertEqual(
+            statuses, [(first, EventJournal.ACKED), (second, EventJournal.QUEUED)]
+        )
+        self.assertEqual(self.journal.lost, 0)
+
+    def test_entries_the_database_never_takes_are_counted_lost(self):
+        JOURNAL.drop(self.engine)
+        self.journal.record_trigger(None, 1, "Scene", "Clip")
+        self.journal.stop()
+        self.assertEqual(self.journal.lost, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
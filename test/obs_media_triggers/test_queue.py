@@ -0,0 +1,61 @@
+import unittest
+from concurrent.futures import CancelledError
+
+try:
+    from obs_media_triggers.controllers.queue import QueueFull, TriggerQueue
+except ImportError:  # The app is not installed
+    TriggerQueue = None
+
+
+@unittest.skipIf(TriggerQueue is None, "app dependencies are not installed")
+class TestTriggerQueue(unittest.TestCase):
+    """Triggers held long enough for the test to pile more onto them."""
+
+    WINDOW = 0.2
+
+    def setUp(self):
+        self.queue = TriggerQueue("test-queue", size=2, window=self.WINDOW)
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_identical_triggers_run_once_with_their_count(self):
+        future, created = self.queue.put("a", lambda count: count)
+        for _ in range(2):
+            joined, joined_created = self.queue.put("a", self.fail)
+            self.assertIs(joined, future)
+            self.assertFalse(joined_created)
+        self.assertEqual(future.result(1), 3)
+        self.assertTrue(created)
+        self.assertEqual(self.queue.coalesced, 2)
+        self.assertEqual(self.queue.executed, 1)
+
+    def test_distinct_triggers_past_the_size_are_dropped(self):
+        self.queue.put("a", lambda count: None)
+        self.queue.put("b", lambda count: None)
+        future, created = self.queue.put("c", self.fail)
+        self.assertTrue(created)
+        with self.assertRaises(QueueFull):
+            future.result(0)
+        self.assertEqual(self.queue.dropped, 1)
+        self.assertEqual(self.queue.depth, 2)
+
+    def test_untimed_work_runs_ahead_of_held_triggers(self):
+        order = []
+        timed, _ = self.queue.put("a", lambda count: order.append("timed"))
+        urgent = self.queue.submit(lambda: order.append("urgent"))
+        urgent.result(1)
+        timed.result(1)
+        self.assertEqual(order, ["urgent", "timed"])
+
+    def test_close_cancels_what_is_pending(self):
+        future, _ = self.queue.put("a", self.fail)
+        self.queue.close()
+        with self.assertRaises(CancelledError):
+            future.result(0)
+        with self.assertRaises(RuntimeError):
+            self.queue.put("b", self.fail)
+
+
+if __name__ == "__main__":
+    unittest.main()
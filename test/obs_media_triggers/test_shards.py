@@ -0,0 +1,145 @@
+import os
+import unittest
+from time import perf_counter, sleep
+
+try:
+    from flask import Flask
+    from .fakes import FakeServers, FakeTwitch
+    from obs_media_triggers.models import DB, EventTypes
+    from obs_media_triggers.controllers import EventFanOut, TwitchClient
+except ImportError:  # The app or aiohttp is not installed
+    FakeServers = None
+
+CHAT = "channel.chat.message"
+
+
+def wait_for(predicate, timeout: float = 5) -> bool:
+    deadline = perf_counter() + timeout
+    while not predicate():
+        if perf_counter() > deadline:
+            return False
+        sleep(0.01)
+    return True
+
+
+@unittest.skipIf(FakeServers is None, "app dependencies are not installed")
+class TestEventSubShards(unittest.TestCase):
+    """Two channels, one subscription per EventSub connection."""
+
+    CHANNELS = ("1", "2")
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("OMT_APP_SECRET", "test")
+        cls.servers = FakeServers()
+        cls.server = FakeTwitch(cls.servers)
+        cls.server.keepalive = 1
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        DB.init_app(app)
+        cls.twitch = TwitchClient(
+            app,
+            DB,
+            base_url=cls.server.base_url,
+            auth_base_url=cls.server.auth_base_url,
+            shard_size=1,
+        )
+        cls.pool = cls.twitch.eventsub
+        cls.pool.connection_url = cls.server.connection_url
+        cls.pool.reconnect_delays = [0, 0.05]
+        cls.pool.supervisor.interval = 0.2
+        for channel in cls.CHANNELS:
+            cls.pool.add_broadcaster(channel, f"token{channel}")
+
+        # One client per channel, and one that triggers on every channel
+        cls.received = []
+        cls.fanout = EventFanOut(cls.twitch)
+        for id, channels in ((1, ["1"]), (2, ["2"]), (3, [])):
+            cls.fanout.add_target(
+                EventTypes.CHANNEL_CHAT_MESSAGE,
+                id,
+                lambda event, trace, id=id: cls.on_event(id, event),
+            )
+            cls.fanout.set_channels(id, channels)
+        for channel in cls.CHANNELS:
+            cls.fanout.subscribe(EventTypes.CHANNEL_CHAT_MESSAGE, channel)
+            cls.fanout.subscribe(EventTypes.CHANNEL_SUBSCRIPTION_GIFT, channel)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.twitch.shutdown()
+        cls.servers.stop()
+
+    @classmethod
+    def on_event(cls, id: int, event: object) -> list:
+        cls.received.append((id, event.event.broadcaster_user_id))
+        return []
+
+    def chat(self, channel: str) -> list:
+        self.received.clear()
+        self.server.notify(
+            CHAT,
+            {
+                "broadcaster_user_id": channel,
+                "broadcaster_user_login": f"channel{channel}",
+                "broadcaster_user_name": f"Channel{channel}",
+                "chatter_user_id": "100",
+                "chatter_user_login": "chatter",
+                "chatter_user_name": "Chatter",
+                "message_id": "1",
+                "message": {"text": "!test", "fragments": []},
+                "message_type": "text",
+                "badges": [],
+                "color": "",
+            },
+        )
+        self.assertTrue(wait_for(lambda: len(self.received) == 2))
+        return sorted(self.received)
+
+    def test_subscriptions_spread_across_connections(self):
+        self.assertEqual(len(self.pool.shards), 4)
+        self.assertTrue(all(len(s) == 1 for s in self.pool.shards))
+        # Opening a connection probes Twitch with a short-lived one first
+        self.assertTrue(wait_for(lambda: len(self.server.sessions) == 4))
+
+    def test_events_routed_by_broadcaster(self):
+        self.assertEqual(self.chat("1"), [(1, "1"), (3, "1")])
+        self.assertEqual(self.chat("2"), [(2, "2"), (3, "2")])
+
+    def test_connection_limit(self):
+        self.pool.add_broadcaster("3", "token3")
+        max_shards, self.pool.max_shards = self.pool.max_shards, 1
+        try:
+            self.fanout.subscribe(EventTypes.CHANNEL_CHAT_MESSAGE, "3")
+            with self.assertRaises(RuntimeError):
+                self.fanout.subscribe(EventTypes.CHANNEL_SUBSCRIPTION_GIFT, "3")
+        finally:
+            self.pool.max_shards = max_shards
+            self.pool.remove_broadcaster("3")
+        self.assertFalse(self.pool.has_broadcaster("3"))
+
+    def test_reconnect_resubscribes(self):
+        session = self.server.session_of(CHAT, "1")
+        shards = len(self.pool.shards)
+        self.server.drop(session)
+        self.assertTrue(
+            wait_for(lambda: self.server.session_of(CHAT, "1") not in (None, session))
+        )
+        self.assertEqual(len(self.pool.shards), shards)
+        self.assertEqual(self.chat("1"), [(1, "1"), (3, "1")])
+
+    def test_lost_connection_is_reopened(self):
+        session = self.server.session_of(CHAT, "2")
+        shard = self.pool.placed[(EventTypes.CHANNEL_CHAT_MESSAGE, "2")]
+        socket = shard.socket
+        self.server.drop(session, refusals=len(self.pool.reconnect_delays))
+        self.assertTrue(
+            wait_for(lambda: self.server.session_of(CHAT, "2") not in (None, session))
+        )
+        self.assertIs(self.pool.placed[(EventTypes.CHANNEL_CHAT_MESSAGE, "2")], shard)
+        self.assertIsNot(shard.socket, socket)
+        self.assertEqual(self.chat("2"), [(2, "2"), (3, "2")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from threading import Event
+
+try:
+    from obs_media_triggers.controllers.loop import BackgroundLoop
+    from obs_media_triggers.controllers.throttle import (
+        OverflowPolicy,
+        Throttle,
+        ThrottleConfig,
+        Verdict,
+    )
+except ImportError:  # The app is not installed
+    Throttle = None
+
+
+@unittest.skipIf(Throttle is None, "app dependencies are not installed")
+class TestThrottle(unittest.TestCase):
+    """One trigger at a time, refilled slowly unless a test needs it back."""
+
+    SLOW = 0.001
+
+    @classmethod
+    def setUpClass(cls):
+        cls.timers = BackgroundLoop("test-throttle")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.timers.stop()
+
+    def throttle(self, rate: float = SLOW, **kwargs) -> Throttle:
+        return Throttle(ThrottleConfig(rate=rate, burst=1, **kwargs), self.timers)
+
+    def test_drop_throttles_once_the_bucket_is_empty(self):
+        throttle = self.throttle()
+        self.assertEqual(throttle.admit("a", None, self.fail), Verdict.ALLOWED)
+        self.assertEqual(throttle.admit("a", None, self.fail), Verdict.THROTTLED)
+        self.assertEqual(throttle.depth, 0)
+        self.assertEqual(throttle.counters["throttled"], 1)
+
+    def test_queue_fires_held_triggers_once_there_is_room(self):
+        throttle = self.throttle(rate=50, policy=OverflowPolicy.QUEUE)
+        fired = Event()
+        self.assertEqual(throttle.admit("a", None, self.fail), Verdict.ALLOWED)
+        self.assertEqual(throttle.admit("a", None, fired.set), Verdict.QUEUED)
+        self.assertTrue(fired.wait(1))
+        self.assertEqual(throttle.depth, 0)
+
+    def test_queue_overflow_is_throttled(self):
+        throttle = self.throttle(policy=OverflowPolicy.QUEUE, queue_size=1)
+        throttle.admit("a", None, self.fail)
+        self.assertEqual(throttle.admit("b", None, self.fail), Verdict.QUEUED)
+        self.assertEqual(throttle.admit("c", None, self.fail), Verdict.THROTTLED)
+        self.assertEqual(throttle.depth, 1)
+        self.assertEqual(throttle.counters["overflow"], 1)
+
+    def test_coalesce_merges_identical_held_triggers(self):
+        throttle = self.throttle(policy=OverflowPolicy.COALESCE)
+        throttle.admit("a", None, self.fail)
+        self.assertEqual(throttle.admit("b", None, self.fail), Verdict.QUEUED)
+        self.assertEqual(throttle.admit("b", None, self.fail), Verdict.COALESCED)
+        self.assertEqual(throttle.admit("c", None, self.fail), Verdict.QUEUED)
+        self.assertEqual(throttle.depth, 2)
+
+    def test_user_cooldown_drops_even_when_queueing(self):
+        throttle = self.throttle(
+            rate=1000, user_cooldown=60, policy=OverflowPolicy.QUEUE
+        )
+        self.assertEqual(throttle.admit("a", "user", lambda: None), Verdict.ALLOWED)
+        self.assertEqual(throttle.admit("b", "user", self.fail), Verdict.THROTTLED)
+        self.assertEqual(throttle.counters["user_cooldown"], 1)
+
+    def test_rate_and_burst_must_be_positive(self):
+        with self.assertRaises(RuntimeError):
+            ThrottleConfig(rate=0)
+        with self.assertRaises(RuntimeError):
+            ThrottleConfig(burst=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import unittest
+from tempfile import mkdtemp
+
+try:
+    from flask import Flask
+    from .fakes import FakeServers, FakeTwitch
+    from .test_shards import CHAT, wait_for
+    from obs_media_triggers.models import DB, EventTypes, TwitchOAuthUserModel
+    from obs_media_triggers.controllers import EventFanOut, TwitchClient
+except ImportError:  # The app or aiohttp is not installed
+    FakeServers = None
+
+
+@unittest.skipIf(FakeServers is None, "app dependencies are not installed")
+class TestTokenRefresh(unittest.TestCase):
+    """A broadcaster whose token is always about to expire."""
+
+    USER_ID = FakeTwitch.USER_ID if FakeServers else None
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("OMT_APP_SECRET", "test")
+        cls.servers = FakeServers()
+        cls.server = FakeTwitch(cls.servers)
+        cls.server.expires_in = 2
+        cls.app = Flask(__name__)
+        cls.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{mkdtemp()}/test.db"
+        DB.init_app(cls.app)
+        with cls.app.app_context():
+            DB.create_all()
+            DB.session.add(
+                TwitchOAuthUserModel(
+                    id=cls.USER_ID,
+                    login_name="test",
+                    display_name="Test",
+                    pfp_url="",
+                    user_token="token",
+                )
+            )
+            DB.session.commit()
+
+        cls.twitch = TwitchClient(
+            cls.app,
+            DB,
+            base_url=cls.server.base_url,
+            auth_base_url=cls.server.auth_base_url,
+        )
+        cls.twitch.eventsub.connection_url = cls.server.connection_url
+        cls.twitch.eventsub.add_broadcaster(cls.USER_ID, "token", "refresh")
+        cls.received = []
+        cls.fanout = EventFanOut(cls.twitch)
+        cls.fanout.add_target(
+            EventTypes.CHANNEL_CHAT_MESSAGE,
+            1,
+            lambda event, trace: cls.received.append(event) or [],
+        )
+        cls.fanout.subscribe(EventTypes.CHANNEL_CHAT_MESSAGE, cls.USER_ID)
+        cls.session = cls.server.session_of(CHAT, cls.USER_ID)
+
+        # The app's own client acts as the broadcaster, as after a login
+        cls.twitch.run(
+            cls.twitch.set_user_authentication(
+                "token", TwitchClient.API_SCOPES, "refresh", validate=False
+            )
+        )
+
+        # Refresh half a second after each token is handed out
+        cls.twitch.tokens.margin = 1.5
+        cls.twitch.tokens.watch(cls.USER_ID, "token", "refresh", cls.twitch)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.twitch.shutdown()
+        cls.servers.stop()
+
+    def saved_token(self) -> str:
+        with self.app.app_context():
+            return DB.session.get(TwitchOAuthUserModel, self.USER_ID).user_token
+
+    def test_tokens_refresh_ahead_of_expiry(self):
+        self.assertTrue(wait_for(lambda: self.twitch.tokens.refreshed >= 2))
+        session = self.twitch.eventsub.sessions[self.USER_ID]
+        self.assertNotEqual(self.twitch.tokens.tokens[self.USER_ID].token, "token")
+        self.assertNotEqual(session.get_user_auth_token(), "token")
+        self.assertNotEqual(self.twitch.get_user_auth_token(), "token")
+        self.assertTrue(wait_for(lambda: self.saved_token() != "token"))
+
+    def test_subscriptions_survive_refresh(self):
+        self.assertTrue(wait_for(lambda: self.twitch.tokens.refreshed >= 1))
+        self.assertEqual(self.server.session_of(CHAT, self.USER_ID), self.session)
+        self.received.clear()
+        self.server.notify(
+            CHAT,
+            {
+                "broadcaster_user_id": self.USER_ID,
+                "broadcaster_user_login": "test",
+                "broadcaster_user_name": "Test",
+                "chatter_user_id": "100",
+                "chatter_user_login": "chatter",
+                "chatter_user_name": "Chatter",
+                "message_id": "1",
+                "message": {"text": "!test", "fragments": []},
+                "message_type": "text",
+                "badges": [],
+                "color": "",
+            },
+        )
+        self.assertTrue(wait_for(lambda: len(self.received) == 1))
+
+
+if __name__ == "__main__":
+    unittest.main()